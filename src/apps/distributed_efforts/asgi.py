@@ -0,0 +1,125 @@
+"""
+Async task dispatch route, served by the ASGI application next to django.
+
+Requests skip the middlewares, the transaction of ATOMIC_REQUESTS and the views of DRF: the body is read and clients are authenticated
+in the event loop, and tasks are picked by TaskDispatchService in the thread of sync code, like django runs views,
+as picking reads the shared cache and sometimes the db, neither of which is to be waited for in the event loop.
+Like django, the route refuses hosts not in ALLOWED_HOSTS and bodies larger than DATA_UPLOAD_MAX_MEMORY_SIZE.
+
+Clients authenticate with http basic auth, their credentials being verified once then kept by TaskClientAuthService.
+"""
+
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig, SuspiciousOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections, connection
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+
+from src.apps.distributed_efforts.services import TaskClientAuthService, TaskDispatchService
+
+# Path -> the method of TaskDispatchService picking the tasks, the same as /api/tasks/ and /api/tasks/batch/
+TASK_DISPATCH_ROUTES = {
+    "/api/tasks/async/": TaskDispatchService.create_task,
+    "/api/tasks/async/batch/": TaskDispatchService.create_tasks,
+}
+
+
+def _in_sync_thread(func):
+    """
+    :return: func as a coroutine run in the thread of sync code, closing the db connections that are too old after it like django does
+        after each request, unless a transaction is open on them
+    """
+    def call(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if not connection.in_atomic_block:
+                close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=True)
+
+
+async def _read_body(receive):
+    """
+    :return: the body of the request, None if the client disconnected
+    :raise RequestDataTooBig: if the body is larger than DATA_UPLOAD_MAX_MEMORY_SIZE, without reading the rest of it
+    """
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if settings.DATA_UPLOAD_MAX_MEMORY_SIZE is not None and len(body) > settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
+            raise RequestDataTooBig("Request body exceeded settings.DATA_UPLOAD_MAX_MEMORY_SIZE.")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def _send_json(send, response_body, status, headers=()):
+    content = JSONRenderer().render(response_body)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(content)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": content})
+
+
+def _get_data(request):
+    if request.content_type == "application/json":
+        return json.loads(request.body or b"{}")
+    return request.POST
+
+
+async def _authenticate(request):
+    """
+    :return: the id of the user of the request
+    :raise NotAuthenticated, AuthenticationFailed: if the request has no valid credentials
+    """
+    task_client_auth = TaskClientAuthService(request)
+    user_id = task_client_auth.get_cached_user_id()
+    if user_id is None:
+        user_id = await _in_sync_thread(task_client_auth.authenticate)()
+    if user_id is None:
+        raise exceptions.NotAuthenticated()
+    return user_id
+
+
+async def task_dispatch_application(scope, receive, send):
+    """
+    ASGI application of the paths of TASK_DISPATCH_ROUTES
+    """
+    if scope["method"] != "POST":
+        await _send_json(send, {"detail": f'Method "{scope["method"]}" not allowed.'}, 405, headers=[(b"allow", b"POST")])
+        return
+    try:
+        body = await _read_body(receive)
+    except RequestDataTooBig:
+        await _send_json(send, {"detail": "Request body too large."}, 413)
+        return
+    if body is None:
+        return
+
+    request = ASGIRequest(scope, io.BytesIO(body))
+    pick_tasks = TASK_DISPATCH_ROUTES[scope["path"]]
+    try:
+        # Raises DisallowedHost if the host is not in ALLOWED_HOSTS, before anything builds urls with it
+        request.get_host()
+        await _authenticate(request)
+        data = _get_data(request)
+        response_body, status = await _in_sync_thread(pick_tasks)(TaskDispatchService(request), data)
+    except (exceptions.NotAuthenticated, exceptions.AuthenticationFailed) as e:
+        await _send_json(send, {"detail": e.detail}, e.status_code, headers=[(b"www-authenticate", b'Basic realm="api"')])
+        return
+    except exceptions.APIException as e:
+        response_body, status = e.detail if isinstance(e.detail, (dict, list)) else {"detail": e.detail}, e.status_code
+    except (SuspiciousOperation, ValueError):
+        response_body, status = {"detail": "Bad request."}, 400
+    await _send_json(send, response_body, status)
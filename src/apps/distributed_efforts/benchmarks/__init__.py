@@ -0,0 +1,4 @@
+from .opponent_selection import benchmark_opponent_selection
+from .rating_game_schedulers import simulate_rating_game_schedulers
+from .task_endpoint import benchmark_task_endpoint
+from .task_dispatch_concurrency import benchmark_task_dispatch_concurrency
@@ -0,0 +1,112 @@
+import time
+from math import log10, e
+
+import numpy as np
+from django.db import transaction
+
+from src.apps.distributed_efforts.services import RatingNetworkPairerService
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+from src.apps.trainings.services import RatingNetworksSnapshotService
+
+fake_sha256 = "0" * 64
+
+BENCHMARK_RUN_NAME = "pair-benchmark"
+
+
+def benchmark_opponent_selection(numbers_of_networks=(100, 1000, 10_000, 100_000), number_of_choices=1000, elo_spread=10_000, seed=0):
+    """
+    Insert synthetic runs in the db, with networks rated uniformly over elo_spread Elo, and time the choice of opponents
+    of random reference networks, with the range queries of the db and with the sorted snapshot of the pairer.
+    Everything is inserted in a transaction that is rolled back, so nothing is left in the db.
+
+    :return: a list of dict, one per synthetic run, with the wall time in seconds of building the snapshot and of each choice
+    """
+    results = []
+    for number_of_networks in numbers_of_networks:
+        with transaction.atomic():
+            results.append(_benchmark_synthetic_run(number_of_networks, number_of_choices, elo_spread, seed))
+            transaction.set_rollback(True)
+    return results
+
+
+def _benchmark_synthetic_run(number_of_networks, number_of_choices, elo_spread, seed):
+    random_generator = np.random.default_rng(seed)
+    run = Run.objects.create(name=BENCHMARK_RUN_NAME)
+    log_gammas = random_generator.uniform(0, elo_spread / (400 * log10(e)), number_of_networks)
+    Network.objects.bulk_create(
+        [
+            Network(
+                run=run,
+                name=f"{BENCHMARK_RUN_NAME}-{index}",
+                model_file_bytes=0,
+                model_file_sha256=fake_sha256,
+                network_size="b1c1",
+                log_gamma=log_gamma,
+                log_gamma_uncertainty=1.0,
+            )
+            for index, log_gamma in enumerate(log_gammas)
+        ],
+        batch_size=10_000,
+    )
+
+    start_time = time.perf_counter()
+    pairer = RatingNetworkPairerService(run)
+    snapshot_time = time.perf_counter() - start_time
+
+    np.random.seed(seed)
+    reference_networks = np.random.randint(0, len(pairer.networks), number_of_choices)
+
+    start_time = time.perf_counter()
+    for reference_network in reference_networks:
+        _choose_opponent_with_queries(run, pairer.networks.networks[reference_network])
+    queries_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for reference_network in reference_networks:
+        pairer._choose_opponent(reference_network)
+    snapshot_choice_time = time.perf_counter() - start_time
+
+    RatingNetworksSnapshotService.invalidate(run.id)
+    return {
+        "number_of_networks": number_of_networks,
+        "number_of_choices": number_of_choices,
+        "build_snapshot": snapshot_time,
+        "choose_opponent_with_queries": queries_time / number_of_choices,
+        "choose_opponent_with_snapshot": snapshot_choice_time / number_of_choices,
+    }
+
+
+def _choose_opponent_with_queries(run, reference_network):
+    """
+    The choice of an opponent as RatingNetworkPairerService did before it used a snapshot, with range queries on log_gamma
+    """
+    ref_net_log_gamma = reference_network.log_gamma + np.random.normal() * reference_network.log_gamma_uncertainty
+
+    log_gamma_search_range = 1200 / (400 * log10(e))
+    log_gamma_lower_bound = ref_net_log_gamma - log_gamma_search_range
+    log_gamma_upper_bound = ref_net_log_gamma + log_gamma_search_range
+
+    nearby_networks = list(
+        Network.objects.exclude(pk=reference_network.pk)
+        .filter(run=run, rating_games_enabled=True, log_gamma__lte=log_gamma_upper_bound, log_gamma__gte=log_gamma_lower_bound)
+    )
+    if len(nearby_networks) < 4:
+        nearby_weaker_networks = (
+            Network.objects.exclude(pk=reference_network.pk)
+            .filter(run=run, rating_games_enabled=True, log_gamma__lte=ref_net_log_gamma)
+            .order_by("-log_gamma")[:2]
+        )
+        nearby_stronger_networks = (
+            Network.objects.exclude(pk=reference_network.pk)
+            .filter(run=run, rating_games_enabled=True, log_gamma__gte=ref_net_log_gamma)
+            .order_by("log_gamma")[:2]
+        )
+        nearby_networks = list(nearby_weaker_networks) + list(nearby_stronger_networks)
+        if len(nearby_networks) <= 0:
+            return None
+        return np.random.choice(nearby_networks)
+
+    win_probability = 1 / (1 + np.exp((np.array([network.log_gamma for network in nearby_networks]) - ref_net_log_gamma) / run.rating_game_entropy_scale))
+    shannon_entropy = -win_probability * np.log2(win_probability) - (1 - win_probability) * np.log2(1 - win_probability)
+    return np.random.choice(nearby_networks, p=shannon_entropy / np.sum(shannon_entropy))
@@ -0,0 +1,118 @@
+import random
+
+import numpy as np
+import pandas
+
+from src.apps.distributed_efforts.services import RatingGamesInFlightService, RatingNetworkPairerService
+from src.apps.runs.models import Run
+from src.apps.trainings.benchmarks.synthetic_tournament import SyntheticTournament
+from src.apps.trainings.models import Network
+from src.apps.trainings.services import BayesianRatingService, RatingNetworksSnapshot
+
+# Not a run of the db, only used to key the pairing queues and the games in flight of the simulation
+SIMULATION_RUN_ID = -1
+
+
+def simulate_rating_game_schedulers(
+    number_of_networks=200,
+    number_of_top_networks=3,
+    target_uncertainty=0.15,
+    games_per_rating_update=200,
+    max_games=50_000,
+    rating_game_high_elo_probability=0.5,
+    virtual_draw_strength=4.0,
+    seed=0,
+):
+    """
+    Replay the same synthetic run with every Run.RatingGameScheduler: from a sparse start, clients are handed out
+    games_per_rating_update rating games at once, their results are drawn from the true strength of the networks,
+    then ratings are updated, until the true top networks are pinned down.
+
+    :param number_of_top_networks: the number of strongest networks, by true strength, whose rating must be pinned down
+    :param target_uncertainty: the log_gamma uncertainty under which a rating is pinned down
+    :return: a list of dict, one per scheduler, with the number of games it took, None if max_games was not enough
+    """
+    results = []
+    for scheduler in Run.RatingGameScheduler:
+        random.seed(seed)
+        np.random.seed(seed)
+        tournament = SyntheticTournament(number_of_networks, opponents_per_network=1, games_per_pair=2, seed=seed)
+        run = Run(
+            id=SIMULATION_RUN_ID,
+            name="simulation",
+            rating_game_scheduler=scheduler,
+            rating_game_high_elo_probability=rating_game_high_elo_probability,
+            virtual_draw_strength=virtual_draw_strength,
+        )
+        top_networks = np.argsort(-tournament.true_log_gamma)[:number_of_top_networks]
+
+        games = tournament.play_games(*_get_initial_pairs(tournament))
+        network_ratings = _update_ratings(tournament, tournament.get_ratings_dataframe(), games, virtual_draw_strength)
+        number_of_games = 0
+        while _get_top_networks_uncertainty(network_ratings, top_networks) > target_uncertainty and number_of_games < max_games:
+            new_games = _play_rating_games(run, tournament, network_ratings, games_per_rating_update)
+            games = pandas.concat([games, new_games]).groupby(["white_network", "black_network"], as_index=False).sum()
+            network_ratings = _update_ratings(tournament, network_ratings, games, virtual_draw_strength)
+            number_of_games += games_per_rating_update
+
+        top_networks_uncertainty = _get_top_networks_uncertainty(network_ratings, top_networks)
+        results.append({
+            "scheduler": scheduler.value,
+            "number_of_networks": number_of_networks,
+            "number_of_games": number_of_games if top_networks_uncertainty <= target_uncertainty else None,
+            "top_networks_uncertainty": float(top_networks_uncertainty),
+            "best_network_found": bool(network_ratings["log_gamma"].to_numpy().argmax() == top_networks[0]),
+        })
+    return results
+
+
+def _get_initial_pairs(tournament):
+    """
+    :return: two games of each network against its parent, like networks just uploaded
+    """
+    has_parent = tournament.parent_network_ids > 0
+    white_index = np.flatnonzero(has_parent)
+    black_index = tournament.parent_network_ids[has_parent] - 1
+    return white_index, black_index, np.full(len(white_index), 2)
+
+
+def _update_ratings(tournament, network_ratings, games, virtual_draw_strength):
+    detailed_tournament_results = tournament.get_detailed_tournament_results_dataframe(SyntheticTournament.remove_one_sided_pairs(games.copy()))
+    bayesian_rating_service = BayesianRatingService(network_ratings.copy(), tournament.anchor_network_id, detailed_tournament_results, virtual_draw_strength)
+    return bayesian_rating_service.update_ratings_iteratively(100, convergence_tolerance=1e-6, solver=Run.EloSolver.NEWTON)
+
+
+def _get_top_networks_uncertainty(network_ratings, top_networks):
+    return network_ratings["log_gamma_uncertainty"].to_numpy()[top_networks].max()
+
+
+def _play_rating_games(run, tournament, network_ratings, number_of_games):
+    """
+    Hand out number_of_games rating games to clients at once, like between two rating updates, then play them.
+    """
+    networks = [
+        Network(
+            id=network_id,
+            name=f"simulation-{network_id}",
+            network_size="b20c256",
+            log_gamma=log_gamma,
+            log_gamma_uncertainty=log_gamma_uncertainty,
+            log_gamma_lower_confidence=log_gamma - 2 * log_gamma_uncertainty,
+            log_gamma_upper_confidence=log_gamma + 2 * log_gamma_uncertainty,
+        )
+        for network_id, log_gamma, log_gamma_uncertainty in zip(
+            network_ratings.index, network_ratings["log_gamma"], network_ratings["log_gamma_uncertainty"]
+        )
+    ]
+    pairer = RatingNetworkPairerService(run, networks=RatingNetworksSnapshot(networks))
+    pairings = [pairer.pop_pairing() for _ in range(number_of_games)]
+    pairings = [pairing for pairing in pairings if pairing is not None]
+
+    rating_games_in_flight = RatingGamesInFlightService(run)
+    if run.rating_game_scheduler == Run.RatingGameScheduler.UNCERTAINTY_REDUCTION:
+        for white_network, black_network in pairings:
+            rating_games_in_flight.remove(white_network.id, black_network.id)
+
+    white_index = np.array([white_network.id for white_network, _ in pairings]) - 1
+    black_index = np.array([black_network.id for _, black_network in pairings]) - 1
+    return tournament.play_games(white_index, black_index, np.ones(len(pairings), dtype=np.int64))
@@ -0,0 +1,145 @@
+import asyncio
+import base64
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+
+from src.apps.distributed_efforts.asgi import task_dispatch_application
+from src.apps.runs.models import Run
+from src.apps.runs.services import CurrentRunCacheService
+from src.apps.trainings.models import Network
+
+fake_sha256 = "0" * 64
+fake_git_revision = "0" * 40
+
+BENCHMARK_RUN_NAME = "dispatch-bench"
+
+
+def benchmark_task_dispatch_concurrency(number_of_clients=64, requests_per_client=50, number_of_networks=100, rating_game_probability=0.1):
+    """
+    Insert a synthetic active run in the db and serve task requests of number_of_clients concurrent clients on one event loop,
+    like a uvicorn worker does, through the django view /api/tasks/ and through the async route /api/tasks/async/.
+    Requests are sent to the ASGI applications directly, without sockets, so only the time spent serving them is measured.
+
+    The run is committed, for the threads of the django view to see it, and deleted afterwards.
+
+    :return: a list of dict, one per route, with the requests per second, the latency percentiles in seconds, and the cpu time in seconds of each request
+    """
+    if Run.objects.select_current() is not None:
+        raise ValueError("There is already an active run, the benchmark would not serve the synthetic one")
+
+    run, user = _create_synthetic_run(number_of_networks, rating_game_probability)
+    try:
+        results = []
+        for path, application in [("/api/tasks/", get_asgi_application()), ("/api/tasks/async/", task_dispatch_application)]:
+            # Warm up the caches and the connections, like a server that has been serving tasks for a while
+            asyncio.run(_load(application, path, number_of_clients, 5))
+
+            start_cpu_time = time.process_time()
+            start_time = time.perf_counter()
+            latencies = asyncio.run(_load(application, path, number_of_clients, requests_per_client))
+            wall_time = time.perf_counter() - start_time
+            cpu_time = time.process_time() - start_cpu_time
+
+            results.append({
+                "path": path,
+                "number_of_clients": number_of_clients,
+                "number_of_requests": len(latencies),
+                "requests_per_second": len(latencies) / wall_time,
+                "latency_p50": float(np.percentile(latencies, 50)),
+                "latency_p99": float(np.percentile(latencies, 99)),
+                "cpu_per_request": cpu_time / len(latencies),
+            })
+        return results
+    finally:
+        Network.objects.filter(run=run).delete()
+        run.delete()
+        user.delete()
+        CurrentRunCacheService.invalidate()
+
+
+def _create_synthetic_run(number_of_networks, rating_game_probability):
+    run = Run.objects.create(
+        name=BENCHMARK_RUN_NAME,
+        status=Run.RunStatus.ACTIVE,
+        git_revision_hash_whitelist=fake_git_revision,
+        rating_game_probability=rating_game_probability,
+    )
+    Network.objects.bulk_create([
+        Network(
+            run=run,
+            name=f"{BENCHMARK_RUN_NAME}-{index}",
+            model_file=f"networks/models/{BENCHMARK_RUN_NAME}/{BENCHMARK_RUN_NAME}-{index}.bin.gz",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            network_size="b1c1",
+            log_gamma=index / 10,
+            log_gamma_uncertainty=1.0,
+        )
+        for index in range(number_of_networks)
+    ])
+    user = get_user_model().objects.create_user(username=BENCHMARK_RUN_NAME, password=BENCHMARK_RUN_NAME)
+    return run, user
+
+
+async def _load(application, path, number_of_clients, requests_per_client):
+    """
+    :return: the latency of every request, in seconds
+    """
+    latencies = []
+
+    async def client():
+        for _ in range(requests_per_client):
+            start_time = time.perf_counter()
+            status = await _request_task(application, path)
+            if status != 200:
+                raise RuntimeError(f"Unexpected status of the task request to {path}: {status}")
+            latencies.append(time.perf_counter() - start_time)
+
+    await asyncio.gather(*[client() for _ in range(number_of_clients)])
+    return latencies
+
+
+async def _request_task(application, path):
+    # Requested like the server is, not through the "testserver" host of the test runner
+    host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost"
+    body = urlencode({"git_revision": fake_git_revision}).encode()
+    credentials = base64.b64encode(f"{BENCHMARK_RUN_NAME}:{BENCHMARK_RUN_NAME}".encode())
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", host.encode()),
+            (b"content-type", b"application/x-www-form-urlencoded"),
+            (b"content-length", str(len(body)).encode()),
+            (b"authorization", b"Basic " + credentials),
+        ],
+        "server": (host, 80),
+        "client": ("127.0.0.1", 12345),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    response_start = {}
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Like a client waiting for its response
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response_start.update(message)
+
+    await application(scope, receive, send)
+    return response_start["status"]
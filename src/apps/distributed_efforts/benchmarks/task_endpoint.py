@@ -0,0 +1,114 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from src.apps.runs.models import Run
+from src.apps.runs.services import CurrentRunCacheService
+from src.apps.trainings.models import Network
+from src.apps.trainings.services import NetworkTaskPayloadCacheService, RatingNetworksSnapshotService
+
+fake_sha256 = "0" * 64
+fake_git_revision = "0" * 40
+
+BENCHMARK_RUN_NAME = "task-benchmark"
+
+
+def benchmark_task_endpoint(number_of_requests=1000, number_of_networks=100, tasks_per_batch=32):
+    """
+    Insert a synthetic active run in the db and load /api/tasks/ with selfplay then rating task requests, timing the cpu
+    of the process per request, with the payloads of networks rendered once and with the networks serialized for each task,
+    then load /api/tasks/batch/ with the same number of tasks, tasks_per_batch at once.
+    Everything is inserted in a transaction that is rolled back, so nothing is left in the db.
+
+    :return: a list of dict, one per kind of task, with the cpu time in seconds of each task
+    """
+    if Run.objects.select_current() is not None:
+        raise ValueError("There is already an active run, the benchmark would not serve the synthetic one")
+
+    results = []
+    try:
+        with transaction.atomic():
+            run, client = _create_synthetic_run(number_of_networks)
+            for kind, rating_game_probability in [("selfplay", 0.0), ("rating", 1.0)]:
+                run.rating_game_probability = rating_game_probability
+                run.save()
+                results.append({
+                    "kind": kind,
+                    "number_of_requests": number_of_requests,
+                    "serialize_networks_per_task": _time_requests(client, kind, number_of_requests, serialize_networks=True),
+                    "cached_network_payloads": _time_requests(client, kind, number_of_requests, serialize_networks=False),
+                    f"batches_of_{tasks_per_batch}": _time_batch_requests(client, kind, number_of_requests, tasks_per_batch),
+                })
+            transaction.set_rollback(True)
+    finally:
+        # The caches of this process still hold the synthetic run, which was rolled back
+        CurrentRunCacheService.invalidate()
+    return results
+
+
+def _create_synthetic_run(number_of_networks):
+    run = Run.objects.create(name=BENCHMARK_RUN_NAME, status=Run.RunStatus.ACTIVE, git_revision_hash_whitelist=fake_git_revision)
+    Network.objects.bulk_create([
+        Network(
+            run=run,
+            name=f"{BENCHMARK_RUN_NAME}-{index}",
+            model_file=f"networks/models/{BENCHMARK_RUN_NAME}/{BENCHMARK_RUN_NAME}-{index}.bin.gz",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            network_size="b1c1",
+            log_gamma=index / 10,
+            log_gamma_uncertainty=1.0,
+        )
+        for index in range(number_of_networks)
+    ])
+    RatingNetworksSnapshotService.invalidate(run.id)
+    NetworkTaskPayloadCacheService.invalidate(run.id)
+
+    user = get_user_model().objects.create_user(username=BENCHMARK_RUN_NAME, password=BENCHMARK_RUN_NAME)
+    # Requested like the server is, not through the "testserver" host of the test runner
+    client = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost")
+    client.force_login(user)
+    return run, client
+
+
+def _time_requests(client, kind, number_of_requests, serialize_networks):
+    # Warm up the caches, like a server that has been serving tasks for a while
+    for _ in range(10):
+        _request_task(client, kind)
+
+    cpu_time = 0.0
+    for _ in range(number_of_requests):
+        if serialize_networks:
+            # Payloads are rendered again, like every task did before they were cached
+            NetworkTaskPayloadCacheService._payloads.clear()
+        start_time = time.process_time()
+        _request_task(client, kind)
+        cpu_time += time.process_time() - start_time
+    return cpu_time / number_of_requests
+
+
+def _time_batch_requests(client, kind, number_of_tasks, tasks_per_batch):
+    _request_task_batch(client, kind, tasks_per_batch)
+
+    cpu_time = 0.0
+    number_of_batches = max(1, number_of_tasks // tasks_per_batch)
+    for _ in range(number_of_batches):
+        start_time = time.process_time()
+        _request_task_batch(client, kind, tasks_per_batch)
+        cpu_time += time.process_time() - start_time
+    return cpu_time / (number_of_batches * tasks_per_batch)
+
+
+def _request_task_batch(client, kind, tasks_per_batch):
+    response = client.post("/api/tasks/batch/", {"git_revision": fake_git_revision, "number_of_tasks": tasks_per_batch})
+    if response.status_code != 200 or any(task["kind"] != kind for task in response.data["tasks"]):
+        raise RuntimeError(f"Unexpected response to the task batch request: {response.status_code} {response.content[:200]}")
+
+
+def _request_task(client, kind):
+    response = client.post("/api/tasks/", {"git_revision": fake_git_revision})
+    if response.status_code != 200 or response.data["kind"] != kind:
+        raise RuntimeError(f"Unexpected response to the task request: {response.status_code} {response.content[:200]}")
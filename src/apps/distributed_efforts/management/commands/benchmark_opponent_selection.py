@@ -0,0 +1,21 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from src.apps.distributed_efforts.benchmarks import benchmark_opponent_selection
+
+
+class Command(BaseCommand):
+    help = "Time the choice of rating game opponents with db range queries and with the sorted snapshot, on synthetic runs inserted then rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--networks", type=int, nargs="+", default=[100, 1000, 10_000, 100_000], help="Number of networks of each synthetic run")
+        parser.add_argument("--choices", type=int, default=1000, help="Number of opponents to choose in each run")
+        parser.add_argument("--elo-spread", type=float, default=10_000, help="Range of the Elo of the networks")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        results = benchmark_opponent_selection(
+            numbers_of_networks=options["networks"], number_of_choices=options["choices"], elo_spread=options["elo_spread"], seed=options["seed"],
+        )
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,24 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from src.apps.distributed_efforts.benchmarks import benchmark_task_dispatch_concurrency
+
+
+class Command(BaseCommand):
+    help = "Serve task requests of concurrent clients through the django view and through the async route, on a synthetic run deleted afterwards"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=64, help="Number of concurrent clients")
+        parser.add_argument("--requests", type=int, default=50, help="Number of task requests of each client")
+        parser.add_argument("--networks", type=int, default=100, help="Number of networks of the synthetic run")
+        parser.add_argument("--rating-game-probability", type=float, default=0.1, help="Probability of rating tasks")
+
+    def handle(self, *args, **options):
+        results = benchmark_task_dispatch_concurrency(
+            number_of_clients=options["clients"],
+            requests_per_client=options["requests"],
+            number_of_networks=options["networks"],
+            rating_game_probability=options["rating_game_probability"],
+        )
+        self.stdout.write(json.dumps(results, indent=2))
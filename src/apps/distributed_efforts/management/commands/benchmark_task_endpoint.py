@@ -0,0 +1,20 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from src.apps.distributed_efforts.benchmarks import benchmark_task_endpoint
+
+
+class Command(BaseCommand):
+    help = "Time the cpu per task of /api/tasks/, with cached and with per task network payloads, and of /api/tasks/batch/, on a synthetic run inserted then rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000, help="Number of task requests of each kind")
+        parser.add_argument("--networks", type=int, default=100, help="Number of networks of the synthetic run")
+        parser.add_argument("--tasks-per-batch", type=int, default=32, help="Number of tasks of each batch request")
+
+    def handle(self, *args, **options):
+        results = benchmark_task_endpoint(
+            number_of_requests=options["requests"], number_of_networks=options["networks"], tasks_per_batch=options["tasks_per_batch"],
+        )
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from src.apps.distributed_efforts.benchmarks import simulate_rating_game_schedulers
+
+
+class Command(BaseCommand):
+    help = "Count the rating games each rating game scheduler needs to pin down the ratings of the top networks of a synthetic run"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--networks", type=int, default=200, help="Number of networks of the synthetic run")
+        parser.add_argument("--top-networks", type=int, default=3, help="Number of strongest networks whose ratings must be pinned down")
+        parser.add_argument("--target-uncertainty", type=float, default=0.15, help="Log_gamma uncertainty under which a rating is pinned down")
+        parser.add_argument("--games-per-update", type=int, default=200, help="Number of rating games handed out between two rating updates")
+        parser.add_argument("--max-games", type=int, default=50_000)
+        parser.add_argument("--high-elo-probability", type=float, default=0.5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        results = simulate_rating_game_schedulers(
+            number_of_networks=options["networks"],
+            number_of_top_networks=options["top_networks"],
+            target_uncertainty=options["target_uncertainty"],
+            games_per_rating_update=options["games_per_update"],
+            max_games=options["max_games"],
+            rating_game_high_elo_probability=options["high_elo_probability"],
+            seed=options["seed"],
+        )
+        self.stdout.write(json.dumps(results, indent=2))
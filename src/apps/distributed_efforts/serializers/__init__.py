@@ -0,0 +1 @@
+from .task import TaskCreateSerializer, TaskBatchCreateSerializer
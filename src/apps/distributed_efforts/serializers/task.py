@@ -0,0 +1,17 @@
+from rest_framework import serializers
+from rest_framework.response import Response
+
+
+class TaskCreateSerializer(serializers.Serializer):
+    allow_rating_task = serializers.BooleanField(default=True)
+    allow_selfplay_task = serializers.BooleanField(default=True)
+    task_rep_factor = serializers.IntegerField(default=1)
+    git_revision = serializers.CharField(default="", allow_blank=True)
+
+    def validate(self, data):
+        if not data.get('allow_rating_task') and not data.get('allow_selfplay_task'):
+            raise Response({"error": "allow_rating_task and allow_selfplay_task are both false"},status=400)
+        return data
+
+class TaskBatchCreateSerializer(TaskCreateSerializer):
+    number_of_tasks = serializers.IntegerField(default=1)
@@ -1 +1,4 @@
+from .rating_games_in_flight import RatingGamesInFlightService
 from .rating_network_pairer import RatingNetworkPairerService
+from .task_dispatch import TaskDispatchService, MAX_TASKS_PER_BATCH
+from .task_client_auth import TaskClientAuthService
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from src.apps.runs.models import Run
+
+
+class RatingGamesInFlightService:
+    """
+    RatingGamesInFlightService counts, in the cache, the rating games handed out to clients and not uploaded yet, per pair of networks.
+
+    Clients may never upload the game of a task, so the count of a pair expires RATING_GAMES_IN_FLIGHT_TIMEOUT seconds
+    after the first of its games was handed out.
+    """
+
+    def __init__(self, run: Run):
+        self._key_prefix = f"distributed_efforts:rating_games_in_flight:{run.id}"
+
+    def _get_key(self, network_id, other_network_id):
+        if network_id > other_network_id:
+            network_id, other_network_id = other_network_id, network_id
+        return f"{self._key_prefix}:{network_id}:{other_network_id}"
+
+    def add(self, network_id, other_network_id):
+        key = self._get_key(network_id, other_network_id)
+        cache.add(key, 0, timeout=settings.RATING_GAMES_IN_FLIGHT_TIMEOUT)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Expired in the meantime
+            cache.add(key, 1, timeout=settings.RATING_GAMES_IN_FLIGHT_TIMEOUT)
+
+    def remove(self, network_id, other_network_id):
+        key = self._get_key(network_id, other_network_id)
+        try:
+            if cache.decr(key) <= 0:
+                cache.delete(key)
+        except ValueError:
+            # Expired, or handed out before the run used the counts
+            pass
+
+    def get_counts(self, network_ids, other_network_ids):
+        """
+        :return: the number of games in flight of each pair of networks, with a single cache read
+        """
+        keys = [self._get_key(network_id, other_network_id) for network_id, other_network_id in zip(network_ids, other_network_ids)]
+        counts = cache.get_many(keys)
+        return [max(counts.get(key, 0), 0) for key in keys]
@@ -1,15 +1,86 @@
 import random
+from collections import deque
 
 import numpy as np
-from math import log10, e, exp
+from django.conf import settings
+from math import log10, e
 
+from src.apps.distributed_efforts.services.rating_games_in_flight import RatingGamesInFlightService
 from src.apps.runs.models import Run
-from src.apps.trainings.models import Network
+from src.apps.trainings.managers.network_queryset import random_weighted_choice
+from src.apps.trainings.services import RatingNetworksSnapshotService
+from src.apps.trainings.services.rating_precision import game_precision
+
+# Hardcoded window of 1200 Elo, we could dehardcode if needed in the future
+LOG_GAMMA_SEARCH_RANGE = 1200 / (400 * log10(e))
 
 
 class RatingNetworkPairerService:
-    def __init__(self, run: Run):
+    """
+    RatingNetworkPairerService pairs networks of the run for rating games, from the snapshot of the networks kept by the process,
+    without querying the db as long as the snapshot is up to date.
+
+    Pairings are generated in batches, and queued in the process until they are served to clients or the snapshot changes.
+
+    With Run.RatingGameScheduler.UNCERTAINTY_REDUCTION, pairings are not drawn at random from the top networks anymore, but chosen
+    greedily, each one where a game reduces the most the uncertainty of the networks per client time, accounting for the games in flight.
+    """
+
+    # Per process, run id -> (snapshot the pairings were generated from, pairings not served yet per kind of game)
+    _pairing_queues = {}
+
+    # Rows of the window matrix of a batch of opponent choices are processed by chunks of at most this many cells
+    _max_window_cells = 1 << 20
+
+    # Pairs scored by the uncertainty reduction scheduler: the networks whose uncertainty matters the most, each one against its nearest networks
+    _number_of_scheduled_networks = 32
+    _number_of_scheduled_opponents = 64
+
+    def __init__(self, run: Run, networks=None):
+        """
+        :param networks: the RatingNetworksSnapshot to pair networks from, the snapshot of the process for the run if not given
+        """
         self.current_run = run
+        self.networks = RatingNetworksSnapshotService(run).get() if networks is None else networks
+
+    def pop_pairing(self):
+        """
+        Serve a pairing from the queues of the process, one of high elo games and one of high uncertainty games,
+        generating a batch of RATING_PAIRINGS_BATCH_SIZE pairings when the queue drawn from is empty.
+
+        :return: Tuple of (white_network,black_network), or None if no pairing could be generated
+        """
+        snapshot, pairings = self._pairing_queues.get(self.current_run.id, (None, None))
+        if snapshot is not self.networks:
+            pairings = {True: deque(), False: deque(), None: deque()}
+            self._pairing_queues[self.current_run.id] = (self.networks, pairings)
+
+        if self.current_run.rating_game_scheduler == Run.RatingGameScheduler.UNCERTAINTY_REDUCTION:
+            return self._pop_scheduled_pairing(pairings[None])
+
+        is_high_elo_game = random.random() < self.current_run.rating_game_high_elo_probability
+        try:
+            return pairings[is_high_elo_game].popleft()
+        except IndexError:
+            new_pairings = self._generate_games(np.full(settings.RATING_PAIRINGS_BATCH_SIZE, is_high_elo_game))
+            if len(new_pairings) <= 0:
+                return None
+            pairings[is_high_elo_game].extend(new_pairings[1:])
+            return new_pairings[0]
+
+    def _pop_scheduled_pairing(self, pairings):
+        try:
+            pairing = pairings.popleft()
+        except IndexError:
+            new_pairings = self._generate_uncertainty_reduction_games(settings.RATING_PAIRINGS_BATCH_SIZE)
+            if len(new_pairings) <= 0:
+                return None
+            pairings.extend(new_pairings[1:])
+            pairing = new_pairings[0]
+
+        white_network, black_network = pairing
+        RatingGamesInFlightService(self.current_run).add(white_network.id, black_network.id)
+        return pairing
 
     def generate_pairing(self):
         """
@@ -17,10 +88,19 @@ class RatingNetworkPairerService:
 
         :return: Tuple of (white_network,black_network), or None if no pairing could be generated
         """
-        if random.random() < self.current_run.rating_game_high_elo_probability:
-            return self.generate_high_elo_game()
-        else:
-            return self.generate_high_uncertainty_game()
+        pairings = self.generate_pairings(1)
+        return pairings[0] if len(pairings) > 0 else None
+
+    def generate_pairings(self, number_of_pairings):
+        """
+        Generate many pairings at once, each one being a high elo game or a high uncertainty game like generate_pairing.
+
+        :return: a list of up to number_of_pairings tuples of (white_network,black_network), empty if no pairing could be generated
+        """
+        if self.current_run.rating_game_scheduler == Run.RatingGameScheduler.UNCERTAINTY_REDUCTION:
+            return self._generate_uncertainty_reduction_games(number_of_pairings)
+        is_high_elo_game = np.random.random(number_of_pairings) < self.current_run.rating_game_high_elo_probability
+        return self._generate_games(is_high_elo_game)
 
     def generate_high_elo_game(self):
         """
@@ -28,14 +108,8 @@ class RatingNetworkPairerService:
 
         :return: Tuple of (white_network,black_network), or None if no pairing could be generated
         """
-        reference_network = Network.objects.select_high_upper_confidence(self.current_run,for_rating_games=True)
-        opponent_network = self._choose_opponent(reference_network)
-        if reference_network is None or opponent_network is None:
-            return None
-        if random.random() < 0.5:
-            return reference_network, opponent_network
-        else:
-            return opponent_network, reference_network
+        pairings = self._generate_games(np.ones(1, dtype=bool))
+        return pairings[0] if len(pairings) > 0 else None
 
     def generate_high_uncertainty_game(self):
         """
@@ -43,61 +117,180 @@ class RatingNetworkPairerService:
 
         :return: Tuple of (white_network,black_network), or None if no pairing could be generated
         """
-        reference_network = Network.objects.select_high_uncertainty(self.current_run,for_rating_games=True)
-        opponent_network = self._choose_opponent(reference_network)
-        if reference_network is None or opponent_network is None:
-            return None
-        if random.random() < 0.5:
-            return reference_network, opponent_network
-        else:
-            return opponent_network, reference_network
+        pairings = self._generate_games(np.zeros(1, dtype=bool))
+        return pairings[0] if len(pairings) > 0 else None
+
+    def _generate_games(self, is_high_elo_game):
+        """
+        :param is_high_elo_game: for each game to generate, whether it is a high elo game or a high uncertainty game
+        :return: a list of tuples of (white_network,black_network), without the games for which no opponent could be found
+        """
+        if len(self.networks) <= 0:
+            return []
+
+        reference_networks = np.empty(len(is_high_elo_game), dtype=np.int64)
+        reference_networks[is_high_elo_game] = self._select_high(self.networks.log_gamma_upper_confidence, np.count_nonzero(is_high_elo_game))
+        reference_networks[~is_high_elo_game] = self._select_high(self.networks.log_gamma_uncertainty, np.count_nonzero(~is_high_elo_game))
+        opponent_networks = self._choose_opponents(reference_networks)
+
+        has_opponent = opponent_networks >= 0
+        reference_networks, opponent_networks = reference_networks[has_opponent], opponent_networks[has_opponent]
+        is_reference_white = np.random.random(len(reference_networks)) < 0.5
+        white_networks = np.where(is_reference_white, reference_networks, opponent_networks)
+        black_networks = np.where(is_reference_white, opponent_networks, reference_networks)
+        networks = self.networks.networks
+        return [(networks[white_network], networks[black_network]) for white_network, black_network in zip(white_networks, black_networks)]
+
+    def _generate_uncertainty_reduction_games(self, number_of_pairings):
+        """
+        Choose the pairings one after the other, each one being the pair whose game reduces the most the uncertainty of its networks,
+        per client time, given the games in flight and the pairings already chosen.
+
+        Like high elo games and high uncertainty games, with probability rating_game_high_elo_probability a pairing only counts
+        the uncertainty of the networks that may be the best one, ie whose upper confidence is above the highest lower confidence,
+        otherwise the uncertainty of every network.
+
+        :return: a list of up to number_of_pairings tuples of (white_network,black_network), empty if no pairing could be generated
+        """
+        if len(self.networks) <= 1:
+            return []
+
+        # Networks never rated have no uncertainty yet, consider it as large as uncertainty can be
+        uncertainty = self.networks.log_gamma_uncertainty
+        uncertainty = np.where(uncertainty > 0, np.minimum(uncertainty, 10.0), 10.0)
+        precision = 1.0 / (uncertainty * uncertainty)
+        may_be_best = self.networks.log_gamma_upper_confidence >= np.max(self.networks.log_gamma_lower_confidence)
+        is_high_elo_game = np.random.random(number_of_pairings) < self.current_run.rating_game_high_elo_probability
+
+        # A single game between networks of equal log_gamma brings the most precision, 1/4
+        best_reduction = uncertainty - 1 / np.sqrt(precision + 0.25)
+        scheduled_networks = np.union1d(
+            np.argsort(-best_reduction, kind="stable")[:self._number_of_scheduled_networks],
+            np.argsort(-best_reduction * may_be_best, kind="stable")[:self._number_of_scheduled_networks],
+        )
+
+        # Nearest networks by log_gamma rank, the window being shifted inside the networks at both ends
+        number_of_opponents = min(self._number_of_scheduled_opponents, len(self.networks))
+        window_starts = np.clip(self.networks.log_gamma_rank[scheduled_networks] - number_of_opponents // 2, 0, len(self.networks) - number_of_opponents)
+        networks = np.repeat(scheduled_networks, number_of_opponents)
+        opponent_networks = self.networks.by_log_gamma[(window_starts[:, None] + np.arange(number_of_opponents)).ravel()]
+        is_pair = networks != opponent_networks
+        networks, opponent_networks = networks[is_pair], opponent_networks[is_pair]
+
+        pair_game_precision = game_precision(self.networks.log_gamma[opponent_networks] - self.networks.log_gamma[networks])
+        game_cost = self.networks.evaluation_cost[networks] + self.networks.evaluation_cost[opponent_networks]
+
+        games_in_flight = np.array(RatingGamesInFlightService(self.current_run).get_counts(self.networks.ids[networks], self.networks.ids[opponent_networks]))
+        # A pair is scored twice when both of its networks are scheduled, count its games in flight once
+        is_first_of_pair = ~np.isin(opponent_networks, scheduled_networks) | (networks < opponent_networks)
+        np.add.at(precision, networks, games_in_flight * pair_game_precision * is_first_of_pair)
+        np.add.at(precision, opponent_networks, games_in_flight * pair_game_precision * is_first_of_pair)
+
+        pairings = []
+        for pairing_index in range(number_of_pairings):
+            weight = may_be_best if is_high_elo_game[pairing_index] else np.ones(len(self.networks))
+            uncertainty_reduction = (
+                weight[networks] * (1 / np.sqrt(precision[networks]) - 1 / np.sqrt(precision[networks] + pair_game_precision)) +
+                weight[opponent_networks] * (1 / np.sqrt(precision[opponent_networks]) - 1 / np.sqrt(precision[opponent_networks] + pair_game_precision))
+            )
+            best_pair = np.argmax(uncertainty_reduction / game_cost)
+            network, opponent_network = networks[best_pair], opponent_networks[best_pair]
+            precision[network] += pair_game_precision[best_pair]
+            precision[opponent_network] += pair_game_precision[best_pair]
+            pairings.append((network, opponent_network) if random.random() < 0.5 else (opponent_network, network))
+
+        return [(self.networks.networks[white_network], self.networks.networks[black_network]) for white_network, black_network in pairings]
+
+    def _select_high(self, values, size):
+        """
+        Like Network.objects.select_high_upper_confidence and select_high_uncertainty, on the snapshot
+
+        :return: the index in the snapshot of size networks, each one among the 10 with highest values
+        """
+        highest = np.argsort(-values, kind="stable")[:10]
+        return random_weighted_choice(highest, size=size)
 
     def _choose_opponent(self, reference_network):
         """
-        Given a reference network, first preselect all networks in a fixed elo range.
+        :param reference_network: the index in the snapshot of the reference network
+        :return: the index in the snapshot of a network, chosen to be used as an opponent, or None if no distinct opponent could be found
+        """
+        opponent_network = self._choose_opponents(np.array([reference_network], dtype=np.int64))[0]
+        return None if opponent_network < 0 else opponent_network
+
+    def _choose_opponents(self, reference_networks):
+        """
+        Given a reference network, first preselect all networks in a fixed elo range, by binary search in the networks sorted by log_gamma.
         Then, for each network, calculate the win probability using log_gamma.
         Once we have all that, we look for a network close enough, by applying shannon entropy: https://imgur.com/v9Q4By7
 
-        :param reference_network:
-        :return: a network, chosen to be used as an opponent, or None if no distinct opponent could be found
+        :param reference_networks: the index in the snapshot of each reference network
+        :return: the index in the snapshot of the network chosen as opponent of each reference network, -1 if no distinct opponent could be found
         """
-        if reference_network is None:
-            return None
-
         # Vary the reference net's log gamma so that networks that are uncertain will play a greater variety of opponents
         # based on that uncertainty
-        ref_net_log_gamma = reference_network.log_gamma + np.random.normal() * reference_network.log_gamma_uncertainty
+        ref_net_log_gamma = (
+            self.networks.log_gamma[reference_networks] + np.random.normal(size=len(reference_networks)) * self.networks.log_gamma_uncertainty[reference_networks]
+        )
 
-        log_gamma_search_range = 1200 / (400 * log10(e))  # Hardcoded window of 1200 Elo, we could dehardcode if needed in the future
-        log_gamma_lower_bound = ref_net_log_gamma - log_gamma_search_range
-        log_gamma_upper_bound = ref_net_log_gamma + log_gamma_search_range
+        # Positions in the networks sorted by log_gamma, each window being a slice of it
+        window_starts = np.searchsorted(self.networks.sorted_log_gamma, ref_net_log_gamma - LOG_GAMMA_SEARCH_RANGE, side="left")
+        window_ends = np.searchsorted(self.networks.sorted_log_gamma, ref_net_log_gamma + LOG_GAMMA_SEARCH_RANGE, side="right")
+        reference_ranks = self.networks.log_gamma_rank[reference_networks]
+        is_reference_in_window = (window_starts <= reference_ranks) & (reference_ranks < window_ends)
+        number_of_nearby_networks = window_ends - window_starts - is_reference_in_window
 
-        nearby_networks = (
-            Network.objects.exclude(pk=reference_network.pk)
-            .filter(run=self.current_run, rating_games_enabled=True, log_gamma__lte=log_gamma_upper_bound, log_gamma__gte=log_gamma_lower_bound,)
-            .all()
-        )
-        if len(nearby_networks) < 4:
-            nearby_weaker_networks = (
-                Network.objects.exclude(pk=reference_network.pk)
-                .filter(run=self.current_run, rating_games_enabled=True, log_gamma__lte=ref_net_log_gamma)
-                .order_by("-log_gamma")
-                .all()[:2]
-            )
-            nearby_stronger_networks = (
-                Network.objects.exclude(pk=reference_network.pk)
-                .filter(run=self.current_run, rating_games_enabled=True, log_gamma__gte=ref_net_log_gamma)
-                .order_by("log_gamma")
-                .all()[:2]
-            )
-            nearby_networks = list(nearby_weaker_networks) + list(nearby_stronger_networks)
-            if len(nearby_networks) <= 0:
-                return None
-            return np.random.choice(nearby_networks)
+        opponent_networks = np.full(len(reference_networks), -1, dtype=np.int64)
+        has_few_nearby_networks = number_of_nearby_networks < 4
+        for row in np.flatnonzero(has_few_nearby_networks):
+            opponent_networks[row] = self._choose_nearest_opponent(reference_networks[row], ref_net_log_gamma[row])
 
-        win_probability = np.asarray([
-            1 / (1 + exp((opp_net.log_gamma - ref_net_log_gamma) / self.current_run.rating_game_entropy_scale)) for opp_net in nearby_networks
-        ])
-        shannon_entropy = -win_probability * np.log2(win_probability) - (1 - win_probability) * np.log2(1 - win_probability)
+        rows = np.flatnonzero(~has_few_nearby_networks)
+        if len(rows) > 0:
+            window_size = int(np.max(window_ends[rows] - window_starts[rows]))
+            chunk_size = max(1, self._max_window_cells // window_size)
+            for chunk in range(0, len(rows), chunk_size):
+                chunk_rows = rows[chunk:chunk + chunk_size]
+                opponent_networks[chunk_rows] = self._choose_opponents_in_windows(
+                    reference_networks[chunk_rows], ref_net_log_gamma[chunk_rows], window_starts[chunk_rows], window_ends[chunk_rows], window_size,
+                )
+        return opponent_networks
 
-        return np.random.choice(nearby_networks, p=shannon_entropy / np.sum(shannon_entropy))
+    def _choose_opponents_in_windows(self, reference_networks, ref_net_log_gamma, window_starts, window_ends, window_size):
+        """
+        Draw one opponent per window, weighted by the shannon entropy of the result, all windows padded to window_size at once.
+        """
+        positions = window_starts[:, None] + np.arange(window_size)
+        is_in_window = positions < window_ends[:, None]
+        nearby_networks = self.networks.by_log_gamma[np.minimum(positions, len(self.networks) - 1)]
+        is_in_window &= nearby_networks != reference_networks[:, None]
+
+        win_probability = 1 / (1 + np.exp((self.networks.log_gamma[nearby_networks] - ref_net_log_gamma[:, None]) / self.current_run.rating_game_entropy_scale))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shannon_entropy = -win_probability * np.log2(win_probability) - (1 - win_probability) * np.log2(1 - win_probability)
+        # The entropy of a certain result is 0
+        shannon_entropy = np.where(is_in_window, np.nan_to_num(shannon_entropy), 0.0)
+
+        cumulative_entropy = np.cumsum(shannon_entropy, axis=1)
+        drawn_entropy = np.random.random(len(reference_networks)) * cumulative_entropy[:, -1]
+        chosen = np.minimum(np.sum(cumulative_entropy <= drawn_entropy[:, None], axis=1), window_size - 1)
+        return nearby_networks[np.arange(len(reference_networks)), chosen]
+
+    def _choose_nearest_opponent(self, reference_network, ref_net_log_gamma):
+        """
+        Draw uniformly among the two networks below and the two networks above ref_net_log_gamma, when too few networks are in its window
+
+        :return: the index in the snapshot of the chosen network, -1 if there is no network but the reference network
+        """
+        by_log_gamma, sorted_log_gamma = self.networks.by_log_gamma, self.networks.sorted_log_gamma
+        # One more than needed on each side, in case the reference network is among them
+        weaker_end = np.searchsorted(sorted_log_gamma, ref_net_log_gamma, side="right")
+        nearby_weaker_networks = by_log_gamma[max(weaker_end - 3, 0):weaker_end][::-1]
+        nearby_weaker_networks = nearby_weaker_networks[nearby_weaker_networks != reference_network][:2]
+        stronger_start = np.searchsorted(sorted_log_gamma, ref_net_log_gamma, side="left")
+        nearby_stronger_networks = by_log_gamma[stronger_start:stronger_start + 3]
+        nearby_stronger_networks = nearby_stronger_networks[nearby_stronger_networks != reference_network][:2]
+        nearby_networks = np.concatenate([nearby_weaker_networks, nearby_stronger_networks])
+        if len(nearby_networks) <= 0:
+            return -1
+        return np.random.choice(nearby_networks)
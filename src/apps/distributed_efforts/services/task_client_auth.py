@@ -0,0 +1,60 @@
+import hashlib
+import time
+
+from django.conf import settings
+from rest_framework.authentication import BasicAuthentication, get_authorization_header
+
+
+class TaskClientAuthService:
+    """
+    TaskClientAuthService keeps, in each process, the http basic credentials of clients verified recently, so that clients polling
+    for tasks are not looked up in the db and their password hashed again on every request.
+
+    Credentials are kept by digest of the Authorization header, for TASK_CLIENT_AUTH_CACHE_TIMEOUT seconds: a password change
+    or a deactivation of the user only applies to the credentials kept after that.
+    """
+
+    # Per process, digest of the Authorization header -> (expiry time, user id)
+    _verified_credentials = {}
+
+    # Expired credentials are dropped when more credentials than this are kept
+    _max_verified_credentials = 10_000
+
+    def __init__(self, request):
+        """
+        :param request: the django request
+        """
+        self._request = request
+        authorization_header = get_authorization_header(request)
+        self._key = hashlib.sha256(authorization_header).hexdigest() if authorization_header else None
+
+    def get_cached_user_id(self):
+        """
+        :return: the id of the user whose credentials are those of the request, if they were verified recently, None otherwise
+        """
+        if self._key is None:
+            return None
+        expiry_time, user_id = self._verified_credentials.get(self._key, (0, None))
+        if time.monotonic() >= expiry_time:
+            return None
+        return user_id
+
+    def authenticate(self):
+        """
+        Verify the credentials of the request like BasicAuthentication does, with the db and the password hasher, and keep them if they are valid
+
+        :return: the id of the user, None if the request has no basic credentials
+        :raise AuthenticationFailed: if the credentials are not valid
+        """
+        user_auth = BasicAuthentication().authenticate(self._request)
+        if user_auth is None:
+            return None
+        (user, _) = user_auth
+
+        now = time.monotonic()
+        if len(self._verified_credentials) >= self._max_verified_credentials:
+            for key, (expiry_time, _) in list(self._verified_credentials.items()):
+                if now >= expiry_time:
+                    del self._verified_credentials[key]
+        self._verified_credentials[self._key] = (now + settings.TASK_CLIENT_AUTH_CACHE_TIMEOUT, user.id)
+        return user.id
@@ -0,0 +1,199 @@
+import random
+
+from src.apps.distributed_efforts.serializers import TaskBatchCreateSerializer, TaskCreateSerializer
+from src.apps.distributed_efforts.services.rating_network_pairer import RatingNetworkPairerService
+from src.apps.runs.services import CurrentRunCacheService
+from src.apps.startposes.models import StartPos
+from src.apps.trainings.services import NetworkTaskPayloadCacheService, TrainingNetworkCacheService
+
+# Most tasks a client can ask for at once
+MAX_TASKS_PER_BATCH = 64
+
+
+class TaskDispatchService:
+    """
+    TaskDispatchService picks the tasks given to clients, for DistributedTaskViewSet and for the async task dispatch route.
+
+    It only reads: the current run, the networks and their payloads come from caches, pairings from the in-memory queues of the pairer,
+    and the db is only queried for start positions and on cache misses.
+    Each method returns the response body and its status.
+    """
+
+    def __init__(self, request):
+        """
+        :param request: the django or DRF request, its data being the fields of TaskCreateSerializer or TaskBatchCreateSerializer
+        """
+        self._request = request
+
+    def _validate(self, serializer_class, data):
+        """
+        :return: the cached current run, the validated data of the request and None, or None, None and the error response body and status
+        """
+        cached_current_run = CurrentRunCacheService.get()
+        if cached_current_run is None:
+            return None, None, ({"error": "No active run."}, 404)
+        current_run = cached_current_run.run
+
+        serializer = serializer_class(data=data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        git_revision = str(data["git_revision"]).strip().lower()
+        # Git revision hashes are at least 40 chars, we can also optionally allow plus revisions and other stuff
+        if len(git_revision) < 40:
+            return None, None, (
+                {"error": "This version of KataGo is not usable for distributed because either it's had custom modifications or has been compiled without version info."},
+                400,
+            )
+        elif git_revision not in cached_current_run.git_revision_hash_whitelist:
+            return None, None, (
+                {"error": "This version of KataGo is not enabled for distributed. If this is an official version and/or you think this is an oversight, please ask server admins to enable the following version hash: " + git_revision},
+                400,
+            )
+
+        allow_rating_task = data["allow_rating_task"]
+        allow_selfplay_task = data["allow_selfplay_task"]
+        if not allow_rating_task and current_run.rating_game_probability >= 1.0:
+            return None, None, ({"error": "allow_rating_task is false but this server is only serving rating games right now"}, 400)
+        if not allow_selfplay_task and current_run.rating_game_probability <= 0.0:
+            return None, None, ({"error": "allow_selfplay_task is false but this server is only serving selfplay games right now"}, 400)
+
+        task_rep_factor = data["task_rep_factor"]
+        if task_rep_factor < 1 or task_rep_factor > 64:
+            return None, None, ({"error": "task_rep_factor was not an integer from 1 to 64"}, 400)
+
+        return cached_current_run, data, None
+
+    @staticmethod
+    def _is_rating_task(current_run, data):
+        if not data["allow_selfplay_task"]:
+            return True
+        return data["allow_rating_task"] and random.random() < current_run.rating_game_probability
+
+    @staticmethod
+    def _count_start_poses(current_run, task_rep_factor):
+        """
+        :return: the number of start positions of a selfplay task, each repetition getting one with selfplay_startpos_probability
+        """
+        return sum(
+            1 for rep in range(task_rep_factor)
+            if not current_run.startpos_locked and random.random() < current_run.selfplay_startpos_probability
+        )
+
+    def create_task(self, data):
+        """
+        :param data: the fields of TaskCreateSerializer
+        :return: the body of a rating or selfplay task, and its status
+        """
+        cached_current_run, data, error = self._validate(TaskCreateSerializer, data)
+        if error is not None:
+            return error
+        current_run = cached_current_run.run
+
+        # Payloads of networks are rendered once per process and base url, NetworkSerializerForTasks is not run for each task
+        network_payloads = NetworkTaskPayloadCacheService(current_run, self._request)
+        run_content = cached_current_run.get_client_data(self._request)
+
+        if self._is_rating_task(current_run, data):
+            pairer = RatingNetworkPairerService(current_run)
+            pairing = pairer.pop_pairing()
+            if pairing is not None:
+                (white_network, black_network) = pairing
+                white_network_content, black_network_content = network_payloads.get_many([white_network, black_network])
+                response_body = {
+                    "kind": "rating",
+                    "run": run_content,
+                    "config": current_run.rating_client_config,
+                    "white_network": white_network_content,
+                    "black_network": black_network_content,
+                }
+                return response_body, 200
+
+        start_poses = []
+        for rep in range(data["task_rep_factor"]):
+            if not current_run.startpos_locked and random.random() < current_run.selfplay_startpos_probability:
+                start_pos = StartPos.objects.select_weighted_random(current_run)
+                if start_pos is not None:
+                    start_poses.append(start_pos.data)
+
+        best_network = TrainingNetworkCacheService(current_run).get()
+        if best_network is None:
+            return {"error": "No networks found for run enabled for training games."}, 400
+
+        (best_network_content,) = network_payloads.get_many([best_network])
+        response_body = {
+            "kind": "selfplay",
+            "run": run_content,
+            "config": current_run.selfplay_client_config,
+            "network": best_network_content,
+            "start_poses": start_poses,
+        }
+        return response_body, 200
+
+    def create_tasks(self, data):
+        """
+        :param data: the fields of TaskBatchCreateSerializer
+        :return: the body of number_of_tasks independent tasks, each one being a rating or a selfplay task picked in turn like create_task picks it,
+            networks being given once, by name, in "networks", and tasks referring to them by name, and its status.
+            As any task falls back to a selfplay task when there is no rating game to play, the whole batch is refused
+            when no network is enabled for training games.
+        """
+        cached_current_run, data, error = self._validate(TaskBatchCreateSerializer, data)
+        if error is not None:
+            return error
+        current_run = cached_current_run.run
+
+        number_of_tasks = data["number_of_tasks"]
+        if number_of_tasks < 1 or number_of_tasks > MAX_TASKS_PER_BATCH:
+            return {"error": f"number_of_tasks was not an integer from 1 to {MAX_TASKS_PER_BATCH}"}, 400
+
+        best_network = TrainingNetworkCacheService(current_run).get()
+        if best_network is None:
+            return {"error": "No networks found for run enabled for training games."}, 400
+
+        pairer = None
+        networks = {}
+        tasks = []
+        selfplay_tasks = []
+        for _ in range(number_of_tasks):
+            if self._is_rating_task(current_run, data):
+                if pairer is None:
+                    pairer = RatingNetworkPairerService(current_run)
+                pairing = pairer.pop_pairing()
+                if pairing is not None:
+                    (white_network, black_network) = pairing
+                    networks[white_network.name] = white_network
+                    networks[black_network.name] = black_network
+                    tasks.append({
+                        "kind": "rating",
+                        "config": current_run.rating_client_config,
+                        "white_network": white_network.name,
+                        "black_network": black_network.name,
+                    })
+                    continue
+
+            networks[best_network.name] = best_network
+            task = {
+                "kind": "selfplay",
+                "config": current_run.selfplay_client_config,
+                "network": best_network.name,
+                "start_poses": [],
+            }
+            tasks.append(task)
+            selfplay_tasks.append((task, self._count_start_poses(current_run, data["task_rep_factor"])))
+
+        # Start positions of every selfplay task are picked with a single query
+        number_of_start_poses = sum(task_number_of_start_poses for _, task_number_of_start_poses in selfplay_tasks)
+        start_poses = [start_pos.data for start_pos in StartPos.objects.select_weighted_randoms(current_run, number_of_start_poses)]
+        start_pos_index = 0
+        for task, task_number_of_start_poses in selfplay_tasks:
+            task["start_poses"] = start_poses[start_pos_index:start_pos_index + task_number_of_start_poses]
+            start_pos_index += task_number_of_start_poses
+
+        network_payloads = NetworkTaskPayloadCacheService(current_run, self._request).get_many(networks.values())
+        response_body = {
+            "run": cached_current_run.get_client_data(self._request),
+            "networks": dict(zip(networks.keys(), network_payloads)),
+            "tasks": tasks,
+        }
+        return response_body, 200
@@ -0,0 +1,15 @@
+from django.dispatch import receiver
+
+from src.apps.distributed_efforts.services import RatingGamesInFlightService
+from src.apps.games.models import RatingGame
+from src.apps.games.signals import rating_games_created
+from src.apps.runs.models import Run
+
+
+@receiver(rating_games_created, sender=RatingGame)
+def remove_rating_games_in_flight(sender, run, games=(), **kwargs):
+    if run.rating_game_scheduler != Run.RatingGameScheduler.UNCERTAINTY_REDUCTION:
+        return
+    rating_games_in_flight = RatingGamesInFlightService(run)
+    for game in games:
+        rating_games_in_flight.remove(game.white_network_id, game.black_network_id)
@@ -2,13 +2,17 @@ import pytest
 import copy
 import base64
 import random
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 
 from src.apps.runs.models import Run
 from src.apps.trainings.models import Network
+from src.apps.trainings.serializers import NetworkSerializerForTasks
 from src.apps.startposes.models import StartPos
 from src.apps.startposes.tasks import recompute_startpos_cumulative_weights
 
@@ -769,3 +773,220 @@ class TestStartPoses:
         self.r1.refresh_from_db()
         assert(self.r1.startpos_total_weight == 17.625)
 
+
+
+class TestCurrentRunCache:
+
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+            git_revision_hash_whitelist="abcdef123456abcdef123456abcdef1234567890 # comment",
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="testrun-randomnetwork",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+
+    def teardown_method(self):
+        self.n1.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    @staticmethod
+    def _count_run_queries(queries):
+        return len([query for query in queries.captured_queries if 'FROM "runs_run"' in query["sql"]])
+
+    def test_run_is_not_queried_on_every_task(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        client.post("/api/tasks/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"})
+
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                response = client.post("/api/tasks/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"})
+                assert response.status_code == 200
+                assert response.data["run"]["url"] == "http://testserver/api/runs/testrun/"
+            response = client.get("/api/runs/current_for_client/")
+            assert response.status_code == 200
+            assert response.data["name"] == "testrun"
+        assert self._count_run_queries(queries) == 0
+
+    def test_run_edits_are_served(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post("/api/tasks/", {"git_revision":"1111222233334444555566667777888899990000"})
+        assert response.status_code == 400
+
+        self.r1.git_revision_hash_whitelist += "\n1111222233334444555566667777888899990000"
+        self.r1.selfplay_client_config = "NEW CONFIG"
+        self.r1.save()
+        response = client.post("/api/tasks/", {"git_revision":"1111222233334444555566667777888899990000"})
+        assert response.status_code == 200
+        assert response.data["config"] == "NEW CONFIG"
+
+    def test_git_revision_hash_whitelist_is_parsed_on_save(self):
+        assert self.r1.git_revision_hashes == ["abcdef123456abcdef123456abcdef1234567890"]
+
+        self.r1.git_revision_hash_whitelist = "# official\n1111222233334444555566667777888899990000 # v1.7\n\nABCDEF123456ABCDEF123456ABCDEF1234567890\n"
+        self.r1.save(update_fields=["git_revision_hash_whitelist"])
+        self.r1.refresh_from_db()
+        assert self.r1.git_revision_hashes == ["1111222233334444555566667777888899990000", "abcdef123456abcdef123456abcdef1234567890"]
+
+
+class TestNetworkTaskPayloadCache:
+
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+            git_revision_hash_whitelist="abcdef123456abcdef123456abcdef1234567890",
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="testrun-randomnetwork",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+
+    def teardown_method(self):
+        self.n1.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    def test_network_is_serialized_once(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        first_response = client.post("/api/tasks/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"})
+        assert first_response.status_code == 200
+
+        to_representation = NetworkSerializerForTasks.to_representation
+        with mock.patch.object(NetworkSerializerForTasks, "to_representation", autospec=True, side_effect=to_representation) as patched:
+            for _ in range(3):
+                response = client.post("/api/tasks/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"})
+                assert response.status_code == 200
+                assert response.data["network"] == first_response.data["network"]
+            assert patched.call_count == 0
+
+            # Payloads hold absolute urls, requests to another base url get their own
+            response = client.post("/api/tasks/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"}, secure=True)
+            assert response.data["network"]["url"] == "https://testserver/api/networks/testrun-randomnetwork/"
+            assert patched.call_count == 1
+
+    def test_network_edits_are_served(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post("/api/tasks/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"})
+        assert response.data["network"]["model_file_bytes"] == 0
+
+        self.n1.model_file_bytes = 1234
+        self.n1.save()
+        response = client.post("/api/tasks/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"})
+        assert response.data["network"]["model_file_bytes"] == 1234
+
+
+class TestGetTaskBatch:
+
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.5,
+            selfplay_startpos_probability=1.0,
+            status="Active",
+            git_revision_hash_whitelist="abcdef123456abcdef123456abcdef1234567890",
+        )
+        self.networks = [
+            Network.objects.create(
+                run=self.r1,
+                name=f"testrun-network{index}",
+                model_file="",
+                model_file_bytes=0,
+                model_file_sha256=fake_sha256,
+                log_gamma=index,
+                log_gamma_uncertainty=1,
+                log_gamma_lower_confidence=index - 2.0,
+                log_gamma_upper_confidence=index + 2.0,
+                is_random=True,
+            )
+            for index in range(3)
+        ]
+        self.client = APIClient()
+        self.client.login(username="test", password="test")
+
+    def teardown_method(self):
+        StartPos.objects.filter(run=self.r1).delete()
+        for network in self.networks:
+            network.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    def _add_start_poses(self):
+        StartPos.objects.bulk_create([StartPos(run=self.r1, data=data, weight=weight) for data, weight in [("a", 1.0), ("b", 3.0)]])
+        self.r1.startpos_locked = True
+        self.r1.save()
+        recompute_startpos_cumulative_weights()
+        self.r1.refresh_from_db()
+        self.r1.startpos_locked = False
+        self.r1.save()
+
+    def test_tasks_mix_rating_and_selfplay(self):
+        self._add_start_poses()
+        random.seed(0)
+        response = self.client.post("/api/tasks/batch/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890", "number_of_tasks": 32, "task_rep_factor": 2})
+        assert response.status_code == 200
+        assert response.data["run"]["url"] == "http://testserver/api/runs/testrun/"
+
+        tasks = response.data["tasks"]
+        assert len(tasks) == 32
+        assert {task["kind"] for task in tasks} == {"rating", "selfplay"}
+        # Picked in turn, rating tasks do not all come first
+        assert [task["kind"] for task in tasks] != sorted(task["kind"] for task in tasks)
+        for task in tasks:
+            if task["kind"] == "rating":
+                assert task["white_network"] != task["black_network"]
+                assert {task["white_network"], task["black_network"]} <= set(response.data["networks"])
+            else:
+                assert task["network"] == "testrun-network2"
+                assert len(task["start_poses"]) == 2
+                assert set(task["start_poses"]) <= {"a", "b"}
+        for name, network in response.data["networks"].items():
+            assert network["url"] == f"http://testserver/api/networks/{name}/"
+
+    def test_start_poses_are_picked_with_one_query(self):
+        self._add_start_poses()
+        self.r1.rating_game_probability = 0.0
+        self.r1.save()
+        self.client.post("/api/tasks/batch/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890", "number_of_tasks": 2})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/api/tasks/batch/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890", "number_of_tasks": 8, "task_rep_factor": 4})
+        assert response.status_code == 200
+        assert [len(task["start_poses"]) for task in response.data["tasks"]] == [4] * 8
+        assert len([query for query in queries.captured_queries if 'FROM "startposes_startpos"' in query["sql"]]) == 1
+
+    def test_number_of_tasks_is_bounded(self):
+        for number_of_tasks in [0, 65]:
+            response = self.client.post("/api/tasks/batch/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890", "number_of_tasks": number_of_tasks})
+            assert response.status_code == 400
+
+    def test_no_batch_without_training_network(self):
+        for network in self.networks:
+            network.training_games_enabled = False
+            network.save()
+        random.seed(0)
+        response = self.client.post("/api/tasks/batch/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890", "number_of_tasks": 16})
+        assert response.status_code == 400
+        assert response.data == {"error": "No networks found for run enabled for training games."}
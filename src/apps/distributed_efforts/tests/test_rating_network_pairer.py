@@ -0,0 +1,153 @@
+import pytest
+from django.core.cache import cache
+
+from src.apps.distributed_efforts.services import RatingGamesInFlightService, RatingNetworkPairerService
+from src.apps.games.models import RatingGame
+from src.apps.games.signals import rating_games_created
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+
+pytestmark = pytest.mark.django_db
+
+fake_sha256 = "12341234abcdabcd56785678abcdabcd12341234abcdabcd56785678abcdabcd"
+
+
+class TestRatingNetworkPairer:
+
+    def setup_method(self):
+        self.r1 = Run.objects.create(name="testrun", rating_game_probability=1.0, status="Active")
+        self.networks = [
+            Network.objects.create(
+                run=self.r1,
+                name=f"testrun-network{index}",
+                model_file="",
+                model_file_bytes=0,
+                model_file_sha256=fake_sha256,
+                log_gamma=index,
+                log_gamma_uncertainty=1,
+                log_gamma_lower_confidence=index - 2.0,
+                log_gamma_upper_confidence=index + 2.0,
+                is_random=True,
+            )
+            for index in range(6)
+        ]
+
+    def teardown_method(self):
+        for network in reversed(self.networks):
+            network.delete()
+        self.r1.delete()
+
+    def test_pairing_without_queries(self, django_assert_num_queries):
+        RatingNetworkPairerService(self.r1).generate_pairing()
+        with django_assert_num_queries(0):
+            for _ in range(100):
+                white_network, black_network = RatingNetworkPairerService(self.r1).generate_pairing()
+                assert(white_network.pk != black_network.pk)
+                assert(white_network.run.name == "testrun")
+
+    def test_disabled_networks_are_not_paired(self):
+        RatingNetworkPairerService(self.r1).generate_pairing()
+        for network in self.networks[2:]:
+            network.rating_games_enabled = False
+            network.save()
+
+        for _ in range(100):
+            white_network, black_network = RatingNetworkPairerService(self.r1).generate_pairing()
+            assert({white_network.pk, black_network.pk} == {self.networks[0].pk, self.networks[1].pk})
+
+    def test_no_pairing_with_a_single_network(self):
+        for network in self.networks[1:]:
+            network.rating_games_enabled = False
+            network.save()
+
+        assert(RatingNetworkPairerService(self.r1).generate_pairing() is None)
+
+    def test_nearest_opponents_outside_of_the_window(self):
+        for network in self.networks:
+            network.log_gamma = 100.0 * int(network.name[len("testrun-network"):])
+            network.log_gamma_uncertainty = 0.0
+            network.save()
+
+        pairer = RatingNetworkPairerService(self.r1)
+        reference_network = [network.name for network in pairer.networks.networks].index("testrun-network3")
+        opponents = {pairer.networks.networks[pairer._choose_opponent(reference_network)].name for _ in range(200)}
+        assert(opponents == {"testrun-network1", "testrun-network2", "testrun-network4", "testrun-network5"})
+
+    def test_generate_pairings(self):
+        pairings = RatingNetworkPairerService(self.r1).generate_pairings(1000)
+        assert(len(pairings) == 1000)
+        assert(all(white_network.pk != black_network.pk for white_network, black_network in pairings))
+        # Every network is close enough to be paired with every other one, the best ones more often
+        networks_played = [network.name for pairing in pairings for network in pairing]
+        assert(len(set(networks_played)) == 6)
+        assert(networks_played.count("testrun-network5") > networks_played.count("testrun-network0"))
+
+    def test_pairings_are_queued_until_ratings_change(self, django_assert_num_queries, settings):
+        settings.RATING_PAIRINGS_BATCH_SIZE = 10
+        RatingNetworkPairerService(self.r1).pop_pairing()
+        with django_assert_num_queries(0):
+            for _ in range(30):
+                RatingNetworkPairerService(self.r1).pop_pairing()
+
+        self.networks[0].rating_games_enabled = False
+        self.networks[0].save()
+        for _ in range(30):
+            assert(self.networks[0].pk not in [network.pk for network in RatingNetworkPairerService(self.r1).pop_pairing()])
+
+
+class TestUncertaintyReductionScheduler:
+
+    def setup_method(self):
+        cache.clear()
+        self.r1 = Run.objects.create(
+            name="testrun", rating_game_probability=1.0, rating_game_scheduler=Run.RatingGameScheduler.UNCERTAINTY_REDUCTION, status="Active",
+        )
+        self.networks = [
+            Network.objects.create(
+                run=self.r1,
+                name=f"testrun-network{index}",
+                model_file="",
+                model_file_bytes=0,
+                model_file_sha256=fake_sha256,
+                log_gamma=index,
+                log_gamma_uncertainty=1,
+                log_gamma_lower_confidence=index - 2.0,
+                log_gamma_upper_confidence=index + 2.0,
+                is_random=True,
+            )
+            for index in range(6)
+        ]
+
+    def teardown_method(self):
+        for network in reversed(self.networks):
+            network.delete()
+        self.r1.delete()
+        cache.clear()
+
+    @staticmethod
+    def _get_pair(pairing):
+        return frozenset(network.pk for network in pairing)
+
+    def test_generate_pairings(self):
+        pairings = RatingNetworkPairerService(self.r1).generate_pairings(100)
+        assert(len(pairings) == 100)
+        assert(all(white_network.pk != black_network.pk for white_network, black_network in pairings))
+        # Each game makes the next one between the same networks less useful
+        assert(len({self._get_pair(pairing) for pairing in pairings}) >= 5)
+
+    def test_games_in_flight_are_avoided(self):
+        first_pair = self._get_pair(RatingNetworkPairerService(self.r1).generate_pairing())
+        network_id, other_network_id = first_pair
+        for _ in range(50):
+            RatingGamesInFlightService(self.r1).add(network_id, other_network_id)
+
+        assert(self._get_pair(RatingNetworkPairerService(self.r1).generate_pairing()) != first_pair)
+
+    def test_games_in_flight_are_counted(self):
+        white_network, black_network = RatingNetworkPairerService(self.r1).pop_pairing()
+        rating_games_in_flight = RatingGamesInFlightService(self.r1)
+        assert(rating_games_in_flight.get_counts([white_network.pk], [black_network.pk]) == [1])
+
+        game = RatingGame(run=self.r1, white_network=white_network, black_network=black_network)
+        rating_games_created.send(sender=RatingGame, run=self.r1, number_of_games=1, games=[game])
+        assert(rating_games_in_flight.get_counts([white_network.pk], [black_network.pk]) == [0])
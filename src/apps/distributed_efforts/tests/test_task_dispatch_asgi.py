@@ -0,0 +1,136 @@
+import base64
+import json
+from urllib.parse import urlencode
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from src.apps.distributed_efforts.asgi import task_dispatch_application
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+
+pytestmark = pytest.mark.django_db
+
+User = get_user_model()
+
+fake_sha256 = "12341234abcdabcd56785678abcdabcd12341234abcdabcd56785678abcdabcd"
+
+
+def post(path, data, username="test", password="test", content_type="application/x-www-form-urlencoded", host="testserver"):
+    """
+    :return: the status, headers and decoded json body of the response of the task dispatch route
+    """
+    body = json.dumps(data).encode() if content_type == "application/json" else urlencode(data).encode()
+    headers = [(b"host", host.encode()), (b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+    if username is not None:
+        credentials = base64.b64encode(f"{username}:{password}".encode())
+        headers.append((b"authorization", b"Basic " + credentials))
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": headers,
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 12345),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    async_to_sync(task_dispatch_application)(scope, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"]), json.loads(sent[1]["body"])
+
+
+class TestTaskDispatchAsgi:
+
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+            git_revision_hash_whitelist="abcdef123456abcdef123456abcdef1234567890",
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="testrun-randomnetwork",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+
+    def teardown_method(self):
+        self.n1.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    def test_same_task_as_the_viewset(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        expected = client.post("/api/tasks/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"}).data
+
+        status, headers, data = post("/api/tasks/async/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"})
+        assert status == 200
+        assert headers[b"content-type"] == b"application/json"
+        assert data == json.loads(json.dumps(expected))
+
+        status, _, data = post("/api/tasks/async/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"}, content_type="application/json")
+        assert status == 200
+        assert data["network"]["name"] == "testrun-randomnetwork"
+
+    def test_batch(self):
+        status, _, data = post("/api/tasks/async/batch/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890", "number_of_tasks": 4})
+        assert status == 200
+        assert [task["network"] for task in data["tasks"]] == ["testrun-randomnetwork"] * 4
+        assert data["networks"]["testrun-randomnetwork"]["url"] == "http://testserver/api/networks/testrun-randomnetwork/"
+
+    def test_warm_caches_are_not_read_from_the_db(self):
+        post("/api/tasks/async/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"})
+
+        # Queries, including the ones of the credentials, would run in the thread of sync code, this one
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                status, _, _ = post("/api/tasks/async/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"})
+                assert status == 200
+        assert len(queries.captured_queries) == 0
+
+    def test_authentication(self):
+        status, headers, data = post("/api/tasks/async/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"}, username=None)
+        assert status == 401
+        assert headers[b"www-authenticate"] == b'Basic realm="api"'
+
+        status, _, _ = post("/api/tasks/async/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"}, password="wrong")
+        assert status == 401
+
+    def test_errors(self):
+        status, _, data = post("/api/tasks/async/", {"git_revision":"abcdef"})
+        assert status == 400
+        assert "error" in data
+
+        status, _, data = post("/api/tasks/async/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890", "task_rep_factor": "many"})
+        assert status == 400
+        assert "task_rep_factor" in data
+
+    def test_request_body_too_large(self, settings):
+        settings.DATA_UPLOAD_MAX_MEMORY_SIZE = 64
+        status, _, data = post("/api/tasks/async/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890", "padding": "x" * 64})
+        assert status == 413
+
+    def test_disallowed_host(self):
+        status, _, data = post("/api/tasks/async/", {"git_revision":"abcdef123456abcdef123456abcdef1234567890"}, host="evil.example.com")
+        assert status == 400
+        assert data == {"detail": "Bad request."}
@@ -1,7 +1,8 @@
 from django.contrib import admin
 
-from src.apps.games.admin.game_admin import RatingGameAdmin, TrainingGameAdmin
-from src.apps.games.models import RatingGame, TrainingGame
+from src.apps.games.admin.game_admin import RatingGameAdmin, TrainingGameAdmin, RatingGamePairResultAdmin
+from src.apps.games.models import RatingGame, TrainingGame, RatingGamePairResult
 
 admin.site.register(RatingGame, RatingGameAdmin)
 admin.site.register(TrainingGame, TrainingGameAdmin)
+admin.site.register(RatingGamePairResult, RatingGamePairResultAdmin)
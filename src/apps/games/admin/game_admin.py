@@ -92,3 +92,22 @@ class TrainingGameAdmin(admin.ModelAdmin):
         if is_creating_a_new_game:
             obj.submitted_by = request.user
         super().save_model(request, obj, form, change)
+
+
+class RatingGamePairResultAdmin(admin.ModelAdmin):
+    """
+    RatingGamePairResultAdmin allows admin to browse the results of rating games per pair of networks, they are maintained automatically
+    """
+
+    list_filter = ("run",)
+    list_display = (
+        "run",
+        "white_network",
+        "black_network",
+        "total_games",
+        "total_wins_white",
+        "total_wins_black",
+        "total_draw_or_no_result",
+    )
+    readonly_fields = ("run", "white_network", "black_network", "total_games", "total_wins_white", "total_wins_black", "total_draw_or_no_result")
+    ordering = ("pk",)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from src.apps.games.models import RatingGamePairResult
+from src.apps.runs.models import Run
+
+
+class Command(BaseCommand):
+    help = "Recount the rating game pair results, used by the Elo ratings, from the rating games"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--run", help="Name of the run to rebuild, every run if not given")
+
+    def handle(self, *args, **options):
+        run = None
+        if options["run"] is not None:
+            run = Run.objects.filter(name=options["run"]).first()
+            if run is None:
+                raise CommandError(f"Run {options['run']} does not exist")
+
+        number_of_pair_results = RatingGamePairResult.objects.rebuild(run)
+        self.stdout.write(f"Rebuilt {number_of_pair_results} rating game pair results")
@@ -0,0 +1,20 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Manager
+
+
+class RatingGameManager(Manager):
+    """
+    RatingGameManager counts rating games created in bulk in their pair results, and sends rating_games_created,
+    like the signals do for games saved one by one.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from src.apps.games.signals import send_rating_games_created
+
+        RatingGamePairResult = apps.get_model("games.RatingGamePairResult")
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            RatingGamePairResult.objects.add_games(objs)
+            send_rating_games_created(objs)
+        return objs
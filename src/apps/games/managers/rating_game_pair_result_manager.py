@@ -0,0 +1,92 @@
+from django.apps import apps
+from django.db import connections, transaction
+from django.db.models import Manager, Count, Q
+
+from src.apps.runs.models import Run
+
+
+class RatingGamePairResultManager(Manager):
+    """
+    RatingGamePairResultManager keeps the rating game pair results in sync with the rating games.
+    """
+
+    def add_games(self, games, sign=1):
+        """
+        Count rating games in the results of their pair, creating the pairs that do not exist yet.
+        Run it in the same transaction as the creation of the games, so that the pair results never miss a committed game.
+
+        :param games: the rating games
+        :param sign: 1 to count the games, -1 to uncount games that are deleted
+        """
+        RatingGame = apps.get_model("games.RatingGame")
+        pair_results = {}
+        for game in games:
+            pair_result = pair_results.setdefault((game.run_id, game.white_network_id, game.black_network_id), [0, 0, 0, 0])
+            pair_result[0] += sign
+            if game.winner == RatingGame.GamesResult.WHITE:
+                pair_result[1] += sign
+            elif game.winner == RatingGame.GamesResult.BLACK:
+                pair_result[2] += sign
+            else:
+                pair_result[3] += sign
+        if not pair_results:
+            return
+
+        # Rows are upserted in a consistent order, so that concurrent uploads cannot deadlock each other
+        params = [value for pair, counts in sorted(pair_results.items()) for value in (*pair, *counts)]
+        values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(pair_results))
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (run_id, white_network_id, black_network_id, total_games, total_wins_white, total_wins_black, total_draw_or_no_result) "
+                f"VALUES {values} "
+                f"ON CONFLICT (run_id, white_network_id, black_network_id) DO UPDATE SET "
+                f"total_games = {table}.total_games + EXCLUDED.total_games, "
+                f"total_wins_white = {table}.total_wins_white + EXCLUDED.total_wins_white, "
+                f"total_wins_black = {table}.total_wins_black + EXCLUDED.total_wins_black, "
+                f"total_draw_or_no_result = {table}.total_draw_or_no_result + EXCLUDED.total_draw_or_no_result",
+                params,
+            )
+
+    def rebuild(self, run: Run = None):
+        """
+        Recount the pair results from the rating games, of a run or of every run.
+        Rating games uploaded meanwhile wait for the rebuild to finish, so none of them is lost or counted twice.
+
+        :return: the number of pair results
+        """
+        RatingGame = apps.get_model("games.RatingGame")
+        games = RatingGame.objects.all() if run is None else RatingGame.objects.filter(run=run)
+        pair_results = self.all() if run is None else self.filter(run=run)
+
+        with transaction.atomic(using=self.db):
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(f"LOCK TABLE {self.model._meta.db_table} IN EXCLUSIVE MODE")
+            pair_results.delete()
+
+            counts = (
+                games.values("run", "white_network", "black_network")
+                .order_by()
+                .annotate(
+                    total_games=Count("id"),
+                    total_wins_white=Count("id", filter=Q(winner=RatingGame.GamesResult.WHITE)),
+                    total_wins_black=Count("id", filter=Q(winner=RatingGame.GamesResult.BLACK)),
+                    total_draw_or_no_result=Count("id", filter=Q(winner=RatingGame.GamesResult.DRAW) | Q(winner=RatingGame.GamesResult.NO_RESULT)),
+                )
+            )
+            new_pair_results = self.bulk_create(
+                [
+                    self.model(
+                        run_id=count["run"],
+                        white_network_id=count["white_network"],
+                        black_network_id=count["black_network"],
+                        total_games=count["total_games"],
+                        total_wins_white=count["total_wins_white"],
+                        total_wins_black=count["total_wins_black"],
+                        total_draw_or_no_result=count["total_draw_or_no_result"],
+                    )
+                    for count in counts.iterator()
+                ],
+                batch_size=1000,
+            )
+        return len(new_pair_results)
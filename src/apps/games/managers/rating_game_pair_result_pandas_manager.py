@@ -0,0 +1,20 @@
+from django.db.models import Manager
+
+from src.apps.games.managers.tournament_results import get_detailed_tournament_results_dataframe, get_pair_results_dataframe
+from src.apps.runs.models import Run
+
+
+class RatingGamePairResultPandasManager(Manager):
+    """
+    RatingGamePairResultPandasManager generates the same tournament result as RatingGamePandasManager, from the rating game pair results:
+    one query returning one row per pair of networks that played, whatever the number of games.
+    """
+
+    def get_detailed_tournament_results_dataframe(self, run: Run):
+        pair_results = (
+            self.get_queryset()
+            .filter(run=run, total_games__gt=0)
+            .order_by()
+            .values_list("white_network_id", "black_network_id", "total_games", "total_wins_white", "total_wins_black", "total_draw_or_no_result")
+        )
+        return get_detailed_tournament_results_dataframe(get_pair_results_dataframe(pair_results))
@@ -1,11 +1,10 @@
 import logging
-import pandas
 from django.db.models import Manager
-from django_pandas.io import read_frame
 from datetime import datetime, timedelta
 from django.utils import timezone
 
 from src.apps.games.managers.rating_game_pandas_queryset import RatingGamePandasQuerySet
+from src.apps.games.managers.tournament_results import get_detailed_tournament_results_dataframe, get_pair_results_dataframe
 from src.apps.runs.models import Run
 
 logger = logging.getLogger(__name__)
@@ -38,47 +37,20 @@ class RatingGamePandasManager(Manager):
     def get_queryset(self):
         return RatingGamePandasQuerySet(self.model, using=self._db)
 
-    def get_detailed_tournament_results_dataframe(self, run: Run, for_tests=False):
+    @staticmethod
+    def _get_before_time(for_tests):
         # Avoid a race condition where games might be inserted in the middle of us doing these queries
         # by picking a fixed time cutoff slightly in the past and only asking for things older than that
         # During tests though, don't, so that we don't have to sleep in the test.
         if for_tests:
-            before_time = timezone.now() + timedelta(seconds=1)
+            return timezone.now() + timedelta(seconds=1)
         else:
-            before_time = timezone.now() - timedelta(seconds=15)
-
-        queryset = self.get_queryset()
+            return timezone.now() - timedelta(seconds=15)
 
-        tournament_results = read_frame(queryset.get_total_games_count_as_white(run,before_time))
-        tournament_results = pandas.merge(
-            tournament_results,
-            read_frame(queryset.get_total_games_count_as_black(run,before_time)),
-            how="outer",
-            on=["reference_network", "opponent_network"],
-        )
-        tournament_results = pandas.merge(
-            tournament_results,
-            read_frame(queryset.get_total_wins_count_as_white(run,before_time)),
-            how="outer",
-            on=["reference_network", "opponent_network"],
-        )
-        tournament_results = pandas.merge(
-            tournament_results,
-            read_frame(queryset.get_total_wins_count_as_black(run,before_time)),
-            how="outer",
-            on=["reference_network", "opponent_network"],
-        )
-        tournament_results = pandas.merge(
-            tournament_results,
-            read_frame(queryset.get_total_draw_or_no_result_as_white(run,before_time)),
-            how="outer",
-            on=["reference_network", "opponent_network"],
-        )
-        tournament_results = pandas.merge(
-            tournament_results,
-            read_frame(queryset.get_total_draw_or_no_result_as_black(run,before_time)),
-            how="outer",
-            on=["reference_network", "opponent_network"],
-        )
-        tournament_results.fillna(0, inplace=True)
-        return tournament_results
+    def get_detailed_tournament_results_dataframe(self, run: Run, for_tests=False):
+        """
+        :param run: the run to compute the tournament of
+        :param for_tests: do not skip the most recent games, so that tests don't have to sleep
+        """
+        pair_results = self.get_queryset().get_pair_results(run, self._get_before_time(for_tests))
+        return get_detailed_tournament_results_dataframe(get_pair_results_dataframe(pair_results))
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas
+
+PAIR_RESULTS_COLUMNS = ["white_network", "black_network", "total_games", "total_wins_white", "total_wins_black", "total_draw_or_no_result"]
+
+DETAILED_TOURNAMENT_RESULTS_COLUMNS = [
+    "reference_network",
+    "opponent_network",
+    "total_games_white",
+    "total_games_black",
+    "total_wins_white",
+    "total_wins_black",
+    "total_draw_or_no_result_white",
+    "total_draw_or_no_result_black",
+]
+
+
+def get_pair_results_dataframe(pair_results):
+    """
+    :param pair_results: rows of (white_network, black_network, total_games, total_wins_white, total_wins_black, total_draw_or_no_result)
+    :return: the pair results as a frame of integers, with the columns PAIR_RESULTS_COLUMNS
+    """
+    return pandas.DataFrame.from_records(list(pair_results), columns=PAIR_RESULTS_COLUMNS).astype(np.int64)
+
+
+def get_detailed_tournament_results_dataframe(pair_results: pandas.DataFrame):
+    """
+    Every game is counted both ways, once with the white network as reference and once with the black network as reference,
+    and the two networks of a pair share a single row per reference network, whichever played white.
+
+    :param pair_results: a frame with the columns PAIR_RESULTS_COLUMNS, at most one row per (white_network, black_network)
+    :return: the detailed tournament results, one row per (reference_network, opponent_network), with the columns DETAILED_TOURNAMENT_RESULTS_COLUMNS
+    """
+    number_of_pairs = len(pair_results)
+    white_network = pair_results["white_network"].to_numpy(dtype=np.int64)
+    black_network = pair_results["black_network"].to_numpy(dtype=np.int64)
+    reference_network = np.concatenate([white_network, black_network])
+    opponent_network = np.concatenate([black_network, white_network])
+
+    # Columns of DETAILED_TOURNAMENT_RESULTS_COLUMNS after the pair, as white for the first half of the rows and as black for the second
+    counts = np.zeros((2 * number_of_pairs, 6), dtype=np.int64)
+    counts[:number_of_pairs, 0] = pair_results["total_games"]
+    counts[number_of_pairs:, 1] = pair_results["total_games"]
+    counts[:number_of_pairs, 2] = pair_results["total_wins_white"]
+    counts[number_of_pairs:, 3] = pair_results["total_wins_black"]
+    counts[:number_of_pairs, 4] = pair_results["total_draw_or_no_result"]
+    counts[number_of_pairs:, 5] = pair_results["total_draw_or_no_result"]
+
+    # Sum the rows of the same (reference_network, opponent_network), adjacent once sorted
+    order = np.lexsort((opponent_network, reference_network))
+    reference_network, opponent_network, counts = reference_network[order], opponent_network[order], counts[order]
+    is_first_of_pair = np.ones(len(order), dtype=bool)
+    is_first_of_pair[1:] = (reference_network[1:] != reference_network[:-1]) | (opponent_network[1:] != opponent_network[:-1])
+    first_of_pair = np.flatnonzero(is_first_of_pair)
+    if len(first_of_pair) > 0:
+        counts = np.add.reduceat(counts, first_of_pair, axis=0)
+
+    tournament_results = pandas.DataFrame(counts, columns=DETAILED_TOURNAMENT_RESULTS_COLUMNS[2:])
+    tournament_results.insert(0, "reference_network", reference_network[first_of_pair])
+    tournament_results.insert(1, "opponent_network", opponent_network[first_of_pair])
+    return tournament_results
@@ -0,0 +1,69 @@
+# Generated by Django 3.0.6 on 2026-10-18 06:58
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def count_existing_rating_games(apps, schema_editor):
+    RatingGame = apps.get_model("games", "RatingGame")
+    RatingGamePairResult = apps.get_model("games", "RatingGamePairResult")
+    counts = (
+        RatingGame.objects.values("run", "white_network", "black_network")
+        .order_by()
+        .annotate(
+            total_games=Count("id"),
+            total_wins_white=Count("id", filter=Q(winner="W")),
+            total_wins_black=Count("id", filter=Q(winner="B")),
+            total_draw_or_no_result=Count("id", filter=Q(winner="0") | Q(winner="-")),
+        )
+    )
+    RatingGamePairResult.objects.bulk_create(
+        [
+            RatingGamePairResult(
+                run_id=count["run"],
+                white_network_id=count["white_network"],
+                black_network_id=count["black_network"],
+                total_games=count["total_games"],
+                total_wins_white=count["total_wins_white"],
+                total_wins_black=count["total_wins_black"],
+                total_draw_or_no_result=count["total_draw_or_no_result"],
+            )
+            for count in counts.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0009_run_elo_solver'),
+        ('trainings', '0009_auto_20200921_0314'),
+        ('games', '0007_auto_20200907_1653'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingGamePairResult',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('total_games', models.IntegerField(default=0, verbose_name='total games')),
+                ('total_wins_white', models.IntegerField(default=0, verbose_name='total wins as white')),
+                ('total_wins_black', models.IntegerField(default=0, verbose_name='total wins as black')),
+                ('total_draw_or_no_result', models.IntegerField(default=0, verbose_name='total draws or no results')),
+                ('black_network', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_game_pair_results_as_black', to='trainings.Network', verbose_name='black player network')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_game_pair_results', to='runs.Run', verbose_name='run')),
+                ('white_network', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_game_pair_results_as_white', to='trainings.Network', verbose_name='white player network')),
+            ],
+            options={
+                'verbose_name': 'Rating game pair result',
+                'ordering': ['run', 'white_network', 'black_network'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ratinggamepairresult',
+            constraint=models.UniqueConstraint(fields=('run', 'white_network', 'black_network'), name='unique_rating_game_pair_result'),
+        ),
+        migrations.RunPython(count_existing_rating_games, migrations.RunPython.noop),
+    ]
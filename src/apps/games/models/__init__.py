@@ -1,3 +1,4 @@
 from .rating_game import RatingGame
+from .rating_game_pair_result import RatingGamePairResult
 from .training_game import TrainingGame, upload_training_data_to, validate_game_npzdata
 from .abstract_game import upload_sgf_to
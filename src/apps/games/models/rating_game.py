@@ -1,6 +1,6 @@
-from django.db.models import Manager
 from django.utils.translation import gettext_lazy as _
 
+from src.apps.games.managers.rating_game_manager import RatingGameManager
 from src.apps.games.managers.rating_game_pandas_manager import RatingGamePandasManager
 from src.apps.games.models.abstract_game import AbstractGame
 
@@ -10,7 +10,7 @@ class RatingGame(AbstractGame):
     A rating game involves two different networks and is not used for training but for strength estimation
     """
 
-    objects = Manager()
+    objects = RatingGameManager()
     pandas = RatingGamePandasManager()
 
     class Meta:
@@ -0,0 +1,49 @@
+from django.db.models import (
+    Model,
+    IntegerField,
+    ForeignKey,
+    CASCADE,
+    BigAutoField,
+    UniqueConstraint,
+)
+from django.utils.translation import gettext_lazy as _
+
+from src.apps.games.managers.rating_game_pair_result_manager import RatingGamePairResultManager
+from src.apps.games.managers.rating_game_pair_result_pandas_manager import RatingGamePairResultPandasManager
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+
+
+class RatingGamePairResult(Model):
+    """
+    The results of all the rating games played between a white network and a black network, kept up to date
+    in the same transaction as the rating games, so that the Elo ratings are computed from one row per pair of networks
+    instead of counting every game.
+
+    They can be recomputed from the rating games with the rebuild_rating_game_pair_results command.
+    """
+
+    objects = RatingGamePairResultManager()
+    pandas = RatingGamePairResultPandasManager()
+
+    class Meta:
+        verbose_name = _("Rating game pair result")
+        ordering = ["run", "white_network", "black_network"]
+        constraints = [UniqueConstraint(fields=["run", "white_network", "black_network"], name="unique_rating_game_pair_result")]
+
+    id = BigAutoField(primary_key=True)
+    run = ForeignKey(Run, verbose_name=_("run"), on_delete=CASCADE, related_name="rating_game_pair_results", db_index=True,)
+    white_network = ForeignKey(
+        Network, verbose_name=_("white player network"), on_delete=CASCADE, related_name="rating_game_pair_results_as_white", db_index=True,
+    )
+    black_network = ForeignKey(
+        Network, verbose_name=_("black player network"), on_delete=CASCADE, related_name="rating_game_pair_results_as_black", db_index=True,
+    )
+
+    total_games = IntegerField(_("total games"), default=0)
+    total_wins_white = IntegerField(_("total wins as white"), default=0)
+    total_wins_black = IntegerField(_("total wins as black"), default=0)
+    total_draw_or_no_result = IntegerField(_("total draws or no results"), default=0)
+
+    def __str__(self):
+        return f"{self.white_network_id} vs {self.black_network_id} ({self.total_wins_white}-{self.total_wins_black}-{self.total_draw_or_no_result})"
@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from src.apps.games.models import RatingGame, RatingGamePairResult
+
+# Sent once the transaction creating some rating games is committed, with the run, the number of games created in it and the games
+rating_games_created = Signal(providing_args=["run", "number_of_games", "games"])
+
+
+def send_rating_games_created(games):
+    """
+    Send rating_games_created, once per run, when the current transaction commits, if it does
+    """
+    games_per_run = {}
+    for game in games:
+        games_per_run.setdefault(game.run_id, []).append(game)
+
+    def send():
+        for run_games in games_per_run.values():
+            rating_games_created.send(sender=RatingGame, run=run_games[0].run, number_of_games=len(run_games), games=run_games)
+
+    transaction.on_commit(send)
+
+
+def _get_pair_result_key(game):
+    return game.run_id, game.white_network_id, game.black_network_id, game.winner
+
+
+@receiver(pre_save, sender=RatingGame)
+def remember_previous_rating_game_result(sender, instance, raw, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._previous_rating_game = RatingGame.objects.filter(pk=instance.pk).only("run", "white_network", "black_network", "winner").first()
+
+
+@receiver(post_save, sender=RatingGame)
+def count_rating_game_in_pair_result(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        RatingGamePairResult.objects.add_games([instance])
+        send_rating_games_created([instance])
+        return
+
+    previous_game = getattr(instance, "_previous_rating_game", None)
+    if previous_game is not None and _get_pair_result_key(previous_game) != _get_pair_result_key(instance):
+        RatingGamePairResult.objects.add_games([previous_game], sign=-1)
+        RatingGamePairResult.objects.add_games([instance])
+
+
+@receiver(post_delete, sender=RatingGame)
+def uncount_rating_game_in_pair_result(sender, instance, **kwargs):
+    RatingGamePairResult.objects.add_games([instance], sign=-1)
@@ -0,0 +1,90 @@
+import pytest
+
+from django.contrib.auth import get_user_model
+
+from src.apps.runs.models import Run
+from src.apps.games.models import RatingGame, RatingGamePairResult
+from src.apps.trainings.models import Network
+
+pytestmark = pytest.mark.django_db
+
+User = get_user_model()
+
+fake_sha256 = "12341234abcdabcd56785678abcdabcd12341234abcdabcd56785678abcdabcd"
+
+
+class TestRatingGamePairResult:
+
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(name="testrun", rating_game_probability=0.0, status="Active")
+        self.n1 = Network.objects.create(
+            run=self.r1, name="testrun-randomnetwork", model_file="", model_file_bytes=0, model_file_sha256=fake_sha256, is_random=True,
+        )
+        self.n2 = Network.objects.create(
+            run=self.r1, name="testrun-randomnetwork2", model_file="", model_file_bytes=0, model_file_sha256=fake_sha256, is_random=True,
+        )
+
+    def teardown_method(self):
+        RatingGame.objects.all().delete()
+        self.n2.delete()
+        self.n1.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    def make_game(self, winner, white_network, black_network):
+        return RatingGame(run=self.r1, submitted_by=self.u1, winner=winner, white_network=white_network, black_network=black_network)
+
+    def get_pair_results(self):
+        return sorted(
+            RatingGamePairResult.objects.values_list(
+                "white_network", "black_network", "total_games", "total_wins_white", "total_wins_black", "total_draw_or_no_result",
+            )
+        )
+
+    def test_counts_created_games(self):
+        self.make_game(RatingGame.GamesResult.WHITE, self.n1, self.n2).save()
+        RatingGame.objects.bulk_create([
+            self.make_game(RatingGame.GamesResult.BLACK, self.n1, self.n2),
+            self.make_game(RatingGame.GamesResult.DRAW, self.n1, self.n2),
+            self.make_game(RatingGame.GamesResult.NO_RESULT, self.n2, self.n1),
+        ])
+        assert(self.get_pair_results() == sorted([(self.n1.pk, self.n2.pk, 3, 1, 1, 1), (self.n2.pk, self.n1.pk, 1, 0, 0, 1)]))
+
+    def test_follows_updated_and_deleted_games(self):
+        game = self.make_game(RatingGame.GamesResult.WHITE, self.n1, self.n2)
+        game.save()
+        self.make_game(RatingGame.GamesResult.WHITE, self.n1, self.n2).save()
+
+        game.winner = RatingGame.GamesResult.BLACK
+        game.save()
+        assert(self.get_pair_results() == [(self.n1.pk, self.n2.pk, 2, 1, 1, 0)])
+
+        game.delete()
+        assert(self.get_pair_results() == [(self.n1.pk, self.n2.pk, 1, 1, 0, 0)])
+
+    def test_rebuild(self):
+        RatingGame.objects.bulk_create([
+            self.make_game(RatingGame.GamesResult.WHITE, self.n1, self.n2),
+            self.make_game(RatingGame.GamesResult.BLACK, self.n2, self.n1),
+        ])
+        expected_pair_results = self.get_pair_results()
+        RatingGamePairResult.objects.update(total_games=0)
+
+        assert(RatingGamePairResult.objects.rebuild(self.r1) == 2)
+        assert(self.get_pair_results() == expected_pair_results)
+
+    def test_same_tournament_results_as_rating_games(self):
+        RatingGame.objects.bulk_create([
+            self.make_game(RatingGame.GamesResult.WHITE, self.n1, self.n2),
+            self.make_game(RatingGame.GamesResult.BLACK, self.n1, self.n2),
+            self.make_game(RatingGame.GamesResult.DRAW, self.n2, self.n1),
+            self.make_game(RatingGame.GamesResult.WHITE, self.n2, self.n1),
+        ])
+        pair_columns = ["reference_network", "opponent_network"]
+        from_rating_games = RatingGame.pandas.get_detailed_tournament_results_dataframe(self.r1, for_tests=True)
+        from_pair_results = RatingGamePairResult.pandas.get_detailed_tournament_results_dataframe(self.r1)
+
+        from_rating_games = from_rating_games.sort_values(pair_columns).reset_index(drop=True).astype(int)
+        from_pair_results = from_pair_results.sort_values(pair_columns).reset_index(drop=True)[from_rating_games.columns].astype(int)
+        assert(from_rating_games.equals(from_pair_results))
@@ -0,0 +1,40 @@
+import pandas
+
+from src.apps.games.managers.tournament_results import get_detailed_tournament_results_dataframe, PAIR_RESULTS_COLUMNS
+
+
+class TestDetailedTournamentResults:
+
+    def test_every_game_is_counted_both_ways(self):
+        pair_results = pandas.DataFrame(
+            [
+                (1, 2, 10, 6, 3, 1),
+                (2, 1, 4, 1, 2, 1),
+                (2, 3, 5, 5, 0, 0),
+            ],
+            columns=PAIR_RESULTS_COLUMNS,
+        )
+        tournament_results = get_detailed_tournament_results_dataframe(pair_results)
+
+        assert(tournament_results.values.tolist() == [
+            # reference, opponent, games as white, games as black, wins as white, wins as black, draws as white, draws as black
+            [1, 2, 10, 4, 6, 2, 1, 1],
+            [2, 1, 4, 10, 1, 3, 1, 1],
+            [2, 3, 5, 0, 5, 0, 0, 0],
+            [3, 2, 0, 5, 0, 0, 0, 0],
+        ])
+
+    def test_no_games(self):
+        tournament_results = get_detailed_tournament_results_dataframe(pandas.DataFrame([], columns=PAIR_RESULTS_COLUMNS))
+
+        assert(len(tournament_results) == 0)
+        assert(list(tournament_results.columns) == [
+            "reference_network",
+            "opponent_network",
+            "total_games_white",
+            "total_games_black",
+            "total_wins_white",
+            "total_wins_black",
+            "total_draw_or_no_result_white",
+            "total_draw_or_no_result_black",
+        ])
@@ -19,10 +19,15 @@ class RunAdmin(admin.ModelAdmin):
                     "max_search_threads_allowed",
                     "rating_game_probability",
                     "rating_game_high_elo_probability",
+                    "rating_game_scheduler",
                     "rating_game_entropy_scale",
                     "selfplay_startpos_probability",
                     "virtual_draw_strength",
+                    "elo_solver",
                     "elo_number_of_iterations",
+                    "elo_convergence_tolerance",
+                    "elo_refresh_games_threshold",
+                    "elo_refresh_max_staleness",
                     "selfplay_client_config",
                     "rating_client_config",
                     "git_revision_hash_whitelist",
@@ -0,0 +1,19 @@
+# Generated by Django 3.0.6 on 2026-10-18 06:39
+
+from django.db import migrations, models
+import src.apps.runs.models.run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0007_auto_20200920_2128'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='elo_convergence_tolerance',
+            field=models.FloatField(default=0.0, help_text='Stop Elo iterations early once no log_gamma moves by more than this in an iteration. 0 to always use the full number of iterations.', validators=[src.apps.runs.models.run.validate_positive], verbose_name='Elo computation convergence tolerance'),
+        ),
+    ]
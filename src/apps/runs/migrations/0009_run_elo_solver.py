@@ -0,0 +1,18 @@
+# Generated by Django 3.0.6 on 2026-10-18 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0008_run_elo_convergence_tolerance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='elo_solver',
+            field=models.CharField(choices=[('MM', 'Minorization-maximization'), ('Newton', 'Newton')], default='MM', help_text='Minorization-maximization is robust but slow on long parent chains, Newton needs far fewer iterations on large runs.', max_length=15, verbose_name='Elo computation solver'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.0.6 on 2026-10-18 07:11
+
+from django.db import migrations, models
+import src.apps.runs.models.run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0009_run_elo_solver'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='elo_refresh_games_threshold',
+            field=models.IntegerField(default=0, help_text='Refresh Elos as soon as this many rating games were uploaded since the last refresh. 0 to only refresh on the periodic schedule.', validators=[src.apps.runs.models.run.validate_positive], verbose_name='Elo refresh games threshold'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='elo_refresh_max_staleness',
+            field=models.IntegerField(default=0, help_text='Refresh Elos when rating games were uploaded and the last refresh is older than this many seconds. 0 to only refresh on the periodic schedule.', validators=[src.apps.runs.models.run.validate_positive], verbose_name='Elo refresh max staleness'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.6 on 2026-10-18 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0010_run_elo_refresh_trigger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='rating_game_scheduler',
+            field=models.CharField(choices=[('Weighted', 'Top upper confidence or uncertainty'), ('Uncertainty', 'Expected uncertainty reduction')], default='Weighted', help_text='How to pair networks for rating games. Expected uncertainty reduction accounts for the rating games in flight, and spends rating games where they reduce the uncertainty of the networks the most per client time, the high Elo probability being how much to focus on the networks that may be the best.', max_length=15, verbose_name='Rating game scheduler'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.0.6 on 2026-10-18 07:37
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+def parse_existing_git_revision_hash_whitelists(apps, schema_editor):
+    # Historical models do not have Run.save, the whitelist is parsed like it does
+    Run = apps.get_model("runs", "Run")
+    for run in Run.objects.all():
+        git_revision_hashes = (line.split("#")[0].strip().lower() for line in run.git_revision_hash_whitelist.split("\n"))
+        run.git_revision_hashes = sorted({git_revision_hash for git_revision_hash in git_revision_hashes if len(git_revision_hash) > 0})
+        run.save(update_fields=["git_revision_hashes"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0011_run_rating_game_scheduler'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='git_revision_hashes',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=list, editable=False, help_text='Sorted lower case hashes of the whitelist, without comments nor blank lines, set on save.', verbose_name='Parsed allowed client git revisions'),
+        ),
+        migrations.RunPython(parse_existing_git_revision_hash_whitelists, migrations.RunPython.noop),
+    ]
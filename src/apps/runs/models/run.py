@@ -15,6 +15,7 @@ from django.db.models import (
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
+from django.contrib.postgres.fields import JSONField
 
 class RunQuerySet(QuerySet):
     def select_current(self):
@@ -25,6 +26,14 @@ class RunQuerySet(QuerySet):
         """
         return self.filter(status=Run.RunStatus.ACTIVE).order_by("-created_at").first()
 
+    def select_active(self):
+        """
+        Select every active run, the current one and concurrent experiments
+
+        :return: the active runs, oldest first
+        """
+        return self.filter(status=Run.RunStatus.ACTIVE).order_by("created_at")
+
 
 alphanumeric = RegexValidator(r"^[0-9a-zA-Z]*$", "Only alphanumeric characters are allowed.")
 
@@ -36,6 +45,15 @@ def validate_probability(value):
             params={'value': value},
         )
 
+def parse_git_revision_hash_whitelist(git_revision_hash_whitelist):
+    """
+    :param git_revision_hash_whitelist: newline-separated git revision hashes, with # comments
+    :return: the set of lower case hashes
+    """
+    git_revision_hashes = (line.split("#")[0].strip().lower() for line in git_revision_hash_whitelist.split("\n"))
+    return frozenset(git_revision_hash for git_revision_hash in git_revision_hashes if len(git_revision_hash) > 0)
+
+
 def validate_positive(value):
     if np.isnan(value) or value < 0:
         raise ValidationError(
@@ -60,6 +78,14 @@ class Run(Model):
         ACTIVE = "Active", _("Active")
         INACTIVE = "Inactive", _("Inactive")
 
+    class RatingGameScheduler(TextChoices):
+        WEIGHTED = "Weighted", _("Top upper confidence or uncertainty")
+        UNCERTAINTY_REDUCTION = "Uncertainty", _("Expected uncertainty reduction")
+
+    class EloSolver(TextChoices):
+        MINORIZATION_MAXIMIZATION = "MM", _("Minorization-maximization")
+        NEWTON = "Newton", _("Newton")
+
     id = AutoField(primary_key=True)
     created_at = DateTimeField(_("creation date"), auto_now_add=True, db_index=True)
     status = CharField(_("run status"), max_length=15, choices=RunStatus.choices, db_index=True, default=RunStatus.INACTIVE,)
@@ -109,6 +135,13 @@ class Run(Model):
         default=0.0,
         validators=[validate_probability],
     )
+    rating_game_scheduler = CharField(
+        _("Rating game scheduler"),
+        max_length=15,
+        choices=RatingGameScheduler.choices,
+        default=RatingGameScheduler.WEIGHTED,
+        help_text=_("How to pair networks for rating games. Expected uncertainty reduction accounts for the rating games in flight, and spends rating games where they reduce the uncertainty of the networks the most per client time, the high Elo probability being how much to focus on the networks that may be the best."),
+    )
     rating_game_entropy_scale = FloatField(
         _("Rating game entropy scale"),
         help_text=_("Rating games normally choose opponent based on entropy of predicted result, set larger to add more variability, smaller to scale it down."),
@@ -127,9 +160,40 @@ class Run(Model):
         default=10,
         validators=[validate_positive],
     )
+    elo_solver = CharField(
+        _("Elo computation solver"),
+        max_length=15,
+        choices=EloSolver.choices,
+        default=EloSolver.MINORIZATION_MAXIMIZATION,
+        help_text=_("Minorization-maximization is robust but slow on long parent chains, Newton needs far fewer iterations on large runs."),
+    )
+    elo_convergence_tolerance = FloatField(
+        _("Elo computation convergence tolerance"),
+        help_text=_("Stop Elo iterations early once no log_gamma moves by more than this in an iteration. 0 to always use the full number of iterations."),
+        default=0.0,
+        validators=[validate_positive],
+    )
+    elo_refresh_games_threshold = IntegerField(
+        _("Elo refresh games threshold"),
+        help_text=_("Refresh Elos as soon as this many rating games were uploaded since the last refresh. 0 to only refresh on the periodic schedule."),
+        default=0,
+        validators=[validate_positive],
+    )
+    elo_refresh_max_staleness = IntegerField(
+        _("Elo refresh max staleness"),
+        help_text=_("Refresh Elos when rating games were uploaded and the last refresh is older than this many seconds. 0 to only refresh on the periodic schedule."),
+        default=0,
+        validators=[validate_positive],
+    )
     selfplay_client_config = TextField(_("Selfplay game config"), help_text=_("Client config for selfplay games."), default="FILL ME",)
     rating_client_config = TextField(_("Rating game config"), help_text=_("Client config for rating games."), default="FILL ME",)
     git_revision_hash_whitelist = TextField(_("Allowed client git revisions"), help_text=_("Newline-separated whitelist of allowed client git revision hashes, hash comments."), default="",)
+    git_revision_hashes = JSONField(
+        _("Parsed allowed client git revisions"),
+        help_text=_("Sorted lower case hashes of the whitelist, without comments nor blank lines, set on save."),
+        default=list,
+        editable=False,
+    )
     startpos_locked = BooleanField(
         _("StartPoses being updated?"),
         help_text=_("Are startposes in the middle of being updated?."),
@@ -143,3 +207,11 @@ class Run(Model):
 
     def __str__(self):
         return f"{self.name}"
+
+    def save(self, *args, **kwargs):
+        # The whitelist is parsed once here, not on every task request
+        self.git_revision_hashes = sorted(parse_git_revision_hash_whitelist(self.git_revision_hash_whitelist))
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "git_revision_hash_whitelist" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "git_revision_hashes"}
+        super().save(*args, **kwargs)
@@ -0,0 +1 @@
+from .current_run_cache import CurrentRun, CurrentRunCacheService
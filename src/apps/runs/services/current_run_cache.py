@@ -0,0 +1,55 @@
+from src.apps.runs.models import Run
+from src.contrib.versioned_cache import VersionedCache
+
+
+class CurrentRun:
+    """
+    The current run, with what clients are served of it prepared once: its client fields serialized and its parsed git whitelist
+    """
+
+    def __init__(self, run: Run):
+        from src.apps.runs.serializers import RunSerializerForClient
+
+        self.run = run
+        # Without request, the url is relative, see get_client_data
+        self._client_data = dict(RunSerializerForClient(run, context={"request": None}).data)
+        self.git_revision_hash_whitelist = frozenset(run.git_revision_hashes)
+
+    def get_client_data(self, request):
+        """
+        :return: the same data as RunSerializerForClient(run, context={"request": request}).data
+        """
+        client_data = dict(self._client_data)
+        client_data["url"] = request.build_absolute_uri(client_data["url"])
+        return client_data
+
+
+class CurrentRunCacheService:
+    """
+    CurrentRunCacheService keeps the current run ready to serve clients, without querying the db on every request.
+
+    The current run is shared by every process through the cache, under a version token, and kept in each process in front of it:
+    getting the current run costs one cache read as long as the token does not change, ie as long as no run is saved or deleted.
+    """
+
+    # Per process and in the shared cache, the current run or None if there is no active run
+    _current_run = VersionedCache("runs:current_run", shared=True)
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Make every process get the current run again, see VersionedCache.invalidate
+        """
+        cls._current_run.invalidate()
+
+    @staticmethod
+    def _build():
+        run = Run.objects.select_current()
+        return None if run is None else CurrentRun(run)
+
+    @classmethod
+    def get(cls):
+        """
+        :return: the CurrentRun, None if there is no active run
+        """
+        return cls._current_run.get(None, cls._build, timeout=24 * 60 * 60)
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from src.apps.runs.models import Run
+from src.apps.runs.services import CurrentRunCacheService
+
+
+@receiver(post_save, sender=Run)
+@receiver(post_delete, sender=Run)
+def invalidate_current_run(sender, **kwargs):
+    CurrentRunCacheService.invalidate()
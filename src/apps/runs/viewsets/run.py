@@ -6,7 +6,8 @@ from rest_framework.response import Response
 from src.contrib.permission import ReadOnly
 
 from src.apps.runs.models import Run
-from src.apps.runs.serializers import RunSerializer, RunSerializerForClient
+from src.apps.runs.serializers import RunSerializer
+from src.apps.runs.services import CurrentRunCacheService
 
 
 class RunViewSet(viewsets.ModelViewSet):
@@ -26,8 +27,7 @@ class RunViewSet(viewsets.ModelViewSet):
         API endpoint that gives only the fields of a run that self-play clients need.
         :return:
         """
-        current_run = Run.objects.select_current()
+        current_run = CurrentRunCacheService.get()
         if current_run is None:
             return Response({"error": "No active run."}, status=status.HTTP_404_NOT_FOUND)
-        run_content = RunSerializerForClient(current_run, context={"request": request})
-        return Response(run_content.data)
+        return Response(current_run.get_client_data(request))
@@ -21,8 +21,13 @@ from django.core.exceptions import ValidationError
 from src.apps.runs.models import Run
 
 class StartPosQuerySet(QuerySet):
-    def select_weighted_random(self):
-        current_run = Run.objects.select_current()
+    def select_weighted_random(self, current_run=None):
+        """
+        :param current_run: the current run, if the caller already has it
+        :return: a startpos of the current run picked at random according to the weights, None if there is none
+        """
+        if current_run is None:
+            current_run = Run.objects.select_current()
         if current_run is None:
             return None
         if current_run.startpos_locked:
@@ -33,6 +38,25 @@ class StartPosQuerySet(QuerySet):
         r = random.random() * total_weight
         return self.filter(run=current_run,cumulative_weight__gte=r).order_by("cumulative_weight").first()
 
+    def select_weighted_randoms(self, current_run, number_of_startposes):
+        """
+        :param current_run: the current run
+        :param number_of_startposes: the number of startposes to pick, independently of each other
+        :return: a list of startposes of the current run picked at random according to the weights, with a single query, empty if there is none
+        """
+        if number_of_startposes <= 0 or current_run.startpos_locked:
+            return []
+        total_weight = current_run.startpos_total_weight
+        if total_weight <= 0:
+            return []
+        picks = [
+            self.filter(run=current_run, cumulative_weight__gte=random.random() * total_weight).order_by("cumulative_weight")[:1]
+            for _ in range(number_of_startposes)
+        ]
+        if len(picks) == 1:
+            return list(picks[0])
+        return list(picks[0].union(*picks[1:], all=True))
+
 def validate_weight(value):
     if np.isnan(value) or value <= 0 or value > 1e200:
         raise ValidationError(
@@ -0,0 +1,3 @@
+from .synthetic_tournament import SyntheticTournament
+from .elo_solvers import benchmark_elo_solvers
+from .elo_pipeline import benchmark_elo_pipeline
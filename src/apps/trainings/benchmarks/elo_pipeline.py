@@ -0,0 +1,148 @@
+import time
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from src.apps.games.models import RatingGame, RatingGamePairResult
+from src.apps.runs.models import Run
+from src.apps.trainings.benchmarks.synthetic_tournament import SyntheticTournament
+from src.apps.trainings.models import Network
+from src.apps.trainings.services import BayesianRatingService
+
+User = get_user_model()
+
+fake_sha256 = "0" * 64
+
+BENCHMARK_RUN_NAME = "elo-benchmark"
+
+
+def benchmark_elo_pipeline(
+    numbers_of_games=(10_000, 100_000, 1_000_000, 10_000_000),
+    games_per_pair=20,
+    opponents_per_network=8,
+    number_of_iterations=100,
+    convergence_tolerance=1e-6,
+    solver=Run.EloSolver.MINORIZATION_MAXIMIZATION,
+    virtual_draw_strength=4.0,
+    seed=0,
+):
+    """
+    Insert synthetic runs in the db, with about each number of rating games, and time every stage of a full rating update.
+    Everything is inserted in a transaction that is rolled back, so nothing is left in the db.
+
+    :return: a list of dict, one per synthetic run, with the size of the run and the wall time in seconds of each stage
+    """
+    results = []
+    for number_of_games in numbers_of_games:
+        number_of_networks = max(2, number_of_games // (games_per_pair * opponents_per_network))
+        tournament = SyntheticTournament(number_of_networks, opponents_per_network=opponents_per_network, games_per_pair=games_per_pair, seed=seed)
+        with transaction.atomic():
+            results.append(_benchmark_synthetic_run(tournament, number_of_iterations, convergence_tolerance, solver, virtual_draw_strength))
+            transaction.set_rollback(True)
+    return results
+
+
+def _benchmark_synthetic_run(tournament, number_of_iterations, convergence_tolerance, solver, virtual_draw_strength):
+    timings = {}
+
+    start_time = time.perf_counter()
+    run, network_ids = _insert_networks(tournament, virtual_draw_strength)
+    number_of_games, number_of_pairs = _insert_rating_games(run, tournament, network_ids)
+    timings["insert_synthetic_run"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    RatingGamePairResult.objects.rebuild(run)
+    timings["rebuild_pair_results"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    RatingGame.pandas.get_detailed_tournament_results_dataframe(run, for_tests=True)
+    timings["aggregate_rating_games"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    detailed_tournament_results = RatingGamePairResult.pandas.get_detailed_tournament_results_dataframe(run)
+    timings["aggregate_pair_results"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    network_ratings = Network.pandas.get_ratings_dataframe(run)
+    timings["load_ratings"] = time.perf_counter() - start_time
+
+    bayesian_rating_service = BayesianRatingService(network_ratings, network_ids[0], detailed_tournament_results, virtual_draw_strength)
+    new_network_ratings = bayesian_rating_service.update_ratings_iteratively(number_of_iterations, convergence_tolerance=convergence_tolerance, solver=solver)
+    timings.update(bayesian_rating_service.timings)
+
+    start_time = time.perf_counter()
+    Network.pandas.bulk_update_ratings_from_dataframe(new_network_ratings)
+    timings["write_back"] = time.perf_counter() - start_time
+
+    return {
+        "number_of_networks": tournament.number_of_networks,
+        "number_of_pairs": number_of_pairs,
+        "number_of_games": number_of_games,
+        "solver": Run.EloSolver(solver).value,
+        "number_of_iterations": bayesian_rating_service.number_of_iterations_done,
+        "final_residual": float(bayesian_rating_service.final_residual),
+        "timings": timings,
+    }
+
+
+def _insert_networks(tournament, virtual_draw_strength):
+    """
+    :return: the run, and the db id of every network of the tournament, in the order of tournament.network_ids
+    """
+    run = Run.objects.create(name=BENCHMARK_RUN_NAME, virtual_draw_strength=virtual_draw_strength)
+    networks = Network.objects.bulk_create(
+        [
+            Network(run=run, name=f"{BENCHMARK_RUN_NAME}-{network_id}", model_file_bytes=0, model_file_sha256=fake_sha256, network_size="b1c1")
+            for network_id in tournament.network_ids
+        ],
+        batch_size=10_000,
+    )
+    network_ids = np.array([network.id for network in networks], dtype=np.int64)
+
+    has_parent = tournament.parent_network_ids > 0
+    parent_network_ids = network_ids[tournament.parent_network_ids[has_parent] - 1]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {Network._meta.db_table} AS network SET parent_network_id = parent.parent_network_id "
+            f"FROM unnest(%s::bigint[], %s::bigint[]) AS parent (id, parent_network_id) WHERE network.id = parent.id",
+            [network_ids[has_parent].tolist(), parent_network_ids.tolist()],
+        )
+    return run, network_ids
+
+
+def _insert_rating_games(run, tournament, network_ids, pairs_per_statement=50_000):
+    """
+    Expand the synthetic pairs into one row per rating game, in the db, without going through python objects for each game.
+
+    :return: the number of games and of pairs inserted
+    """
+    user = User.objects.create_user(username=BENCHMARK_RUN_NAME)
+    games = tournament.generate_games()
+    white_network_ids = network_ids[games["white_network"].to_numpy() - 1]
+    black_network_ids = network_ids[games["black_network"].to_numpy() - 1]
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(games), pairs_per_statement):
+            pairs = slice(start, start + pairs_per_statement)
+            for winner, count_column in [
+                (RatingGame.GamesResult.WHITE, "total_wins_white"),
+                (RatingGame.GamesResult.BLACK, "total_wins_black"),
+                (RatingGame.GamesResult.DRAW, "total_draw_or_no_result"),
+            ]:
+                cursor.execute(
+                    f"INSERT INTO {RatingGame._meta.db_table} (run_id, created_at, submitted_by_id, board_size_x, board_size_y, handicap, komi, "
+                    f"rules, extra_metadata, winner, score, resigned, game_length, white_network_id, black_network_id, sgf_file, kg_game_uid) "
+                    f"SELECT %s, now() - interval '1 minute', %s, 19, 19, 0, 7.0, '{{}}', '{{}}', %s, NULL, false, 0, pair.white_network_id, pair.black_network_id, '', '' "
+                    f"FROM unnest(%s::bigint[], %s::bigint[], %s::integer[]) AS pair (white_network_id, black_network_id, number_of_games), "
+                    f"generate_series(1, pair.number_of_games)",
+                    [
+                        run.id,
+                        user.id,
+                        winner.value,
+                        white_network_ids[pairs].tolist(),
+                        black_network_ids[pairs].tolist(),
+                        games[count_column].to_numpy()[pairs].tolist(),
+                    ],
+                )
+    return int(games["total_games"].sum()), len(games)
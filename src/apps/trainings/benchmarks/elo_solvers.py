@@ -0,0 +1,40 @@
+import time
+
+import numpy as np
+
+from src.apps.runs.models import Run
+from src.apps.trainings.benchmarks.synthetic_tournament import SyntheticTournament
+from src.apps.trainings.services import BayesianRatingService
+
+
+def benchmark_elo_solvers(numbers_of_networks=(1000, 5000, 20000), max_iterations=1000, convergence_tolerance=1e-6, virtual_draw_strength=4.0, seed=0):
+    """
+    Rate the same synthetic tournaments with every Run.EloSolver, starting from scratch, until convergence or max_iterations.
+
+    :return: a list of dict, one per tournament and solver, with the wall time, the number of iterations and the final residual
+    """
+    results = []
+    for number_of_networks in numbers_of_networks:
+        tournament = SyntheticTournament(number_of_networks, seed=seed)
+        detailed_tournament_results = tournament.get_detailed_tournament_results_dataframe()
+
+        for solver in Run.EloSolver:
+            bayesian_rating_service = BayesianRatingService(
+                tournament.get_ratings_dataframe(), tournament.anchor_network_id, detailed_tournament_results.copy(), virtual_draw_strength,
+            )
+            start_time = time.perf_counter()
+            network_ratings = bayesian_rating_service.update_ratings_iteratively(max_iterations, convergence_tolerance=convergence_tolerance, solver=solver)
+            wall_time = time.perf_counter() - start_time
+
+            log_gamma_error = network_ratings["log_gamma"].sort_index().to_numpy() - tournament.true_log_gamma
+            results.append({
+                "number_of_networks": number_of_networks,
+                "number_of_pairs": len(detailed_tournament_results) // 2,
+                "solver": solver.value,
+                "wall_time": wall_time,
+                "number_of_iterations": bayesian_rating_service.number_of_iterations_done,
+                "final_residual": float(bayesian_rating_service.final_residual),
+                "converged": bool(bayesian_rating_service.final_residual < convergence_tolerance),
+                "rms_error_to_true_log_gamma": float(np.sqrt(np.mean(log_gamma_error * log_gamma_error))),
+            })
+    return results
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas
+
+from src.apps.games.managers.tournament_results import get_detailed_tournament_results_dataframe
+
+
+class SyntheticTournament:
+    """
+    SyntheticTournament generates a run that looks like a real one, without touching the db:
+    a chain of networks each one a bit stronger than its parent, a few of them without a known parent,
+    and rating games played against nearby networks only, like RatingNetworkPairerService would pair them.
+    """
+
+    def __init__(
+        self,
+        number_of_networks,
+        opponents_per_network=8,
+        opponent_window=30,
+        games_per_pair=20,
+        orphan_probability=0.01,
+        draw_probability=0.02,
+        log_gamma_span=20.0,
+        seed=0,
+    ):
+        self.number_of_networks = number_of_networks
+        self.opponents_per_network = opponents_per_network
+        self.opponent_window = opponent_window
+        self.games_per_pair = games_per_pair
+        self.orphan_probability = orphan_probability
+        self.draw_probability = draw_probability
+        self._rng = np.random.RandomState(seed)
+
+        self.network_ids = np.arange(1, number_of_networks + 1)
+        self.anchor_network_id = self.network_ids[0]
+
+        parent_network_ids = np.concatenate([[-1], self.network_ids[:-1]])
+        parent_network_ids[self._rng.random_sample(number_of_networks) < orphan_probability] = -1
+        self.parent_network_ids = parent_network_ids
+
+        # Each network is a bit stronger than the previous one, for a total of about log_gamma_span across the whole run
+        self.true_log_gamma = np.cumsum(self._rng.exponential(log_gamma_span / number_of_networks, size=number_of_networks))
+        self.true_log_gamma -= self.true_log_gamma[0]
+
+    def get_ratings_dataframe(self):
+        """
+        :return: the same frame as NetworkPandasManager.get_ratings_dataframe, every network starting at log_gamma 0
+        """
+        return pandas.DataFrame(
+            {"parent_network__pk": self.parent_network_ids, "log_gamma": 0.0, "log_gamma_uncertainty": 0.0}, index=pandas.Index(self.network_ids, name="id"),
+        )
+
+    def generate_games(self):
+        """
+        Play every pair once, with the results drawn from the true strength of the networks.
+
+        :return: a frame of pairs with columns white_network, black_network, total_games, total_wins_white, total_wins_black, total_draw_or_no_result
+        """
+        number_of_pairs = self.number_of_networks * self.opponents_per_network
+        white_index = np.repeat(np.arange(self.number_of_networks), self.opponents_per_network)
+        offset = self._rng.randint(1, self.opponent_window + 1, size=number_of_pairs) * self._rng.choice([-1, 1], size=number_of_pairs)
+        black_index = np.clip(white_index + offset, 0, self.number_of_networks - 1)
+        distinct = white_index != black_index
+        white_index, black_index = white_index[distinct], black_index[distinct]
+
+        total_games = self._rng.randint(2, 2 * self.games_per_pair, size=len(white_index))
+        return self.remove_one_sided_pairs(self.play_games(white_index, black_index, total_games))
+
+    def play_games(self, white_index, black_index, total_games):
+        """
+        Play games between pairs of networks, with the results drawn from the true strength of the networks.
+
+        :param white_index: the index of the white network of each pair, in network_ids
+        :param black_index: the index of the black network of each pair, in network_ids
+        :param total_games: the number of games of each pair
+        :return: a frame of pairs with columns white_network, black_network, total_games, total_wins_white, total_wins_black, total_draw_or_no_result
+        """
+        total_draw_or_no_result = self._rng.binomial(total_games, self.draw_probability)
+        white_win_probability = 1 / (1 + np.exp(self.true_log_gamma[black_index] - self.true_log_gamma[white_index]))
+        total_wins_white = self._rng.binomial(total_games - total_draw_or_no_result, white_win_probability)
+        total_wins_black = total_games - total_draw_or_no_result - total_wins_white
+
+        games = pandas.DataFrame({
+            "white_network": self.network_ids[white_index],
+            "black_network": self.network_ids[black_index],
+            "total_games": total_games,
+            "total_wins_white": total_wins_white,
+            "total_wins_black": total_wins_black,
+            "total_draw_or_no_result": total_draw_or_no_result,
+        })
+        return games.groupby(["white_network", "black_network"], as_index=False).sum()
+
+    @staticmethod
+    def remove_one_sided_pairs(games):
+        """
+        Bayeselo refuses a network winning every single game against an opponent, turn one of those games into a draw
+
+        :param games: a frame of pairs like the one of generate_games, modified in place
+        :return: the frame
+        """
+        one_sided = (games["total_wins_white"] == games["total_games"]) | (games["total_wins_black"] == games["total_games"])
+        games.loc[one_sided & (games["total_wins_white"] > 0), "total_wins_white"] -= 1
+        games.loc[one_sided & (games["total_wins_black"] > 0), "total_wins_black"] -= 1
+        games.loc[one_sided, "total_draw_or_no_result"] += 1
+        return games
+
+    def get_detailed_tournament_results_dataframe(self, games=None):
+        """
+        :param games: pairs from generate_games, generated if not given
+        :return: the same frame as RatingGamePandasManager.get_detailed_tournament_results_dataframe
+        """
+        if games is None:
+            games = self.generate_games()
+        return get_detailed_tournament_results_dataframe(games)
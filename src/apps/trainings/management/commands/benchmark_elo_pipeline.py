@@ -0,0 +1,44 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand
+
+from src.apps.runs.models import Run
+from src.apps.trainings.benchmarks import benchmark_elo_pipeline
+
+
+class Command(BaseCommand):
+    help = "Time every stage of a rating update, from the db aggregation to the write-back, on synthetic runs inserted then rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--games", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 10_000_000], help="Approximate number of rating games of each synthetic run",
+        )
+        parser.add_argument("--iterations", type=int, default=100, help="Maximum number of iterations of the solver")
+        parser.add_argument("--tolerance", type=float, default=1e-6, help="Convergence tolerance on log_gamma")
+        parser.add_argument("--solver", choices=Run.EloSolver.values, default=Run.EloSolver.MINORIZATION_MAXIMIZATION)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Write the JSON results to this file instead of the standard output")
+
+    def handle(self, *args, **options):
+        results = benchmark_elo_pipeline(
+            numbers_of_games=options["games"],
+            number_of_iterations=options["iterations"],
+            convergence_tolerance=options["tolerance"],
+            solver=options["solver"],
+            seed=options["seed"],
+        )
+        report = json.dumps({"git_revision": self._get_git_revision(), "results": results}, indent=2)
+
+        if options["output"] is None:
+            self.stdout.write(report)
+        else:
+            with open(options["output"], "w") as output_file:
+                output_file.write(report)
+
+    @staticmethod
+    def _get_git_revision():
+        try:
+            return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from src.apps.trainings.benchmarks import benchmark_elo_solvers
+
+
+class Command(BaseCommand):
+    help = "Compare wall time and iterations of the Elo solvers on synthetic tournaments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--networks", type=int, nargs="+", default=[1000, 5000, 20000], help="Number of networks of each synthetic tournament")
+        parser.add_argument("--max-iterations", type=int, default=1000)
+        parser.add_argument("--tolerance", type=float, default=1e-6, help="Convergence tolerance on log_gamma")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", action="store_true", help="Output machine readable JSON instead of a table")
+
+    def handle(self, *args, **options):
+        results = benchmark_elo_solvers(
+            numbers_of_networks=options["networks"], max_iterations=options["max_iterations"], convergence_tolerance=options["tolerance"], seed=options["seed"],
+        )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'networks':>9} {'pairs':>9} {'solver':>7} {'time (s)':>9} {'iterations':>11} {'residual':>10} {'rms error':>10}")
+        for result in results:
+            self.stdout.write(
+                f"{result['number_of_networks']:>9} {result['number_of_pairs']:>9} {result['solver']:>7} {result['wall_time']:>9.2f} "
+                f"{result['number_of_iterations']:>11} {result['final_residual']:>10.2e} {result['rms_error_to_true_log_gamma']:>10.3f}"
+            )
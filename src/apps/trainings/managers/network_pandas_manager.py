@@ -2,6 +2,7 @@ import logging
 from math import log10, e
 
 import numpy as np
+from django.db import connections
 from django.db.models import Manager
 from django_pandas.io import read_frame
 
@@ -41,20 +42,39 @@ class NetworkPandasManager(Manager):
 
         return rating
 
-    def bulk_update_ratings_from_dataframe(self, dataframe):
-        networks_db = self.all()
+    def bulk_update_ratings_from_dataframe(self, dataframe, batch_size=1000):
+        """
+        Write the ratings of the networks of the frame, one UPDATE ... FROM (VALUES ...) per batch of networks.
+        Networks whose ratings did not change are not written, and networks deleted in the meantime are skipped.
+        Outside of a transaction, each batch is committed on its own so that rows are only locked for the time of their batch.
 
+        :param dataframe: a frame indexed by network id, with log_gamma and log_gamma_uncertainty columns
+        :return: the number of networks whose ratings changed
+        """
         dataframe["log_gamma_upper_confidence"] = dataframe["log_gamma"] + 2 * dataframe["log_gamma_uncertainty"]
         dataframe["log_gamma_lower_confidence"] = dataframe["log_gamma"] - 2 * dataframe["log_gamma_uncertainty"]
 
-        for network_db in networks_db:
-            # Avoid races where the networks db changed in the meantime
-            if network_db.id in dataframe.index:
-                network_db.log_gamma = dataframe.loc[network_db.id, "log_gamma"]
-                network_db.log_gamma_uncertainty = dataframe.loc[network_db.id, "log_gamma_uncertainty"]
-                network_db.log_gamma_upper_confidence = dataframe.loc[network_db.id, "log_gamma_upper_confidence"]
-                network_db.log_gamma_lower_confidence = dataframe.loc[network_db.id, "log_gamma_lower_confidence"]
-
-        self.bulk_update(
-            networks_db, ["log_gamma", "log_gamma_uncertainty", "log_gamma_upper_confidence", "log_gamma_lower_confidence",],
-        )
+        rating_columns = ["log_gamma", "log_gamma_uncertainty", "log_gamma_upper_confidence", "log_gamma_lower_confidence"]
+        # Always lock rows in the same order, so that two concurrent write-backs cannot deadlock
+        ratings = dataframe[rating_columns].sort_index()
+        network_ids = ratings.index.to_numpy(dtype=np.int64).tolist()
+        rating_values = ratings.to_numpy(dtype=np.float64).tolist()
+
+        table = self.model._meta.db_table
+        set_columns = ", ".join(f"{column} = new_rating.{column}" for column in rating_columns)
+        changed_columns = " OR ".join(f"network.{column} IS DISTINCT FROM new_rating.{column}" for column in rating_columns)
+        row_placeholder = "(%s::bigint, " + ", ".join(["%s::double precision"] * len(rating_columns)) + ")"
+
+        number_of_updated_networks = 0
+        with connections[self.db].cursor() as cursor:
+            for batch_start in range(0, len(network_ids), batch_size):
+                batch_network_ids = network_ids[batch_start:batch_start + batch_size]
+                batch_rating_values = rating_values[batch_start:batch_start + batch_size]
+                cursor.execute(
+                    f"UPDATE {table} AS network SET {set_columns} "
+                    f"FROM (VALUES {', '.join([row_placeholder] * len(batch_network_ids))}) AS new_rating (id, {', '.join(rating_columns)}) "
+                    f"WHERE network.id = new_rating.id AND ({changed_columns})",
+                    [value for network_id, values in zip(batch_network_ids, batch_rating_values) for value in (network_id, *values)],
+                )
+                number_of_updated_networks += cursor.rowcount
+        return number_of_updated_networks
@@ -1,7 +1,7 @@
 import logging
+from functools import lru_cache
 
 import numpy as np
-import scipy.stats
 from django.db.models import QuerySet
 
 from src.apps.runs.models import Run
@@ -9,10 +9,27 @@ from src.apps.runs.models import Run
 logger = logging.getLogger(__name__)
 
 
-def random_weighted_choice(networks):
-    probability_to_be_picked = scipy.stats.expon.pdf([index for index, _ in enumerate(networks)], loc=0, scale=2)
-    probability_to_be_picked /= np.sum(probability_to_be_picked)
-    return np.random.choice(networks, p=probability_to_be_picked)
+@lru_cache(maxsize=None)
+def get_random_weighted_choice_cumulative_probabilities(number_of_networks):
+    """
+    :return: the cumulative probability of picking each of number_of_networks networks, exponentially decreasing with scale 2
+    """
+    probability_to_be_picked = np.exp(-np.arange(number_of_networks) / 2)
+    cumulative_probability = np.cumsum(probability_to_be_picked)
+    cumulative_probability /= cumulative_probability[-1]
+    cumulative_probability.setflags(write=False)
+    return cumulative_probability
+
+
+def random_weighted_choice(networks, size=None):
+    """
+    :return: a network, the first ones being much more likely to be picked, or an array of size networks picked independently
+    """
+    cumulative_probability = get_random_weighted_choice_cumulative_probabilities(len(networks))
+    picked = cumulative_probability.searchsorted(np.random.random_sample(size), side="right")
+    if size is None:
+        return networks[int(picked)]
+    return np.asarray(networks)[picked]
 
 
 class NetworkQuerySet(QuerySet):
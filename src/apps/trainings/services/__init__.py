@@ -1 +1,6 @@
 from .bayesian_elo import BayesianRatingService
+from .tournament_results_cache import TournamentResultsCacheService
+from .rating_refresh_trigger import RatingRefreshTriggerService
+from .rating_networks_snapshot import RatingNetworksSnapshot, RatingNetworksSnapshotService
+from .network_task_payload_cache import NetworkTaskPayloadCacheService
+from .training_network_cache import TrainingNetworkCacheService
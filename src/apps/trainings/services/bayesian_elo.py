@@ -1,15 +1,23 @@
-from math import exp, log, sqrt
 import logging
+import time
 
 import numpy as np
 import pandas
+from django.conf import settings
 
+from src.apps.runs.models import Run
 from src.apps.trainings.services.pandas_utils import PandasUtilsService
-
-pandas_utils = PandasUtilsService()
+from src.apps.trainings.services.rating_precision import game_precision
 
 logger = logging.getLogger(__name__)
 
+pandas_utils = PandasUtilsService(
+    logger,
+    max_rows=settings.ELO_DEBUG_MAX_ROWS,
+    snapshot_directory=settings.ELO_DEBUG_SNAPSHOT_DIRECTORY,
+    snapshot_every=settings.ELO_DEBUG_SNAPSHOT_EVERY,
+)
+
 class BayesEloInconsistentDataError(Exception):
     pass
 
@@ -20,6 +28,22 @@ class BayesianRatingService:
 
     _simplified_tournament_results = None
     _networks_actual_score = None
+    _games_matrix = None
+    _games_matrix_rows = None
+    _wins_matrix = None
+    _wins_matrix_rows = None
+    _anchor_index = None
+    _color_classes = None
+    _updated_networks_index = None
+    _orphan_networks_index = None
+    _orphan_prior_strength = 0.0
+
+    # Largest number of (orphan network, network) pairs of the weak prior evaluated at once
+    _orphan_prior_block_size = 1 << 22
+
+    number_of_iterations_done = 0
+    final_residual = 0.0
+    timings = None
 
     def __init__(
         self,
@@ -33,34 +57,75 @@ class BayesianRatingService:
         self._detailed_tournament_results = detailed_tournament_results
         self._virtual_draw_strength = virtual_draw_strength
 
-    def update_ratings_iteratively(self, number_of_iterations):
+    def update_ratings_iteratively(
+        self, number_of_iterations, convergence_tolerance=0.0, solver=Run.EloSolver.MINORIZATION_MAXIMIZATION, updated_network_ids=None,
+    ):
+        """
+        Iterate from the current log_gamma of the networks (so that previous ratings are a warm start).
+
+        :param number_of_iterations: the maximum number of iterations, sweeps over all networks or Newton steps depending on the solver
+        :param convergence_tolerance: stop as soon as no log_gamma moved by more than this during an iteration, 0 to always do every iteration
+        :param solver: a Run.EloSolver, how to maximize the likelihood
+        :param updated_network_ids: if given, only move these networks and the networks that played them, the others keeping
+            their current log_gamma. Meant for networks whose games changed since the previous ratings, None to move every network.
+        :return: the network ratings, updated
+
+        After the update, self.timings holds the wall time in seconds of each stage.
+        """
+        self.number_of_iterations_done = 0
+        self.final_residual = 0.0
+        self.timings = {}
+
         # Skip if we don't have enough networks to have ratings
         if len(self._network_ratings) <= 1:
             return self._network_ratings
 
-        # pandas_utils.print_data_frame(self._network_ratings)
-        # logger.warning("starting bayeselo iteration")
-
+        stage_start_time = time.perf_counter()
         self._assert_detailed_tournament_results_consistency()
         self._add_virtual_draws()
+        stage_start_time = self._record_timing("add_virtual_draws", stage_start_time)
+
         self._simplify_tournament_into_win_loss()
         self._assert_simplified_tournament_results_consistency()
-        self._sort_inplace_network_ratings_by_uncertainty()
-        self._calculate_networks_actual_score()
-
+        self._build_tournament_matrices()
+        self._select_updated_networks(updated_network_ids)
+
+        if solver == Run.EloSolver.NEWTON:
+            update_log_gamma = self._update_log_gamma_newton
+        else:
+            self._build_network_color_classes()
+            update_log_gamma = self._update_log_gamma
+        stage_start_time = self._record_timing("build_tournament_matrices", stage_start_time)
+
+        log_gamma = self._network_ratings["log_gamma"].to_numpy(dtype=np.float64, copy=True)
+        log_gamma = self._reset_anchor_log_gamma(log_gamma)
         for iteration_index in range(number_of_iterations):
-            for network_id in reversed(self._network_ratings.index):
-                network_log_gamma = self._network_ratings.loc[network_id,"log_gamma"]
-                self._update_specific_network_log_gamma(network_id, network_log_gamma)
-            self._reset_anchor_log_gamma()
-
-        for network in self._network_ratings.itertuples():
-            network_id = network[0]
-            network_log_gamma = network.log_gamma
-            self._update_specific_network_log_gamma_uncertainty(network_id, network_log_gamma)
+            previous_log_gamma = log_gamma
+            log_gamma = update_log_gamma(log_gamma)
+            log_gamma = self._reset_anchor_log_gamma(log_gamma)
+
+            self.number_of_iterations_done = iteration_index + 1
+            self.final_residual = np.max(np.abs(log_gamma - previous_log_gamma))
+            logger.debug("Elo iteration %d, residual %.3g", self.number_of_iterations_done, self.final_residual)
+            pandas_utils.snapshot_data_frame("log_gamma", lambda: self._get_log_gamma_data_frame(log_gamma), self.number_of_iterations_done)
+            if self.final_residual < convergence_tolerance:
+                break
+        stage_start_time = self._record_timing("iterations", stage_start_time)
+
+        self._network_ratings["log_gamma"] = log_gamma
+        self._network_ratings["log_gamma_uncertainty"] = self._calculate_log_gamma_uncertainty(log_gamma)
+        self._record_timing("uncertainty", stage_start_time)
 
         return self._network_ratings
 
+    def _get_log_gamma_data_frame(self, log_gamma):
+        return pandas.DataFrame({"log_gamma": log_gamma}, index=self._network_ratings.index)
+
+    def _record_timing(self, stage, stage_start_time):
+        stage_end_time = time.perf_counter()
+        self.timings[stage] = stage_end_time - stage_start_time
+        return stage_end_time
+
     def _assert_detailed_tournament_results_consistency(self):
         # Something is wrong if the total number of wins and draws summed across everything is inconsistent with the number of games
         game_count_times_two_via_results = (
@@ -77,76 +142,56 @@ class BayesianRatingService:
             raise BayesEloInconsistentDataError("Inconsistent rating games results in Elo calculation: wins != games summed across networks")
 
     def _assert_simplified_tournament_results_consistency(self):
-        if np.min(self._simplified_tournament_results["nb_games"] - self._simplified_tournament_results["nb_wins"]) <= 0:
+        # The weak prior of orphan networks, added later on, also makes a pair of networks draw
+        network_index = self._network_ratings.index
+        is_orphan = np.zeros(len(network_index) + 1, dtype=bool)
+        is_orphan[self._orphan_networks_index] = True
+        pair_prior = self._orphan_prior_strength * (
+            is_orphan[network_index.get_indexer(self._simplified_tournament_results["reference_network"])].astype(np.float64) +
+            is_orphan[network_index.get_indexer(self._simplified_tournament_results["opponent_network"])]
+        )
+        pair_losses = self._simplified_tournament_results["nb_games"] - self._simplified_tournament_results["nb_wins"] + pair_prior / 2
+        if np.min(pair_losses) <= 0:
             raise BayesEloInconsistentDataError("Inconsistent rating games results in Elo calculation: simplified wins >= games for some network")
 
-    def _get_games_played_by_specific_network(self, network_id):
-        """
-        Utility function to get the table of the number of games played by a network
-
-        :param network_id:
-        :return:
-        """
-        games_played_by_specific_network_filter = self._tournament_results_only_total["reference_network"] == network_id
-        return self._tournament_results_only_total[games_played_by_specific_network_filter]
-
     def _add_virtual_draws(self):
         """
          Whenever a NEW player is added to the above, it is necessary to add a Bayesian prior to obtain good results
          and keep the math from blowing up.
          A reasonable prior is to add some number of "virtual draws" between the new player and the immediately previous neural net version.
+
+         If we don't know a parent network and it's not the anchor, then add a very weak prior that the network is equal to every network except itself.
+         Those would be N virtual draws per such orphan network, so they are not added to the tournament results but taken into account
+         by _sum_orphan_prior wherever the games are summed.
         """
-        virtual_draws_src = []
-        network_ids = list(self._network_ratings.index)
-
-        for network in self._network_ratings.itertuples():
-            network_id = network[0]
-            parent_network_id = network.parent_network__pk
-
-            # Everything blows up if for some reason (eg first network, or deleted network)
-            # the parent_network_id does not reference an actual network, so let's check that
-            if parent_network_id in network_ids:
-                draw1 = {
-                    "reference_network": network_id,
-                    "opponent_network": parent_network_id,
-                    "total_bayesian_virtual_draws": self._virtual_draw_strength,
-                }
-                draw2 = {
-                    "reference_network": parent_network_id,
-                    "opponent_network": network_id,
-                    "total_bayesian_virtual_draws": self._virtual_draw_strength,
-                }
-                virtual_draws_src.append(draw1)
-                virtual_draws_src.append(draw2)
-            # It's possible to get a divide by zero if we have no parent network
-            # If we don't know a parent network and it's not the anchor, then add a very weak prior that the network is equal to every network except itself
-            elif network_id != self._network_anchor_id:
-                num_other_networks = len(self._network_ratings) - 1
-                if num_other_networks > 0:
-                    for other_network in self._network_ratings.itertuples():
-                        other_network_id = other_network[0]
-                        if other_network_id != network_id:
-                            draw1 = {
-                                "reference_network": network_id,
-                                "opponent_network": other_network_id,
-                                "total_bayesian_virtual_draws": 0.01 / num_other_networks,
-                            }
-                            draw2 = {
-                                "reference_network": other_network_id,
-                                "opponent_network": network_id,
-                                "total_bayesian_virtual_draws": 0.01 / num_other_networks,
-                            }
-                            virtual_draws_src.append(draw1)
-                            virtual_draws_src.append(draw2)
-
-        virtual_draw = pandas.DataFrame(virtual_draws_src,columns=["reference_network","opponent_network","total_bayesian_virtual_draws"])
-        # logger.warning(virtual_draw.to_string())
+        network_index = self._network_ratings.index
+        network_ids = network_index.to_numpy()
+
+        # Everything blows up if for some reason (eg first network, or deleted network)
+        # the parent_network_id does not reference an actual network, so let's check that
+        parent_index = network_index.get_indexer(self._network_ratings["parent_network__pk"].to_numpy().astype(network_ids.dtype))
+        has_parent = parent_index >= 0
+        child_network_ids = network_ids[has_parent]
+        parent_network_ids = network_ids[parent_index[has_parent]]
+
+        virtual_draw = pandas.DataFrame({
+            "reference_network": np.concatenate([child_network_ids, parent_network_ids]),
+            "opponent_network": np.concatenate([parent_network_ids, child_network_ids]),
+            "total_bayesian_virtual_draws": float(self._virtual_draw_strength),
+        })
+        # A pair can get virtual draws twice (eg two networks being each other's parent),
+        # sum them so that merging does not duplicate the actual games of that pair
+        virtual_draw = virtual_draw.groupby(["reference_network", "opponent_network"], as_index=False).sum()
 
         tournament_results = pandas.merge(self._detailed_tournament_results, virtual_draw, how="outer", on=["reference_network", "opponent_network"],)
-        # panda_utils.print_data_frame(tournament_results)
+        pandas_utils.print_data_frame(tournament_results)
         tournament_results.fillna(0, inplace=True)
         self._detailed_tournament_results = tournament_results
 
+        # It's possible to get a divide by zero if we have no parent network
+        self._orphan_networks_index = np.flatnonzero(~has_parent & (network_ids != self._network_anchor_id))
+        self._orphan_prior_strength = 0.01 / (len(network_ids) - 1)
+
     def _simplify_tournament_into_win_loss(self):
         """
         For the rest of the algorithm, we do not need the full detail.
@@ -174,95 +219,271 @@ class BayesianRatingService:
         # And save it for later usage
         self._simplified_tournament_results = tournament_results
 
-        tournament_results_only_total = pandas.DataFrame()
-        tournament_results_only_total["reference_network"] = self._simplified_tournament_results["reference_network"]
-        tournament_results_only_total["opponent_network"] = self._simplified_tournament_results["opponent_network"]
-        tournament_results_only_total["nb_games"] = self._simplified_tournament_results["nb_games"]
-        self._tournament_results_only_total = tournament_results_only_total
-
-    def _sort_inplace_network_ratings_by_uncertainty(self):
-        self._network_ratings.sort_values("log_gamma_uncertainty", ascending=False, inplace=True)
 
-    def _calculate_networks_actual_score(self):
+    def _build_tournament_matrices(self):
         """
-        Calculate the total number of wins for each reference network.
+        Turn the simplified tournament into sparse matrices, once, so that every iteration is a handful of sparse matrix operations
+        instead of a lookup per network and per opponent.
+
+        Networks are referred to by a compact index, their position in self._network_ratings.
+        games_matrix[reference, opponent] is the number of games (virtual draws included) and wins_matrix[reference, opponent]
+        the score of the reference network against the opponent network. Each network only plays neighbours,
+        so the CSR matrices stay proportional to the number of pairs that actually played, not to the number of networks squared.
         """
-        aggregated_tournament_results = self._simplified_tournament_results.groupby(["reference_network"]).sum()
+        # Imported here, scipy is slow to import and only rating updates need it, not every process importing the services
+        import scipy.sparse
+
+        network_index = self._network_ratings.index
+        number_of_networks = len(network_index)
+
+        pair_reference_index = network_index.get_indexer(self._simplified_tournament_results["reference_network"])
+        pair_opponent_index = network_index.get_indexer(self._simplified_tournament_results["opponent_network"])
+        if np.any(pair_reference_index < 0) or np.any(pair_opponent_index < 0):
+            raise BayesEloInconsistentDataError("Inconsistent rating games results in Elo calculation: game played by an unknown network")
+
+        matrix_shape = (number_of_networks, number_of_networks)
+        self._games_matrix = scipy.sparse.csr_matrix(
+            (self._simplified_tournament_results["nb_games"].to_numpy(dtype=np.float64), (pair_reference_index, pair_opponent_index)), shape=matrix_shape,
+        )
+        self._wins_matrix = scipy.sparse.csr_matrix(
+            (self._simplified_tournament_results["nb_wins"].to_numpy(dtype=np.float64), (pair_reference_index, pair_opponent_index)), shape=matrix_shape,
+        )
+        # Reference network of each stored entry of games_matrix, the column being games_matrix.indices
+        self._games_matrix_rows = np.repeat(np.arange(number_of_networks), np.diff(self._games_matrix.indptr))
 
-        networks_actual_score = pandas.DataFrame(index=aggregated_tournament_results.index)
-        networks_actual_score["actual_score"] = aggregated_tournament_results["nb_wins"]
+        self._wins_matrix_rows = np.repeat(np.arange(number_of_networks), np.diff(self._wins_matrix.indptr))
+        self._anchor_index = network_index.get_loc(self._network_anchor_id)
 
-        for network_id in self._network_ratings.index:
-            if network_id not in networks_actual_score.index:
-                networks_actual_score.loc[network_id] = {"actual_score": 0.0}
+        # Calculate the total number of wins for each reference network.
+        # Each pair of the orphan prior is a draw, and an orphan network has a pair with every other network, other networks one per orphan network
+        number_of_orphan_prior_pairs = np.full(number_of_networks, len(self._orphan_networks_index), dtype=np.float64)
+        number_of_orphan_prior_pairs[self._orphan_networks_index] += number_of_networks - 2
+        self._networks_actual_score = self._wins_matrix.dot(np.ones(number_of_networks)) + 0.5 * self._orphan_prior_strength * number_of_orphan_prior_pairs
 
-        self._networks_actual_score = networks_actual_score
+    def _select_updated_networks(self, updated_network_ids):
+        """
+        Find the compact index of the networks to move: the updated networks, which have new games, and their opponents,
+        whose expected score changes with them. Every other network only sees the change through those, so it barely moves.
+        """
+        number_of_networks = len(self._network_ratings)
+        if updated_network_ids is None:
+            self._updated_networks_index = np.arange(number_of_networks)
+            return
 
-    def _update_specific_network_log_gamma(self, network_id, network_previous_log_gamma):
-        expected_score = self._calculate_specific_network_expected_score(network_id, network_previous_log_gamma)
-        actual_score = self._networks_actual_score.loc[network_id, "actual_score"]
-        # Set log_gamma(Pi) := log_gamma(Pi) + log(actual_number_of_win(Pi) / expected_number_win(Pi))
-        log_gamma_diff = log(actual_score / expected_score)
-        self._network_ratings.loc[network_id, "log_gamma"] += log_gamma_diff
+        updated_networks_index = self._network_ratings.index.get_indexer(list(updated_network_ids))
+        updated_networks_index = updated_networks_index[updated_networks_index >= 0]
+        opponents_index = self._games_matrix[updated_networks_index].indices
+        self._updated_networks_index = np.union1d(updated_networks_index, opponents_index)
 
-    def _calculate_specific_network_expected_score(self, network_id, network_log_gamma):
+    def _build_network_color_classes(self):
+        """
+        Updating networks one at a time (Gauss-Seidel) converges much faster than updating all of them from the same old values,
+        but two networks only influence each other's update if they played together.
+        So greedily color the networks such that no two networks of the same color played each other: each color class is then
+        a block of independent networks, updated at once. A sweep over the colors is a Gauss-Seidel pass over the networks in color order,
+        not in the order of the historical per network loop, so ratings differ after each sweep, but converge to the same ones.
+
+        Like the historical per network loop, networks with the smallest uncertainty are colored first.
+        Networks that are not to be updated are left uncolored, so that sweeps skip them.
+        """
+        number_of_networks = len(self._network_ratings)
+        indptr, indices = self._games_matrix.indptr, self._games_matrix.indices
+        uncertainty = self._network_ratings["log_gamma_uncertainty"].to_numpy()[self._updated_networks_index]
+
+        network_color = np.full(number_of_networks, -1)
+        for network_index in self._updated_networks_index[np.argsort(uncertainty, kind="stable")]:
+            used_colors = set(network_color[indices[indptr[network_index]:indptr[network_index + 1]]].tolist())
+            color = 0
+            while color in used_colors:
+                color += 1
+            network_color[network_index] = color
+
+        self._color_classes = []
+        for color in range(network_color.max() + 1):
+            color_networks = np.flatnonzero(network_color == color)
+            # The rows of games_matrix for this color only, and the reference network of each of their stored entries
+            color_games_matrix = self._games_matrix[color_networks]
+            color_games_matrix_rows = np.repeat(color_networks, np.diff(color_games_matrix.indptr))
+            self._color_classes.append((color_networks, color_games_matrix, color_games_matrix_rows))
+
+    def _update_log_gamma(self, log_gamma):
+        """
+        One minorization-maximization sweep over every network, one color at a time.
+        For each network Pi, set log_gamma(Pi) := log_gamma(Pi) + log(actual_number_of_win(Pi) / expected_number_win(Pi))
+
+        :param log_gamma: the log_gamma of every network, in the order of self._network_ratings
+        :return: the updated log_gamma
+        """
+        log_gamma = log_gamma.copy()
+        for color_networks, color_games_matrix, color_games_matrix_rows in self._color_classes:
+            expected_score = self._calculate_networks_expected_score(log_gamma, color_networks, color_games_matrix, color_games_matrix_rows)
+            actual_score = self._networks_actual_score[color_networks]
+            # A network that never played (even virtually) has nothing to learn from, keep it where it is
+            has_played = expected_score > 0
+            log_gamma[color_networks[has_played]] += np.log(actual_score[has_played] / expected_score[has_played])
+        return log_gamma
+
+    def _calculate_networks_expected_score(self, log_gamma, networks_index, games_matrix, games_matrix_rows):
         """
         For every game Gj that Pi participated in, compute:
             probability_win(Pi,Gj) = 1 / (1 + exp(log_gamma(opponent of Pi in game Gj) - log_gamma(Pi)))
         Then compute:
             expected_score(Pi) = sum_{all games Gj that Pi participated in} ProbWin(Pi,Gj)
 
-        :param network_id: The network specified
-        :param network_log_gamma:
+        :param log_gamma: the log_gamma of every network, in the order of self._network_ratings
+        :param networks_index: the networks Pi to compute the expected score for
+        :param games_matrix: the rows of the games matrix of the networks Pi
+        :param games_matrix_rows: the reference network of each stored entry of games_matrix
+        :return: the expected score of the networks, in the order of networks_index
+        """
+        log_gamma_diff = log_gamma[games_matrix.indices] - log_gamma[games_matrix_rows]
+        win_probability = self._win_probability(log_gamma_diff)
+        return self._sum_games_matrix_rows(games_matrix, win_probability) + self._sum_orphan_prior(log_gamma, networks_index, self._win_probability)
+
+    @staticmethod
+    def _win_probability(log_gamma_diff):
+        return 1 / (1 + np.exp(log_gamma_diff))
+
+    def _sum_orphan_prior(self, log_gamma, networks_index, per_game_value):
+        """
+        The weak prior of orphan networks, summed like _sum_games_matrix_rows sums the games, without ever building its pairs.
+        Each orphan network has orphan_prior_strength virtual draws against every other network, as reference and as opponent.
+
+        :param log_gamma: the log_gamma of every network, in the order of self._network_ratings
+        :param networks_index: the reference networks Pi to sum the prior of
+        :param per_game_value: function of log_gamma(opponent) - log_gamma(Pi), vectorized, giving the value of a single virtual draw
+        :return: sum_{virtual draws of the prior between Pi and an opponent} per_game_value, in the order of networks_index
+        """
+        orphan_prior = np.zeros(len(networks_index))
+        orphan_networks_index = self._orphan_networks_index
+        if len(orphan_networks_index) == 0:
+            return orphan_prior
+
+        # Pi against every orphan network
+        block_length = max(1, self._orphan_prior_block_size // len(orphan_networks_index))
+        for block_start in range(0, len(networks_index), block_length):
+            block = slice(block_start, block_start + block_length)
+            block_networks_index = networks_index[block]
+            value = per_game_value(log_gamma[orphan_networks_index][np.newaxis, :] - log_gamma[block_networks_index][:, np.newaxis])
+            value[block_networks_index[:, np.newaxis] == orphan_networks_index[np.newaxis, :]] = 0
+            orphan_prior[block] += value.sum(axis=1)
+
+        # Orphan Pi against every network
+        networks_position = np.flatnonzero(np.isin(networks_index, orphan_networks_index))
+        block_length = max(1, self._orphan_prior_block_size // len(log_gamma))
+        for block_start in range(0, len(networks_position), block_length):
+            block_networks_position = networks_position[block_start:block_start + block_length]
+            block_networks_index = networks_index[block_networks_position]
+            value = per_game_value(log_gamma[np.newaxis, :] - log_gamma[block_networks_index][:, np.newaxis])
+            value[np.arange(len(block_networks_index)), block_networks_index] = 0
+            orphan_prior[block_networks_position] += value.sum(axis=1)
+
+        return self._orphan_prior_strength * orphan_prior
+
+    @staticmethod
+    def _sum_games_matrix_rows(games_matrix, per_game_value):
         """
-        games_played = self._get_games_played_by_specific_network(network_id)
-        pandas_utils.print_data_frame(games_played)
+        sum_j games_matrix[i, j] * per_game_value[i, j] for every row i, as a sparse matrix-vector product
 
-        expected_score = 0.0
-        for game in games_played.itertuples():
-            opponent_network = game.opponent_network
-            opponent_network_log_gamma = self._network_ratings.loc[opponent_network, "log_gamma"]
-            log_gamma_diff = opponent_network_log_gamma - network_log_gamma
-            win_probability = 1 / (1 + exp(log_gamma_diff))
-            expected_score += win_probability * game.nb_games
+        :param games_matrix: a CSR games matrix
+        :param per_game_value: a value for each of the stored entries of games_matrix
+        :return: the sum over each row
+        """
+        import scipy.sparse
 
-        return expected_score
+        weighted_games_matrix = scipy.sparse.csr_matrix((games_matrix.data * per_game_value, games_matrix.indices, games_matrix.indptr), shape=games_matrix.shape)
+        return weighted_games_matrix.dot(np.ones(games_matrix.shape[1]))
 
-    def _reset_anchor_log_gamma(self):
+    def _update_log_gamma_newton(self, log_gamma):
+        """
+        One Newton step on the log likelihood of the whole tournament, virtual draws included:
+            log_likelihood = sum_{Pi, Pj} wins(Pi, Pj) * log(1 / (1 + exp(log_gamma(Pj) - log_gamma(Pi))))
+        Its gradient for Pi is actual_score(Pi) - expected_score(Pi), and its hessian is minus a sparse weighted graph laplacian
+        whose diagonal is the precision of each network. The anchor, and networks not to be updated, are pinned by leaving them out of the system,
+        which is solved with a sparse factorization (conjugate gradient needs about as many iterations as the length
+        of the parent chains), followed by a backtracking line search.
+        The weak prior of orphan networks would make the hessian dense, so only its diagonal is kept: the gradient is exact,
+        so the maximum is the same, only the convergence is very slightly slower.
+
+        :param log_gamma: the log_gamma of every network, in the order of self._network_ratings, anchor at 0
+        :return: the updated log_gamma
+        """
+        import scipy.sparse
+        import scipy.sparse.linalg
+
+        all_networks_index = np.arange(len(log_gamma))
+        games_precision = self._calculate_games_matrix_precision(log_gamma)
+        precision = self._sum_games_matrix_rows(self._games_matrix, games_precision) + self._sum_orphan_prior(log_gamma, all_networks_index, game_precision)
+        gradient = self._networks_actual_score - self._calculate_networks_expected_score(
+            log_gamma, all_networks_index, self._games_matrix, self._games_matrix_rows
+        )
+
+        precision_matrix = scipy.sparse.csr_matrix(
+            (self._games_matrix.data * games_precision, self._games_matrix.indices, self._games_matrix.indptr), shape=self._games_matrix.shape,
+        )
+        negative_hessian = scipy.sparse.diags(precision) - precision_matrix
+
+        free_networks = self._updated_networks_index[self._updated_networks_index != self._anchor_index]
+        if len(free_networks) == 0:
+            return log_gamma
+        free_negative_hessian = negative_hessian[free_networks][:, free_networks]
+        free_step = scipy.sparse.linalg.spsolve(free_negative_hessian.tocsc(), gradient[free_networks])
+
+        step = np.zeros_like(log_gamma)
+        step[free_networks] = free_step
+
+        # The log likelihood is concave, so this only halves the step when starting far from the maximum
+        log_likelihood = self._calculate_log_likelihood(log_gamma)
+        expected_increase = np.dot(gradient, step)
+        step_size = 1.0
+        while step_size > 1e-6:
+            new_log_gamma = log_gamma + step_size * step
+            if self._calculate_log_likelihood(new_log_gamma) >= log_likelihood + 1e-4 * step_size * expected_increase:
+                return new_log_gamma
+            step_size /= 2
+        return log_gamma
+
+    def _calculate_log_likelihood(self, log_gamma):
+        log_gamma_diff = log_gamma[self._wins_matrix.indices] - log_gamma[self._wins_matrix_rows]
+        # Every virtual draw of the orphan prior counts as half a win for each network
+        orphan_prior = self._sum_orphan_prior(log_gamma, np.arange(len(log_gamma)), self._loss_log_probability)
+        return -np.dot(self._wins_matrix.data, np.logaddexp(0, log_gamma_diff)) - 0.5 * np.sum(orphan_prior)
+
+    @staticmethod
+    def _loss_log_probability(log_gamma_diff):
+        return np.logaddexp(0, log_gamma_diff)
+
+    def _reset_anchor_log_gamma(self, log_gamma):
         """
         With all that, anchor player log_gamma will have changed but it is supposed to stay at 0.
         So subtract the anchor player's log_gamma value from every player's log_gamma, including the anchor player's own log_gamma,
         so that the anchor player is back at log_gamma 0.
         """
-        self._network_ratings["log_gamma"] -= self._network_ratings.loc[self._network_anchor_id, "log_gamma"]
+        return log_gamma - log_gamma[self._anchor_index]
 
-    def _update_specific_network_log_gamma_uncertainty(self, network_id, network_log_gamma):
-        precision = self._calculate_specific_network_precision(network_id, network_log_gamma)
-        uncertainty = sqrt(1.0 / precision)
+    def _calculate_log_gamma_uncertainty(self, log_gamma):
+        precision = self._calculate_networks_precision(log_gamma)
+        with np.errstate(divide="ignore"):
+            uncertainty = np.sqrt(1.0 / precision)
         # Cap the amount of uncertainty, so that if we nearly divide by 0, we don't end up with a totally ridiculous number
         # for user display and game matching and other such purposes.
-        uncertainty = min(uncertainty,10.0)
-        self._network_ratings.loc[network_id, "log_gamma_uncertainty"] = uncertainty
+        return np.minimum(uncertainty, 10.0)
 
-    def _calculate_specific_network_precision(self, network_id, network_log_gamma):
+    def _calculate_networks_precision(self, log_gamma):
         """
         Compute the second derivative of the log probability with respect to the particular gamma that we are trying to measure uncertainty of.
 
-        :param network_id:
-        :param network_log_gamma:
-        :return:
+        :param log_gamma: the log_gamma of every network, in the order of self._network_ratings
+        :return: the precision of every network
         """
-        games_played = self._get_games_played_by_specific_network(network_id)
-
-        total_precision = 0.0
-        for game in games_played.itertuples():
-            opponent_network = game.opponent_network
-            opponent_network_log_gamma = self._network_ratings.loc[opponent_network, "log_gamma"]
-            log_gamma_diff = opponent_network_log_gamma - network_log_gamma
-            this_game_stdev = exp(log_gamma_diff / 2) + exp(-log_gamma_diff / 2)
-            this_game_precision = 1.0 / (this_game_stdev * this_game_stdev)
-            total_precision += game.nb_games * this_game_precision
-            # logger.warning(repr(game) + " " + str(this_game_precision) + " " + str(game.nb_games))
-
-        return total_precision
+        return (
+            self._sum_games_matrix_rows(self._games_matrix, self._calculate_games_matrix_precision(log_gamma)) +
+            self._sum_orphan_prior(log_gamma, np.arange(len(log_gamma)), game_precision)
+        )
 
+    def _calculate_games_matrix_precision(self, log_gamma):
+        """
+        :param log_gamma: the log_gamma of every network, in the order of self._network_ratings
+        :return: the precision brought by a single game, for each of the stored entries of the games matrix
+        """
+        return game_precision(log_gamma[self._games_matrix.indices] - log_gamma[self._games_matrix_rows])
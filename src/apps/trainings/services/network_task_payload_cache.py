@@ -0,0 +1,45 @@
+from src.apps.runs.models import Run
+from src.apps.trainings.serializers import NetworkSerializerForTasks
+from src.contrib.versioned_cache import VersionedCache
+
+
+class NetworkTaskPayloadCacheService:
+    """
+    NetworkTaskPayloadCacheService keeps, in each process, the task payload of networks as NetworkSerializerForTasks renders them,
+    so that task responses do not serialize the networks again and again.
+
+    Payloads hold absolute urls, so they are kept per base url of the requests. A version token per run in the shared cache
+    tells whether they are still up to date: it changes when a network of the run is saved or deleted, not when ratings are written,
+    ratings not being part of the payload.
+    """
+
+    # Per process, run id -> {(base url, network id): payload}, filled as networks are served
+    _payloads = VersionedCache("trainings:network_task_payloads")
+
+    def __init__(self, run: Run, request):
+        self._run = run
+        self._request = request
+        self._base_url = request.build_absolute_uri("/")
+
+    @classmethod
+    def invalidate(cls, run_id):
+        """
+        Make every process render the payloads of the networks of the run again, see VersionedCache.invalidate
+        """
+        cls._payloads.invalidate(run_id)
+
+    def get_many(self, networks):
+        """
+        :param networks: networks of the run
+        :return: the payload of each network, the same dict as NetworkSerializerForTasks(network, context={"request": request}).data,
+            shared with the other requests of the process, so not to be modified
+        """
+        payloads = self._payloads.get(self._run.id, dict)
+        network_payloads = []
+        for network in networks:
+            payload = payloads.get((self._base_url, network.id))
+            if payload is None:
+                payload = dict(NetworkSerializerForTasks(network, context={"request": self._request}).data)
+                payloads[(self._base_url, network.id)] = payload
+            network_payloads.append(payload)
+        return network_payloads
@@ -1,4 +1,5 @@
 import logging
+import os
 
 import pandas
 
@@ -8,18 +9,57 @@ logger = logging.getLogger(__name__)
 class PandasUtilsService:
     """
     This helper allows debug logs of pandas dataframe
+
+    Frames can be given as a function returning the frame: nothing is built nor rendered unless the logger is enabled for the level.
+    They can also be written as csv snapshots to a directory, only every few iterations of an algorithm.
     """
 
+    def __init__(self, logger=logger, max_rows=None, snapshot_directory=None, snapshot_every=1):
+        """
+        :param logger: the logger to print to, and whose level decides whether to print
+        :param max_rows: print a random sample of at most this many rows of large frames, None to print every row
+        :param snapshot_directory: the directory to write snapshots to, None to never write any
+        :param snapshot_every: only write the snapshots of one iteration out of this many
+        """
+        self._logger = logger
+        self._max_rows = max_rows
+        self._snapshot_directory = snapshot_directory
+        self._snapshot_every = snapshot_every
+
+    def print_data_frame(self, x, level=logging.DEBUG):
+        """
+        :param x: a frame, or a function without argument returning the frame
+        :param level: the logging level
+        """
+        if not self._logger.isEnabledFor(level):
+            return
+
+        x = self._get_data_frame(x)
+        if self._max_rows is not None and len(x) > self._max_rows:
+            x = x.sample(self._max_rows, random_state=0).sort_index()
+        with pandas.option_context(
+            "display.max_rows", len(x),
+            "display.max_columns", None,
+            "display.width", 2000,
+            "display.float_format", "{:20,.3f}".format,
+            "display.max_colwidth", None,
+        ):
+            self._logger.log(level, "-----> \n" + x.to_string())
+
+    def snapshot_data_frame(self, name, x, iteration=None):
+        """
+        :param name: the name of the snapshot, the file being name.csv, or name-iteration.csv
+        :param x: a frame, or a function without argument returning the frame
+        :param iteration: the iteration the frame belongs to, if any
+        """
+        if self._snapshot_directory is None:
+            return
+        if iteration is not None and iteration % self._snapshot_every != 0:
+            return
+
+        file_name = name if iteration is None else f"{name}-{iteration:06d}"
+        self._get_data_frame(x).to_csv(os.path.join(self._snapshot_directory, f"{file_name}.csv"))
+
     @staticmethod
-    def print_data_frame(x, level=logging.DEBUG):
-        pandas.set_option("display.max_rows", len(x))
-        pandas.set_option("display.max_columns", None)
-        pandas.set_option("display.width", 2000)
-        pandas.set_option("display.float_format", "{:20,.3f}".format)
-        pandas.set_option("display.max_colwidth", 0)
-        logger.log(level, "-----> \n" + x.to_string())
-        pandas.reset_option("display.max_rows")
-        pandas.reset_option("display.max_columns")
-        pandas.reset_option("display.width")
-        pandas.reset_option("display.float_format")
-        pandas.reset_option("display.max_colwidth")
+    def _get_data_frame(x):
+        return x() if callable(x) else x
@@ -0,0 +1,75 @@
+import re
+
+import numpy as np
+
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+from src.contrib.versioned_cache import VersionedCache
+
+
+def get_evaluation_cost(network_size):
+    """
+    :param network_size: the size of a network, like b20c256
+    :return: the relative cost of an evaluation of the network, blocks * channels^2, None if the size does not tell
+    """
+    match = re.fullmatch(r"b(\d+)c(\d+)", network_size.strip().lower())
+    if match is None:
+        return None
+    return int(match.group(1)) * int(match.group(2)) ** 2
+
+
+class RatingNetworksSnapshot:
+    """
+    The networks of a run enabled for rating games, as arrays aligned with the list of networks, for pairing without any query.
+    """
+
+    def __init__(self, networks):
+        self.networks = networks
+        self.ids = np.array([network.id for network in networks], dtype=np.int64)
+        self.names = np.array([network.name for network in networks], dtype=object)
+        self.log_gamma = np.array([network.log_gamma for network in networks], dtype=np.float64)
+        self.log_gamma_uncertainty = np.array([network.log_gamma_uncertainty for network in networks], dtype=np.float64)
+        self.log_gamma_lower_confidence = np.array([network.log_gamma_lower_confidence for network in networks], dtype=np.float64)
+        self.log_gamma_upper_confidence = np.array([network.log_gamma_upper_confidence for network in networks], dtype=np.float64)
+        # Relative time clients spend playing each network, networks of unknown size costing like the median one
+        evaluation_cost = np.array([get_evaluation_cost(network.network_size) or np.nan for network in networks], dtype=np.float64)
+        median_evaluation_cost = np.nanmedian(evaluation_cost) if np.any(np.isfinite(evaluation_cost)) else 1.0
+        self.evaluation_cost = np.where(np.isfinite(evaluation_cost), evaluation_cost, median_evaluation_cost) / median_evaluation_cost
+        # Index of the networks by increasing log_gamma, to find networks in a log_gamma range by binary search
+        self.by_log_gamma = np.argsort(self.log_gamma, kind="stable")
+        self.sorted_log_gamma = self.log_gamma[self.by_log_gamma]
+        self.log_gamma_rank = np.empty(len(networks), dtype=np.int64)
+        self.log_gamma_rank[self.by_log_gamma] = np.arange(len(networks))
+
+    def __len__(self):
+        return len(self.networks)
+
+
+class RatingNetworksSnapshotService:
+    """
+    RatingNetworksSnapshotService keeps, in each process, a snapshot of the networks of a run enabled for rating games.
+
+    A version token in the shared cache tells whether the snapshot of the process is still up to date: getting a snapshot costs
+    one cache read, and the networks are queried again only after the token changed, ie after ratings were written
+    or a network of the run was created, enabled, disabled or deleted.
+    """
+
+    # Per process, run id -> snapshot
+    _snapshots = VersionedCache("trainings:rating_networks_snapshot")
+
+    def __init__(self, run: Run):
+        self._run = run
+
+    @classmethod
+    def invalidate(cls, run_id):
+        """
+        Make every process build the snapshot of the run again, see VersionedCache.invalidate
+        """
+        cls._snapshots.invalidate(run_id)
+
+    def _build(self):
+        networks = Network.objects.select_networks_for_run(self._run, for_rating_games=True).select_related("run")
+        return RatingNetworksSnapshot(list(networks))
+
+    def get(self) -> RatingNetworksSnapshot:
+        return self._snapshots.get(self._run.id, self._build)
@@ -0,0 +1,9 @@
+import numpy as np
+
+
+def game_precision(log_gamma_diff):
+    """
+    :return: the precision a single game brings to the log_gamma of each of its networks, given their log_gamma difference
+    """
+    this_game_stdev = np.exp(log_gamma_diff / 2) + np.exp(-log_gamma_diff / 2)
+    return 1.0 / (this_game_stdev * this_game_stdev)
@@ -0,0 +1,47 @@
+import time
+
+from django.core.cache import cache
+
+from src.apps.runs.models import Run
+from src.contrib.cache_lock import increment_cache_counter, take_cache_counter
+
+
+class RatingRefreshTriggerService:
+    """
+    RatingRefreshTriggerService counts, in the cache, the rating games uploaded since the last rating refresh of a run,
+    to tell when the next refresh is due: once enough games came in, or once the new games waited long enough.
+    """
+
+    def __init__(self, run: Run):
+        self._run = run
+        self._new_games_key = f"trainings:rating_refresh:{run.id}:new_games"
+        self._last_refresh_key = f"trainings:rating_refresh:{run.id}:last_refresh"
+
+    def count_new_games(self, number_of_games):
+        """
+        :return: whether the new games make the number of games since the last refresh cross the games threshold of the run
+        """
+        number_of_new_games = increment_cache_counter(self._new_games_key, number_of_games)
+        threshold = self._run.elo_refresh_games_threshold
+        if threshold <= 0:
+            return False
+        return number_of_new_games // threshold > (number_of_new_games - number_of_games) // threshold
+
+    def is_stale(self, now=None):
+        """
+        :return: whether some games were uploaded since the last refresh, longer ago than the max staleness of the run
+        """
+        max_staleness = self._run.elo_refresh_max_staleness
+        if max_staleness <= 0 or not cache.get(self._new_games_key, 0):
+            return False
+        now = time.time() if now is None else now
+        return now - cache.get(self._last_refresh_key, 0) >= max_staleness
+
+    def start_refresh(self):
+        """
+        Reset the count of new games, the games uploaded from now on being left for the next refresh
+
+        :return: the number of games uploaded since the previous refresh
+        """
+        cache.set(self._last_refresh_key, time.time(), timeout=None)
+        return take_cache_counter(self._new_games_key)
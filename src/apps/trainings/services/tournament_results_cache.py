@@ -0,0 +1,42 @@
+import numpy as np
+import pandas
+from django.core.cache import cache
+
+from src.apps.runs.models import Run
+
+
+class TournamentResultsCacheService:
+    """
+    TournamentResultsCacheService keeps, between two rating updates of a run, the detailed tournament results they were computed from
+    and the networks that were rated, so that the next update can tell which networks have new games.
+    """
+
+    def __init__(self, run: Run):
+        self._cache_key = f"trainings:tournament_results:{run.id}"
+
+    def get(self):
+        """
+        :return: (detailed_tournament_results, network_ids) as stored by the previous update, None if there is none
+        """
+        return cache.get(self._cache_key)
+
+    def set(self, detailed_tournament_results: pandas.DataFrame, network_ids):
+        cache.set(self._cache_key, (detailed_tournament_results, frozenset(network_ids)), timeout=None)
+
+    def clear(self):
+        cache.delete(self._cache_key)
+
+    @staticmethod
+    def get_network_ids_with_new_games(previous_detailed_tournament_results: pandas.DataFrame, detailed_tournament_results: pandas.DataFrame):
+        """
+        :return: the set of networks whose results against some opponent differ between the two detailed tournament results
+        """
+        pair_columns = ["reference_network", "opponent_network"]
+        count_columns = [column for column in detailed_tournament_results.columns if column not in pair_columns]
+        tournament_results = pandas.merge(
+            detailed_tournament_results, previous_detailed_tournament_results, how="outer", on=pair_columns, suffixes=("", "_previous"),
+        ).fillna(0)
+
+        previous_counts = tournament_results[[f"{column}_previous" for column in count_columns]].to_numpy()
+        has_new_games = np.any(tournament_results[count_columns].to_numpy() != previous_counts, axis=1)
+        return set(tournament_results["reference_network"][has_new_games].astype(np.int64).tolist())
@@ -0,0 +1,45 @@
+from django.conf import settings
+
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+from src.contrib.versioned_cache import VersionedCache
+
+
+class TrainingNetworkCacheService:
+    """
+    TrainingNetworkCacheService keeps the most recent network of a run enabled for training games, the network of selfplay tasks,
+    in the shared cache and in each process.
+
+    A version token per run in the shared cache tells whether it is still up to date: it changes when a network of the run
+    is saved or deleted, which covers uploads and toggles of training_games_enabled. Networks changed without signals,
+    by queryset updates or by hand in the db, are only picked up after TRAINING_NETWORK_CACHE_TIMEOUT seconds.
+    """
+
+    # Per process and in the shared cache, run id -> network or None
+    _training_networks = VersionedCache("trainings:training_network", shared=True)
+
+    def __init__(self, run: Run):
+        self._run = run
+
+    @classmethod
+    def invalidate(cls, run_id):
+        """
+        Make every process get the training network of the run again, see VersionedCache.invalidate
+        """
+        cls._training_networks.invalidate(run_id)
+
+    def _build(self):
+        try:
+            network = Network.objects.select_most_recent(self._run, for_training_games=True)
+        except Network.DoesNotExist:
+            return None
+        # Set once, when the network is got, so that serializing it does not query its run again
+        network.run = self._run
+        return network
+
+    def get(self):
+        """
+        :return: the most recent network of the run enabled for training games, None if there is none.
+            It is shared with the other requests of the process, so not to be modified.
+        """
+        return self._training_networks.get(self._run.id, self._build, timeout=settings.TRAINING_NETWORK_CACHE_TIMEOUT)
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from src.apps.games.models import RatingGame
+from src.apps.games.signals import rating_games_created
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+from src.apps.trainings.services import (
+    NetworkTaskPayloadCacheService,
+    RatingNetworksSnapshotService,
+    RatingRefreshTriggerService,
+    TrainingNetworkCacheService,
+)
+from src.apps.trainings.tasks import update_bayesian_rating_for_run
+
+
+@receiver(rating_games_created, sender=RatingGame)
+def trigger_rating_refresh(sender, run, number_of_games, **kwargs):
+    if RatingRefreshTriggerService(run).count_new_games(number_of_games):
+        update_bayesian_rating_for_run.delay(run.id, incremental=True)
+
+
+@receiver(post_save, sender=Network)
+@receiver(post_delete, sender=Network)
+def invalidate_network_caches(sender, instance, **kwargs):
+    RatingNetworksSnapshotService.invalidate(instance.run_id)
+    NetworkTaskPayloadCacheService.invalidate(instance.run_id)
+    TrainingNetworkCacheService.invalidate(instance.run_id)
+
+
+@receiver(post_save, sender=Run)
+def invalidate_network_caches_of_run(sender, instance, **kwargs):
+    # Pairings queued with the snapshot depend on the rating game settings of the run
+    RatingNetworksSnapshotService.invalidate(instance.id)
+    # Network payloads hold the url of the run, made of its name
+    NetworkTaskPayloadCacheService.invalidate(instance.id)
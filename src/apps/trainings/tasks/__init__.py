@@ -1 +1 @@
-from .update_bayesian_rating import update_bayesian_rating
+from .update_bayesian_rating import refresh_stale_bayesian_ratings, update_bayesian_rating, update_bayesian_rating_for_run
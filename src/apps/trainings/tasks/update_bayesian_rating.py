@@ -1,32 +1,149 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
 from src import celery_app
+from src.contrib.cache_lock import cache_lock, increment_cache_counter, take_cache_counter
 
-from src.apps.games.models import RatingGame
+from src.apps.games.models import RatingGamePairResult
 from src.apps.runs.models import Run
 from src.apps.trainings.models import Network
-from src.apps.trainings.services import BayesianRatingService
+from src.apps.trainings.services import BayesianRatingService, RatingNetworksSnapshotService, RatingRefreshTriggerService, TournamentResultsCacheService
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task()
+def update_bayesian_rating(for_tests=False, incremental=False):
+    """
+    Periodically update the network rating of every active run, each in its own update_bayesian_rating_for_run task,
+    so that a large run never delays the ratings of a smaller one.
+
+    Meant to be scheduled twice: often with incremental=True, which only moves the networks with new rating games since
+    the previous update (and their opponents), and much less often without, which moves every network,
+    so that the small drift of incremental updates does not accumulate.
+
+    :param for_tests: rate the runs right away, in this process, instead of queueing a task per run
+    :return:
+    """
+    for run in Run.objects.select_active():
+        if for_tests:
+            update_bayesian_rating_for_run(run.id, incremental=incremental, for_tests=True)
+        else:
+            update_bayesian_rating_for_run.delay(run.id, incremental=incremental)
+
+
+@celery_app.task()
+def refresh_stale_bayesian_ratings(for_tests=False):
+    """
+    Periodically update the network rating of the active runs whose rating games waited longer than their max staleness.
+    Cheap when nothing happened: runs without new rating games since their last update are not touched.
+
+    Along with the refreshes triggered when enough rating games are uploaded, this replaces frequent incremental update_bayesian_rating.
+
+    :param for_tests: rate the runs right away, in this process, instead of queueing a task per run
+    :return:
+    """
+    for run in Run.objects.select_active():
+        if not RatingRefreshTriggerService(run).is_stale():
+            continue
+        if for_tests:
+            update_bayesian_rating_for_run(run.id, incremental=True, for_tests=True)
+        else:
+            update_bayesian_rating_for_run.delay(run.id, incremental=True)
 
 
 @celery_app.task()
-def update_bayesian_rating(for_tests=False):
+def update_bayesian_rating_for_run(run_id, incremental=False, for_tests=False, is_follow_up=False):
     """
-    Periodically update the current_run network rating
+    Update the network rating of a run, unless an update of the same run is already running.
+
+    Triggers arriving while an update is running are not dropped but marked as pending: once the update is done,
+    they all collapse into exactly one follow-up update, so that the games they were triggered for get rated.
+    The coalesced update is a full one if any of its triggers asked for a full update, eg the periodic update_bayesian_rating.
+
+    An incremental update falls back to a full one when there is no previous update to start from.
+    Ratings are computed from the rating game pair results, which are updated in the same transaction as the rating games.
+
+    :param for_tests: run the follow-up update right away, in this process, instead of queueing it
+    :param is_follow_up: the task was queued by a previous update for its pending triggers, not triggered itself
     :return:
     """
-    current_run = Run.objects.select_current()
-    if current_run is None:
+    run = Run.objects.filter(pk=run_id).first()
+    if run is None:
         return
 
-    network_ratings = Network.pandas.get_ratings_dataframe(current_run)
-    anchor_network = Network.objects.filter(run=current_run).order_by("pk").first()
+    pending_triggers_key = f"trainings:update_bayesian_rating:{run.id}:pending"
+    pending_full_triggers_key = f"trainings:update_bayesian_rating:{run.id}:pending_full"
+    if not is_follow_up:
+        # Counted before the trigger itself, so that whoever takes the trigger also sees it asked for a full update
+        if not incremental:
+            increment_cache_counter(pending_full_triggers_key)
+        increment_cache_counter(pending_triggers_key)
+
+    with cache_lock(f"trainings:update_bayesian_rating:{run.id}", timeout=settings.CELERY_TASK_TIME_LIMIT) as acquired:
+        if not acquired:
+            logger.info(f"Postponed updating ratings of run {run.name}, an update is already running")
+            return
+        number_of_triggers = take_cache_counter(pending_triggers_key)
+        if number_of_triggers == 0:
+            # Another follow-up already served the pending triggers
+            return
+        is_full = take_cache_counter(pending_full_triggers_key) > 0
+        RatingRefreshTriggerService(run).start_refresh()
+        _update_bayesian_rating_for_run(run, not is_full, number_of_triggers)
+
+    # Checked once the lock is released, so that a trigger coming in between either is counted here, or gets the lock itself.
+    # The follow-up finds out from the pending full triggers whether it is a full update.
+    if cache.get(pending_triggers_key, 0):
+        if for_tests:
+            update_bayesian_rating_for_run(run.id, incremental=True, for_tests=True, is_follow_up=True)
+        else:
+            update_bayesian_rating_for_run.delay(run.id, incremental=True, is_follow_up=True)
+
+
+def _update_bayesian_rating_for_run(run, incremental, number_of_triggers=1):
+    start_time = time.perf_counter()
+    network_ratings = Network.pandas.get_ratings_dataframe(run)
+    anchor_network = Network.objects.filter(run=run).order_by("pk").first()
     if anchor_network is None:
         return
 
-    detailed_tournament_result = RatingGame.pandas.get_detailed_tournament_results_dataframe(current_run,for_tests=for_tests)
+    detailed_tournament_result = RatingGamePairResult.pandas.get_detailed_tournament_results_dataframe(run)
 
     assert_no_match_with_same_network = detailed_tournament_result["reference_network"] != detailed_tournament_result["opponent_network"]
     detailed_tournament_result = detailed_tournament_result[assert_no_match_with_same_network]
 
-    bayesian_rating_service = BayesianRatingService(network_ratings, anchor_network.id, detailed_tournament_result, current_run.virtual_draw_strength)
-    new_network_ratings = bayesian_rating_service.update_ratings_iteratively(current_run.elo_number_of_iterations)
+    tournament_results_cache = TournamentResultsCacheService(run)
+    previous_tournament_results = tournament_results_cache.get() if incremental else None
+    if previous_tournament_results is None:
+        updated_network_ids = None
+    else:
+        previous_detailed_tournament_result, previous_network_ids = previous_tournament_results
+        # Networks uploaded since the previous update have no rating yet, even without games
+        updated_network_ids = tournament_results_cache.get_network_ids_with_new_games(previous_detailed_tournament_result, detailed_tournament_result)
+        updated_network_ids |= set(network_ratings.index) - previous_network_ids
+        if not updated_network_ids:
+            return
+
+    bayesian_rating_service = BayesianRatingService(network_ratings, anchor_network.id, detailed_tournament_result.copy(), run.virtual_draw_strength)
+    new_network_ratings = bayesian_rating_service.update_ratings_iteratively(
+        run.elo_number_of_iterations,
+        convergence_tolerance=run.elo_convergence_tolerance,
+        solver=run.elo_solver,
+        updated_network_ids=updated_network_ids,
+    )
 
     Network.pandas.bulk_update_ratings_from_dataframe(new_network_ratings)
+    RatingNetworksSnapshotService.invalidate(run.id)
+    tournament_results_cache.set(detailed_tournament_result, network_ratings.index)
+
+    logger.info(
+        f"Updated ratings of run {run.name} in {time.perf_counter() - start_time:.2f}s, "
+        f"{bayesian_rating_service.number_of_iterations_done} iterations, final residual {bayesian_rating_service.final_residual:.3g}"
+        + ("" if updated_network_ids is None else f", {len(updated_network_ids)} networks with new games")
+        + f", {number_of_triggers - 1} coalesced triggers"
+        + ", " + ", ".join(f"{stage} {duration:.2f}s" for stage, duration in bayesian_rating_service.timings.items())
+    )
@@ -1,12 +1,18 @@
 import pytest
+import logging
 import math
 
+import numpy as np
+import pandas
 from django.contrib.auth import get_user_model
 
 from src.apps.runs.models import Run
 from src.apps.games.models import RatingGame
 from src.apps.trainings.models import Network
-from src.apps.trainings.tasks import update_bayesian_rating
+from src.apps.trainings.services import BayesianRatingService, RatingRefreshTriggerService
+from src.apps.trainings.tasks import refresh_stale_bayesian_ratings, update_bayesian_rating, update_bayesian_rating_for_run
+from src.contrib.cache_lock import cache_lock
+from django.core.cache import cache
 
 pytestmark = pytest.mark.django_db
 
@@ -363,3 +369,375 @@ class TestEloChain:
         assert(self.n3.log_gamma_uncertainty == pytest.approx(math.sqrt(1/(4+8))))
         assert(self.n4.log_gamma_uncertainty == pytest.approx(math.sqrt(1/(20/3 + 8))))
         assert(self.n5.log_gamma_uncertainty == pytest.approx(math.sqrt(3/20)))
+
+
+def make_random_tournament(number_of_networks, seed):
+    """Networks in a chain, each one playing a few neighbours, with a couple of networks without a known parent"""
+    rng = np.random.RandomState(seed)
+    network_ids = np.arange(1, number_of_networks + 1)
+    parent_ids = np.concatenate([[-1], network_ids[:-1]])
+    parent_ids[[3, 7]] = -1
+    network_ratings = pandas.DataFrame(
+        {"parent_network__pk": parent_ids, "log_gamma": 0.0, "log_gamma_uncertainty": 0.0}, index=pandas.Index(network_ids, name="id"),
+    )
+
+    results = []
+    for reference_index in range(number_of_networks):
+        for opponent_index in range(reference_index + 1, min(reference_index + 3, number_of_networks)):
+            games, wins_white, draws = 20, rng.randint(1, 19), 1
+            white, black = network_ids[reference_index], network_ids[opponent_index]
+            results.append({
+                "reference_network": white, "opponent_network": black,
+                "total_games_white": games, "total_wins_white": wins_white, "total_draw_or_no_result_white": draws,
+                "total_games_black": 0, "total_wins_black": 0, "total_draw_or_no_result_black": 0,
+            })
+            results.append({
+                "reference_network": black, "opponent_network": white,
+                "total_games_white": 0, "total_wins_white": 0, "total_draw_or_no_result_white": 0,
+                "total_games_black": games, "total_wins_black": games - wins_white - draws, "total_draw_or_no_result_black": draws,
+            })
+    return network_ratings, pandas.DataFrame(results)
+
+
+def reference_bayes_elo(network_ratings, anchor_id, detailed_tournament_results, virtual_draw_strength, number_of_iterations):
+    """Straightforward one network at a time implementation of the bayeselo iterations, to check the vectorized one against"""
+    games = {}
+    wins = {}
+
+    def add(reference, opponent, nb_games, nb_wins):
+        games[(reference, opponent)] = games.get((reference, opponent), 0.0) + nb_games
+        wins[reference] = wins.get(reference, 0.0) + nb_wins
+
+    for row in detailed_tournament_results.itertuples():
+        nb_games = row.total_games_white + row.total_games_black
+        nb_wins = row.total_wins_white + row.total_wins_black + 0.5 * (row.total_draw_or_no_result_white + row.total_draw_or_no_result_black)
+        add(row.reference_network, row.opponent_network, nb_games, nb_wins)
+
+    network_ids = list(network_ratings.index)
+    for network_id, parent_id in network_ratings["parent_network__pk"].items():
+        if parent_id in network_ids:
+            add(network_id, parent_id, virtual_draw_strength, virtual_draw_strength / 2)
+            add(parent_id, network_id, virtual_draw_strength, virtual_draw_strength / 2)
+        elif network_id != anchor_id:
+            prior = 0.01 / (len(network_ids) - 1)
+            for other_id in network_ids:
+                if other_id != network_id:
+                    add(network_id, other_id, prior, prior / 2)
+                    add(other_id, network_id, prior, prior / 2)
+
+    log_gamma = dict(network_ratings["log_gamma"].items())
+    for _ in range(number_of_iterations):
+        for network_id in network_ids:
+            expected = sum(
+                nb_games / (1 + math.exp(log_gamma[opponent] - log_gamma[network_id]))
+                for (reference, opponent), nb_games in games.items() if reference == network_id
+            )
+            log_gamma[network_id] += math.log(wins[network_id] / expected)
+        anchor_log_gamma = log_gamma[anchor_id]
+        log_gamma = {network_id: value - anchor_log_gamma for network_id, value in log_gamma.items()}
+
+    uncertainty = {}
+    for network_id in network_ids:
+        precision = sum(
+            nb_games / (math.exp((log_gamma[opponent] - log_gamma[network_id]) / 2) + math.exp((log_gamma[network_id] - log_gamma[opponent]) / 2)) ** 2
+            for (reference, opponent), nb_games in games.items() if reference == network_id
+        )
+        uncertainty[network_id] = min(math.sqrt(1 / precision), 10.0)
+    return log_gamma, uncertainty
+
+
+class TestEloMatchesReferenceImplementation:
+
+    def test_elos(self):
+        network_ratings, detailed_tournament_results = make_random_tournament(12, seed=42)
+        expected_log_gamma, expected_uncertainty = reference_bayes_elo(network_ratings, 1, detailed_tournament_results, 4.0, 300)
+
+        bayesian_rating_service = BayesianRatingService(network_ratings.copy(), 1, detailed_tournament_results.copy(), 4.0)
+        new_network_ratings = bayesian_rating_service.update_ratings_iteratively(300)
+
+        for network_id in network_ratings.index:
+            assert(new_network_ratings.loc[network_id, "log_gamma"] == pytest.approx(expected_log_gamma[network_id], abs=1e-6))
+            assert(new_network_ratings.loc[network_id, "log_gamma_uncertainty"] == pytest.approx(expected_uncertainty[network_id], abs=1e-6))
+
+
+class TestEloConvergence:
+
+    def test_stops_once_converged(self):
+        network_ratings, detailed_tournament_results = make_random_tournament(12, seed=7)
+        expected_log_gamma, _ = reference_bayes_elo(network_ratings, 1, detailed_tournament_results, 4.0, 300)
+
+        bayesian_rating_service = BayesianRatingService(network_ratings.copy(), 1, detailed_tournament_results.copy(), 4.0)
+        new_network_ratings = bayesian_rating_service.update_ratings_iteratively(100000, convergence_tolerance=1e-9)
+
+        assert(bayesian_rating_service.number_of_iterations_done < 100000)
+        assert(bayesian_rating_service.final_residual < 1e-9)
+        for network_id in network_ratings.index:
+            assert(new_network_ratings.loc[network_id, "log_gamma"] == pytest.approx(expected_log_gamma[network_id], abs=1e-6))
+
+    def test_iteration_cap(self):
+        network_ratings, detailed_tournament_results = make_random_tournament(12, seed=7)
+
+        bayesian_rating_service = BayesianRatingService(network_ratings.copy(), 1, detailed_tournament_results.copy(), 4.0)
+        bayesian_rating_service.update_ratings_iteratively(3, convergence_tolerance=1e-9)
+
+        assert(bayesian_rating_service.number_of_iterations_done == 3)
+        assert(bayesian_rating_service.final_residual > 1e-9)
+
+
+class TestEloNewtonSolver:
+
+    def test_matches_reference_implementation(self):
+        network_ratings, detailed_tournament_results = make_random_tournament(12, seed=42)
+        expected_log_gamma, expected_uncertainty = reference_bayes_elo(network_ratings, 1, detailed_tournament_results, 4.0, 300)
+
+        bayesian_rating_service = BayesianRatingService(network_ratings.copy(), 1, detailed_tournament_results.copy(), 4.0)
+        new_network_ratings = bayesian_rating_service.update_ratings_iteratively(50, convergence_tolerance=1e-10, solver=Run.EloSolver.NEWTON)
+
+        assert(bayesian_rating_service.number_of_iterations_done < 50)
+        for network_id in network_ratings.index:
+            assert(new_network_ratings.loc[network_id, "log_gamma"] == pytest.approx(expected_log_gamma[network_id], abs=1e-6))
+            assert(new_network_ratings.loc[network_id, "log_gamma_uncertainty"] == pytest.approx(expected_uncertainty[network_id], abs=1e-6))
+
+
+class TestEloOnlyUpdatedNetworks:
+
+    def test_other_networks_do_not_move(self):
+        network_ratings, detailed_tournament_results = make_random_tournament(12, seed=42)
+
+        bayesian_rating_service = BayesianRatingService(network_ratings.copy(), 1, detailed_tournament_results.copy(), 4.0)
+        new_network_ratings = bayesian_rating_service.update_ratings_iteratively(50, updated_network_ids={12})
+
+        # Network 12 played 10 and 11
+        moved_network_ids = {10, 11, 12}
+        for network_id in network_ratings.index:
+            if network_id in moved_network_ids:
+                assert(new_network_ratings.loc[network_id, "log_gamma"] != 0.0)
+            else:
+                assert(new_network_ratings.loc[network_id, "log_gamma"] == 0.0)
+
+
+class TestEloIncremental:
+
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+            elo_number_of_iterations = 100,
+            virtual_draw_strength = 4.0,
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="testrun-randomnetwork",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+        self.n2 = Network.objects.create(
+            run=self.r1,
+            name="testrun-randomnetwork2",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+            parent_network=self.n1,
+        )
+        self.games = make_games(self.r1,self.u1,self.n1,self.n2,4,10,0,0)
+        RatingGame.objects.bulk_create(self.games)
+
+    def teardown_method(self):
+        for game in self.games:
+            game.delete()
+        for network in Network.objects.filter(run=self.r1).order_by("-pk"):
+            network.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    def test_same_ratings_as_full_update(self):
+        update_bayesian_rating(for_tests=True, incremental=True)
+        self.n2.refresh_from_db()
+        assert(self.n2.log_gamma == pytest.approx(math.log(2)))
+
+        n3 = Network.objects.create(
+            run=self.r1,
+            name="testrun-randomnetwork3",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+            parent_network=self.n2,
+        )
+        new_games = make_games(self.r1,self.u1,self.n2,n3,6,38,0,0)
+        RatingGame.objects.bulk_create(new_games)
+        self.games.extend(new_games)
+
+        update_bayesian_rating(for_tests=True, incremental=True)
+        incremental_log_gamma = list(Network.objects.filter(run=self.r1).order_by("pk").values_list("log_gamma", flat=True))
+
+        update_bayesian_rating(for_tests=True)
+        full_log_gamma = list(Network.objects.filter(run=self.r1).order_by("pk").values_list("log_gamma", flat=True))
+
+        assert(incremental_log_gamma == pytest.approx(full_log_gamma))
+        assert(incremental_log_gamma[2] - incremental_log_gamma[1] == pytest.approx(math.log(5)))
+
+
+class TestBulkUpdateRatings:
+
+    def setup_method(self):
+        self.r1 = Run.objects.create(name="testrun", rating_game_probability=0.0, status="Active")
+        self.networks = [
+            Network.objects.create(
+                run=self.r1,
+                name=f"testrun-randomnetwork{index}",
+                model_file="",
+                model_file_bytes=0,
+                model_file_sha256=fake_sha256,
+                log_gamma=0,
+                is_random=True,
+            )
+            for index in range(5)
+        ]
+
+    def teardown_method(self):
+        for network in self.networks:
+            network.delete()
+        self.r1.delete()
+
+    def test_only_changed_networks_are_written(self):
+        network_ids = [network.id for network in self.networks]
+        ratings = pandas.DataFrame(
+            {"log_gamma": [0.0, 1.0, 2.0, 0.0], "log_gamma_uncertainty": [0.0, 0.5, 0.25, 0.0]}, index=pandas.Index(network_ids[:4], name="id"),
+        )
+
+        assert(Network.pandas.bulk_update_ratings_from_dataframe(ratings, batch_size=3) == 2)
+        assert(Network.pandas.bulk_update_ratings_from_dataframe(ratings, batch_size=3) == 0)
+
+        values = list(Network.objects.filter(id__in=network_ids).order_by("pk").values_list(
+            "log_gamma", "log_gamma_uncertainty", "log_gamma_lower_confidence", "log_gamma_upper_confidence",
+        ))
+        assert(values == [(0.0, 0.0, 0.0, 0.0), (1.0, 0.5, 0.0, 2.0), (2.0, 0.25, 1.5, 2.5), (0.0, 0.0, 0.0, 0.0), (0.0, 0.0, 0.0, 0.0)])
+
+
+class TestEloMultipleRuns:
+
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.runs = []
+        self.networks = []
+        self.games = []
+        for run_index in range(2):
+            run = Run.objects.create(
+                name=f"testrun{run_index}",
+                rating_game_probability=0.0,
+                status="Active",
+                elo_number_of_iterations = 50,
+                virtual_draw_strength = 4.0,
+            )
+            n1 = Network.objects.create(
+                run=run,
+                name=f"testrun{run_index}-randomnetwork",
+                model_file="",
+                model_file_bytes=0,
+                model_file_sha256=fake_sha256,
+                log_gamma=0,
+                is_random=True,
+            )
+            n2 = Network.objects.create(
+                run=run,
+                name=f"testrun{run_index}-randomnetwork2",
+                model_file="",
+                model_file_bytes=0,
+                model_file_sha256=fake_sha256,
+                log_gamma=0,
+                is_random=True,
+                parent_network=n1,
+            )
+            self.runs.append(run)
+            self.networks.append((n1, n2))
+            # 2:1 winning odds in the first run, 3:1 in the second one, see TestEloTwoNetworksSomeGames and TestEloTwoNetworksSomeGamesWithDraws
+            self.games.extend(make_games(run,self.u1,n1,n2,4,10,0,0) if run_index == 0 else make_games(run,self.u1,n1,n2,8,32,3,1))
+        RatingGame.objects.bulk_create(self.games)
+
+    def teardown_method(self):
+        for game in self.games:
+            game.delete()
+        for run, (n1, n2) in zip(self.runs, self.networks):
+            n2.delete()
+            n1.delete()
+            run.delete()
+        self.u1.delete()
+
+    def test_every_active_run_is_rated(self):
+        update_bayesian_rating(for_tests=True)
+        for (n1, n2), expected_log_gamma in zip(self.networks, [math.log(2), math.log(3)]):
+            n2.refresh_from_db()
+            assert(n2.log_gamma == pytest.approx(expected_log_gamma))
+
+    def test_no_concurrent_updates_of_a_run(self):
+        with cache_lock(f"trainings:update_bayesian_rating:{self.runs[0].id}", timeout=60):
+            update_bayesian_rating_for_run(self.runs[0].id)
+        update_bayesian_rating_for_run(self.runs[1].id)
+
+        n2_first_run, n2_second_run = self.networks[0][1], self.networks[1][1]
+        n2_first_run.refresh_from_db()
+        n2_second_run.refresh_from_db()
+        assert(n2_first_run.log_gamma == 0)
+        assert(n2_second_run.log_gamma == pytest.approx(math.log(3)))
+
+    def test_concurrent_triggers_are_coalesced(self, caplog):
+        run = self.runs[0]
+        with cache_lock(f"trainings:update_bayesian_rating:{run.id}", timeout=60):
+            for _ in range(3):
+                update_bayesian_rating_for_run(run.id)
+        assert(cache.get(f"trainings:update_bayesian_rating:{run.id}:pending") == 3)
+
+        with caplog.at_level(logging.INFO, logger="src.apps.trainings.tasks.update_bayesian_rating"):
+            update_bayesian_rating_for_run(run.id, for_tests=True)
+        assert(cache.get(f"trainings:update_bayesian_rating:{run.id}:pending") == 0)
+        update_messages = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Updated ratings")]
+        assert(len(update_messages) == 1)
+        assert("3 coalesced triggers" in update_messages[0])
+
+        n2 = self.networks[0][1]
+        n2.refresh_from_db()
+        assert(n2.log_gamma == pytest.approx(math.log(2)))
+
+    def test_coalesced_full_trigger_is_not_downgraded(self, caplog):
+        run = self.runs[0]
+        update_bayesian_rating_for_run(run.id)
+        with cache_lock(f"trainings:update_bayesian_rating:{run.id}", timeout=60):
+            update_bayesian_rating_for_run(run.id)
+            update_bayesian_rating_for_run(run.id, incremental=True)
+
+        # Without new games, an incremental update would not update anything
+        caplog.clear()
+        with caplog.at_level(logging.INFO, logger="src.apps.trainings.tasks.update_bayesian_rating"):
+            update_bayesian_rating_for_run(run.id, incremental=True, for_tests=True)
+        assert(cache.get(f"trainings:update_bayesian_rating:{run.id}:pending_full") == 0)
+        update_messages = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Updated ratings")]
+        assert(len(update_messages) == 1)
+        assert("2 coalesced triggers" in update_messages[0])
+        assert("networks with new games" not in update_messages[0])
+
+    def test_only_stale_runs_are_refreshed(self):
+        for run in self.runs:
+            run.elo_refresh_max_staleness = 60
+            run.save()
+            RatingRefreshTriggerService(run).start_refresh()
+        cache.set(f"trainings:rating_refresh:{self.runs[0].id}:last_refresh", 0, timeout=None)
+        for run in self.runs:
+            RatingRefreshTriggerService(run).count_new_games(1)
+
+        refresh_stale_bayesian_ratings(for_tests=True)
+
+        n2_first_run, n2_second_run = self.networks[0][1], self.networks[1][1]
+        n2_first_run.refresh_from_db()
+        n2_second_run.refresh_from_db()
+        assert(n2_first_run.log_gamma == pytest.approx(math.log(2)))
+        assert(n2_second_run.log_gamma == 0)
+        assert(not RatingRefreshTriggerService(self.runs[0]).is_stale())
@@ -0,0 +1,17 @@
+import numpy as np
+
+from src.apps.trainings.managers.network_queryset import random_weighted_choice
+
+
+class TestRandomWeightedChoice:
+
+    def test_exponential_weights(self):
+        np.random.seed(0)
+        picked = random_weighted_choice(np.arange(3), size=100_000)
+        expected_probability = np.exp(-np.arange(3) / 2) / np.sum(np.exp(-np.arange(3) / 2))
+        assert(np.allclose(np.bincount(picked, minlength=3) / len(picked), expected_probability, atol=0.01))
+
+    def test_single_choice(self):
+        networks = ["a", "b", "c"]
+        assert(all(random_weighted_choice(networks) in networks for _ in range(100)))
+        assert(random_weighted_choice(["a"]) == "a")
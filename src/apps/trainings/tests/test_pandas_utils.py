@@ -0,0 +1,36 @@
+import logging
+
+import pandas
+
+from src.apps.trainings.services.pandas_utils import PandasUtilsService
+
+test_logger = logging.getLogger("src.apps.trainings.tests.pandas_utils")
+
+
+class TestPandasUtils:
+
+    def test_nothing_is_built_when_the_level_is_disabled(self):
+        test_logger.setLevel(logging.INFO)
+
+        def build_frame():
+            raise AssertionError("The frame should not be built")
+
+        PandasUtilsService(test_logger).print_data_frame(build_frame, level=logging.DEBUG)
+
+    def test_print_sample(self, caplog):
+        test_logger.setLevel(logging.DEBUG)
+        frame = pandas.DataFrame({"log_gamma": range(100)})
+
+        with caplog.at_level(logging.DEBUG, logger=test_logger.name):
+            PandasUtilsService(test_logger, max_rows=5).print_data_frame(lambda: frame)
+
+        assert(len(caplog.records) == 1)
+        assert(len(caplog.records[0].getMessage().splitlines()) == 2 + 5)
+
+    def test_snapshots(self, tmp_path):
+        pandas_utils = PandasUtilsService(test_logger, snapshot_directory=str(tmp_path), snapshot_every=10)
+        for iteration in range(1, 31):
+            pandas_utils.snapshot_data_frame("log_gamma", lambda: pandas.DataFrame({"log_gamma": [iteration]}), iteration)
+
+        assert(sorted(path.name for path in tmp_path.iterdir()) == ["log_gamma-000010.csv", "log_gamma-000020.csv", "log_gamma-000030.csv"])
+        assert(pandas.read_csv(tmp_path / "log_gamma-000020.csv")["log_gamma"].tolist() == [20])
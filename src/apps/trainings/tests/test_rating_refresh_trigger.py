@@ -0,0 +1,45 @@
+from django.core.cache import cache
+
+from src.apps.games.models import RatingGame
+from src.apps.games.signals import rating_games_created
+from src.apps.runs.models import Run
+from src.apps.trainings.services import RatingRefreshTriggerService
+
+
+class TestRatingRefreshTrigger:
+
+    def setup_method(self):
+        cache.clear()
+        self.run = Run(id=1, name="testrun", elo_refresh_games_threshold=100, elo_refresh_max_staleness=60)
+
+    def teardown_method(self):
+        cache.clear()
+
+    def test_refresh_is_due_each_time_the_threshold_is_crossed(self):
+        trigger = RatingRefreshTriggerService(self.run)
+        assert([trigger.count_new_games(30) for _ in range(7)] == [False, False, False, True, False, False, True])
+
+    def test_no_refresh_without_threshold(self):
+        self.run.elo_refresh_games_threshold = 0
+        assert(not RatingRefreshTriggerService(self.run).count_new_games(1000))
+
+    def test_start_refresh_resets_new_games(self):
+        trigger = RatingRefreshTriggerService(self.run)
+        trigger.count_new_games(90)
+        assert(trigger.start_refresh() == 90)
+        assert(not trigger.count_new_games(90))
+        assert(trigger.count_new_games(10))
+
+    def test_stale_only_with_new_games(self):
+        trigger = RatingRefreshTriggerService(self.run)
+        trigger.start_refresh()
+        now = cache.get(f"trainings:rating_refresh:{self.run.id}:last_refresh")
+        assert(not trigger.is_stale(now + 120))
+
+        trigger.count_new_games(1)
+        assert(not trigger.is_stale(now + 30))
+        assert(trigger.is_stale(now + 120))
+
+    def test_rating_games_created_are_counted(self):
+        rating_games_created.send(sender=RatingGame, run=self.run, number_of_games=5)
+        assert(RatingRefreshTriggerService(self.run).start_refresh() == 5)
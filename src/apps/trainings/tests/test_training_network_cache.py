@@ -0,0 +1,50 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+from src.apps.trainings.services import TrainingNetworkCacheService
+
+pytestmark = pytest.mark.django_db
+
+fake_sha256 = "0" * 64
+
+
+class TestTrainingNetworkCache:
+
+    def setup_method(self):
+        self.run = Run.objects.create(name="testrun")
+        self.n1 = self._create_network("testrun-network1")
+
+    def teardown_method(self):
+        Network.objects.filter(run=self.run).delete()
+        self.run.delete()
+
+    def _create_network(self, name):
+        return Network.objects.create(run=self.run, name=name, model_file="", model_file_bytes=0, model_file_sha256=fake_sha256, is_random=True)
+
+    def test_network_is_queried_once(self):
+        assert(TrainingNetworkCacheService(self.run).get() == self.n1)
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                assert(TrainingNetworkCacheService(self.run).get() == self.n1)
+        assert(len(queries.captured_queries) == 0)
+
+    def test_new_and_toggled_networks_are_served(self):
+        assert(TrainingNetworkCacheService(self.run).get() == self.n1)
+        n2 = self._create_network("testrun-network2")
+        assert(TrainingNetworkCacheService(self.run).get() == n2)
+
+        n2.training_games_enabled = False
+        n2.save()
+        assert(TrainingNetworkCacheService(self.run).get() == self.n1)
+
+        self.n1.delete()
+        assert(TrainingNetworkCacheService(self.run).get() is None)
+
+    def test_changes_without_signals_are_served_after_timeout(self, settings):
+        settings.TRAINING_NETWORK_CACHE_TIMEOUT = 0
+        assert(TrainingNetworkCacheService(self.run).get() == self.n1)
+        Network.objects.filter(pk=self.n1.pk).update(training_games_enabled=False)
+        assert(TrainingNetworkCacheService(self.run).get() is None)
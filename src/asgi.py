@@ -13,10 +13,16 @@ sys.path.append(os.path.join(app_path, ".."))
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.settings.production")
 django_application = get_asgi_application()
 
+# Imported once django is set up
+from src.apps.distributed_efforts.asgi import TASK_DISPATCH_ROUTES, task_dispatch_application  # noqa: E402
+
 
 async def application(scope, receive, send):
     if scope['type'] == 'http':
-        await django_application(scope, receive, send)
+        if scope['path'] in TASK_DISPATCH_ROUTES:
+            await task_dispatch_application(scope, receive, send)
+        else:
+            await django_application(scope, receive, send)
     elif scope['type'] == 'websocket':
         await websocket_application(scope, receive, send)
     else:
@@ -0,0 +1,75 @@
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+
+@contextmanager
+def cache_lock(key, timeout):
+    """
+    A lock shared by every process using the same cache, eg every celery worker.
+    It expires after timeout seconds, so that a crashed holder cannot keep it forever.
+
+    Eg:
+
+        with cache_lock("my-lock", timeout=60) as acquired:
+            if acquired:
+                ...
+
+    :param key: the cache key of the lock
+    :param timeout: the time in seconds after which the lock is released anyway
+    :return: a context manager giving whether the lock was acquired, if not someone else holds it
+    """
+    if hasattr(cache, "lock"):
+        # django_redis: a redis-py lock, released by a script deleting the key only if it still holds our token
+        from redis.exceptions import LockError
+
+        lock = cache.lock(key, timeout=timeout)
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except LockError:
+                    # Ours expired in the meantime, the lock is not released as it may be someone else's
+                    pass
+        return
+
+    # Other caches, eg the local memory cache of tests, that are not shared by several hosts
+    token = uuid.uuid4().hex
+    acquired = cache.add(key, token, timeout)
+    try:
+        yield acquired
+    finally:
+        # Do not release the lock of someone else if ours expired in the meantime
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
+def increment_cache_counter(key, delta=1):
+    """
+    Atomically add delta to a counter shared by every process using the same cache, creating it if needed.
+
+    :return: the new value of the counter
+    """
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # The counter was taken in the meantime
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key, delta)
+
+
+def take_cache_counter(key):
+    """
+    Reset a counter incremented with increment_cache_counter, without losing the increments made concurrently.
+
+    :return: the value of the counter before it was reset
+    """
+    value = cache.get(key, 0)
+    if value:
+        cache.decr(key, value)
+    return value
@@ -0,0 +1,88 @@
+import math
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class VersionedCache:
+    """
+    Values kept in each process, each one under a version token in the cache shared by every process.
+    Getting a value costs one cache read as long as its token does not change, invalidating the value changes the token
+    so that every process builds the value again.
+
+    Eg:
+
+        networks_cache = VersionedCache("trainings:networks")
+        networks = networks_cache.get(run.id, lambda: list(Network.objects.filter(run=run)))
+        ...
+        networks_cache.invalidate(run.id)
+    """
+
+    def __init__(self, name, shared=False):
+        """
+        :param name: the prefix of the cache keys
+        :param shared: also keep the values in the shared cache, under their version, so that a value is built once
+            for every process rather than once per process. Values must then be picklable.
+        """
+        self._name = name
+        self._shared = shared
+        # Per process, key -> (version, expiry time, value)
+        self._values = {}
+
+    def _get_cache_key(self, key, suffix):
+        return f"{self._name}:{suffix}" if key is None else f"{self._name}:{key}:{suffix}"
+
+    def get_version(self, key=None):
+        version_key = self._get_cache_key(key, "version")
+        version = cache.get(version_key)
+        if version is None:
+            cache.add(version_key, uuid.uuid4().hex, timeout=None)
+            version = cache.get(version_key)
+        return version
+
+    def invalidate(self, key=None):
+        """
+        Make every process build the value again, now, and once the current transaction commits if there is one,
+        so that no process keeps a value built in between, from the db as it was before the transaction.
+        """
+        version_key = self._get_cache_key(key, "version")
+
+        def bump_version():
+            cache.set(version_key, uuid.uuid4().hex, timeout=None)
+
+        bump_version()
+        transaction.on_commit(bump_version)
+
+    def get(self, key, build, timeout=None):
+        """
+        :param key: what the value is of, eg a run id, None for a single value
+        :param build: called without argument to build the value when it is not cached
+        :param timeout: the time in seconds after which the value is built again even if not invalidated, None to keep it until then
+        :return: the value
+        """
+        version = self.get_version(key)
+        value_version, expiry_time, value = self._values.get(key, (None, 0, None))
+        if value_version == version and time.monotonic() < expiry_time:
+            return value
+
+        if self._shared:
+            value_key = self._get_cache_key(key, version)
+            # Wrapped in a tuple, to tell a cached None from a cache miss
+            cached_value = cache.get(value_key)
+            if cached_value is None:
+                cached_value = (build(),)
+                cache.set(value_key, cached_value, timeout=timeout)
+            value = cached_value[0]
+        else:
+            value = build()
+
+        self._values[key] = (version, math.inf if timeout is None else time.monotonic() + timeout, value)
+        return value
+
+    def clear(self):
+        """
+        Forget the values kept in this process, eg to measure the cost of building them
+        """
+        self._values.clear()
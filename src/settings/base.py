@@ -280,3 +280,26 @@ REST_FRAMEWORK = {
     "ALLOWED_VERSIONS": ["1.2"],
     "DEFAULT_VERSION": "1.2",
 }
+
+# Elo ratings debugging
+# ------------------------------------------------------------------------------
+# Directory to write csv snapshots of the ratings to, during the iterations of the rating updates, none if unset
+ELO_DEBUG_SNAPSHOT_DIRECTORY = env("ELO_DEBUG_SNAPSHOT_DIRECTORY", default=None)
+# Only write the snapshots of one iteration out of this many
+ELO_DEBUG_SNAPSHOT_EVERY = env.int("ELO_DEBUG_SNAPSHOT_EVERY", default=10)
+# Only print a sample of this many rows of the frames logged at debug level
+ELO_DEBUG_MAX_ROWS = env.int("ELO_DEBUG_MAX_ROWS", default=200)
+
+# Rating games
+# ------------------------------------------------------------------------------
+# Number of rating game pairings generated at once by each process, and served to clients until ratings change
+RATING_PAIRINGS_BATCH_SIZE = env.int("RATING_PAIRINGS_BATCH_SIZE", default=64)
+# Seconds after which rating games handed out to clients are not counted as in flight anymore, if their result never came
+RATING_GAMES_IN_FLIGHT_TIMEOUT = env.int("RATING_GAMES_IN_FLIGHT_TIMEOUT", default=2 * 60 * 60)
+
+# Tasks
+# ------------------------------------------------------------------------------
+# Seconds after which the cached network of selfplay tasks is read from the db again, even if no network signal said it changed
+TRAINING_NETWORK_CACHE_TIMEOUT = env.int("TRAINING_NETWORK_CACHE_TIMEOUT", default=60)
+# Seconds the async task dispatch route trusts client credentials it verified, without checking them again
+TASK_CLIENT_AUTH_CACHE_TIMEOUT = env.int("TASK_CLIENT_AUTH_CACHE_TIMEOUT", default=5 * 60)